@@ -0,0 +1,39 @@
+'''
+Configuration of the Mortech stub, see mortech_test.
+
+Entries are merged key by key: a filter entry over the "default" entry, over DEFAULT_CONFIG["default"].
+'''
+import json
+
+DEFAULT_CONFIG = {
+    'default': {
+        'quotes': None,
+        'empty': False,
+        'latency': 0,
+        'error_rate': 0,
+        'error_status': 500,
+    }
+}
+
+
+def merge_config(*configs):
+    '''Return DEFAULT_CONFIG with the entries of the configs merged over it, in order.'''
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    for overrides in configs:
+        for key, entry in overrides.items():
+            config.setdefault(key, {}).update(entry)
+    return config
+
+
+def load_config(path=None):
+    if not path:
+        return merge_config()
+    with open(path) as config_file:
+        return merge_config(json.load(config_file))
+
+
+def get_filter_config(config, filter_id):
+    filter_config = dict(DEFAULT_CONFIG['default'])
+    filter_config.update(config.get('default', {}))
+    filter_config.update(config.get(str(filter_id), {}))
+    return filter_config
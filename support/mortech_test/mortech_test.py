@@ -1,21 +1,62 @@
+'''
+Local stand-in for the Mortech API.
+
+Responses are configured per filter id (the filterId request parameter, "" for no filter), with a "default"
+entry for the rest:
+
+* quotes: number of quotes in the response, null for the sample response
+* empty: return a successful response without results
+* latency: seconds to wait before responding
+* error_rate: share of requests, 0 to 1, answered with error_status
+
+The configuration is read from the JSON file in MORTECH_STUB_CONFIG and can be replaced at runtime with
+a PUT of the same JSON to /mortech_test/config. Missing keys of an entry are taken from the defaults,
+see configuration.
+'''
 import logging
+import os
+import random
+import time
 from logging.handlers import RotatingFileHandler
 
-from flask import Flask, send_from_directory
+from flask import Flask, Response, jsonify, request
+
+from configuration import get_filter_config, load_config, merge_config
+from responses import build_response
 
 app = Flask(__name__)
 # app.debug = True
 
+config = load_config(os.environ.get('MORTECH_STUB_CONFIG'))
+
 
 @app.route('/mortech_test', methods=['POST'])
 def simple():
-    path = 'tests'
-    response = 'rate-quote.xml'
-    return send_from_directory(path, response)
+    filter_id = request.values.get('filterId', '')
+    filter_config = get_filter_config(config, filter_id)
+
+    if filter_config['latency']:
+        time.sleep(filter_config['latency'])
+
+    if random.random() < filter_config['error_rate']:
+        app.logger.info('MORTECH-STUB-ERROR filter %s', filter_id)
+        return Response(status=filter_config['error_status'])
+
+    content = build_response(quotes=filter_config['quotes'], empty=filter_config['empty'])
+    return Response(content, mimetype='text/xml')
+
+
+@app.route('/mortech_test/config', methods=['GET', 'PUT'])
+def stub_config():
+    if request.method == 'PUT':
+        new_config = merge_config(request.get_json(force=True))
+        config.clear()
+        config.update(new_config)
+    return jsonify(config)
 
 
 if __name__ == '__main__':
     handler = RotatingFileHandler('mortech.log', maxBytes=10000, backupCount=1)
     handler.setLevel(logging.INFO)
     app.logger.addHandler(handler)
-    app.run(port=5555)
+    app.run(port=5555, threaded=True)
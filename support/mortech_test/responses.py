@@ -0,0 +1,65 @@
+'''
+Mortech responses of configurable size, built from the sample response in tests/rate-quote.xml.
+
+Used by the Mortech stub server and by the rate quote benchmarks (manage.py benchmark_rate_quote).
+'''
+import copy
+import itertools
+import os
+
+from lxml import etree
+
+SAMPLE_RESPONSE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests', 'rate-quote.xml')
+
+EMPTY_RESPONSE = '''<?xml version="1.0" ?>
+<mortech>
+    <header>
+        <errorNum>0</errorNum>
+        <errorDesc>Success</errorDesc>
+    </header>
+</mortech>
+'''
+
+_responses = {}
+
+
+def get_sample_quotes():
+    '''Return the sample root and a list of (results, quote) elements in document order.'''
+    root = etree.parse(SAMPLE_RESPONSE).getroot()
+    return root, [(results, quote) for results in root.iter('results') for quote in results.iter('quote')]
+
+
+def build_response(quotes=None, empty=False):
+    '''
+    Return a Mortech XML response.
+
+    :param quotes: `int`, number of quotes, sample quotes are repeated to reach it. None returns the sample as is.
+    :param empty: `bool`, return a successful response without results
+    '''
+    key = (quotes, empty)
+    if key not in _responses:
+        if empty:
+            _responses[key] = EMPTY_RESPONSE
+        elif quotes is None:
+            with open(SAMPLE_RESPONSE) as sample:
+                _responses[key] = sample.read()
+        else:
+            _responses[key] = _build_sized_response(quotes)
+    return _responses[key]
+
+
+def _build_sized_response(quotes):
+    sample_root, sample_quotes = get_sample_quotes()
+    root = etree.Element('mortech')
+    root.append(copy.deepcopy(sample_root.find('header')))
+
+    groups = []
+    for sample_results, sample_quote in itertools.islice(itertools.cycle(sample_quotes), quotes):
+        if not groups or groups[-1][0] is not sample_results:
+            results = etree.SubElement(root, 'results', sample_results.attrib)
+            groups.append((sample_results, results))
+        groups[-1][1].append(copy.deepcopy(sample_quote))
+
+    for _, results in groups:
+        results.set('size', str(len(results)))
+    return etree.tostring(root, xml_declaration=True)
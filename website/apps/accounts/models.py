@@ -17,11 +17,10 @@ from sorl.thumbnail import ImageField
 from model_utils import Choices
 from model_utils.managers import InheritanceManager
 from rest_framework import serializers
-from solo.models import SingletonModel
 
 from accounts.validators import validate_contact_preferences
 from core import twilio_utils
-from core.models import TimeStampedModel
+from core.models import ConfigSingletonModel, TimeStampedModel
 
 logger = logging.getLogger('sample.accounts.models')
 
@@ -289,7 +288,7 @@ class Advisor(User):
         return None
 
 
-class DefaultAdvisor(SingletonModel):
+class DefaultAdvisor(ConfigSingletonModel):
     """
     the default advisor used that is assigned to a loan if salesforce fails to return
     an advisor email
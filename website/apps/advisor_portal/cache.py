@@ -0,0 +1,77 @@
+'''
+Encrypted cache of loan profile detail responses.
+
+Serialized loan profiles are cached under a digest of the endpoint, the user, the loan profile id and the version
+stamp of the loan profile graph (see loans.versions), so any change in the graph makes the entry unreachable.
+The digest is also the ETag of the response: a request with a matching If-None-Match gets a 304 without the loan
+profile being loaded, serialized or decrypted.
+
+Entries contain PII, they are encrypted with the keys of ENCRYPTED_FIELDS_KEYDIR before they reach the cache.
+'''
+
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+
+from keyczar import keyczar
+from rest_framework.utils.encoders import JSONEncoder
+
+from loans.versions import get_loan_profile_version
+
+logger = logging.getLogger('sample.advisor_portal.cache')
+
+
+class LoanProfileResponseCache(object):
+    '''
+    Store encrypted loan profile representations keyed on the version stamp of their graph.
+    A timeout of 0 disables the cache.
+    '''
+
+    KEY_PREFIX = 'advisor_portal.loan_profile.response'
+
+    _crypter = None
+
+    def __init__(self, endpoint, cache_name=None, timeout=None):
+        self.endpoint = endpoint
+        self.cache_name = cache_name or settings.LOAN_PROFILE_CACHE_NAME
+        self.timeout = settings.LOAN_PROFILE_CACHE_TIMEOUT if timeout is None else timeout
+
+    @property
+    def enabled(self):
+        return bool(self.timeout)
+
+    def get_cache(self):
+        return caches[self.cache_name]
+
+    @classmethod
+    def get_crypter(cls):
+        if cls._crypter is None:
+            cls._crypter = keyczar.Crypter.Read(settings.ENCRYPTED_FIELDS_KEYDIR)
+        return cls._crypter
+
+    def get_etag(self, loan_profile_id, user_id):
+        '''Return the ETag of the current version of the loan profile for the user.'''
+        version = get_loan_profile_version(loan_profile_id)
+        return hashlib.sha1('{}.{}.{}.{}'.format(self.endpoint, user_id, loan_profile_id, version)).hexdigest()
+
+    def get_key(self, etag):
+        return '{}.{}'.format(self.KEY_PREFIX, etag)
+
+    def has(self, etag):
+        return self.get_key(etag) in self.get_cache()
+
+    def get(self, etag):
+        '''Return the cached representation or None.'''
+        cached = self.get_cache().get(self.get_key(etag))
+        if cached is None:
+            logger.debug('LOAN-PROFILE-CACHE-MISS %s', self.endpoint)
+            return None
+        logger.debug('LOAN-PROFILE-CACHE-HIT %s', self.endpoint)
+        return json.loads(self.get_crypter().Decrypt(cached))
+
+    def set(self, etag, data):
+        encrypted = self.get_crypter().Encrypt(json.dumps(data, cls=JSONEncoder))
+        self.get_cache().set(self.get_key(etag), encrypted, self.timeout)
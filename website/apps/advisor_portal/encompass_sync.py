@@ -0,0 +1,93 @@
+'''
+Scheduling of loan profile syncs with Encompass.
+
+Every run of the scheduler dispatches the oldest ready loan profiles, at most as many as
+* the concurrency window allows: ENCOMPASS_SYNC_CONCURRENCY minus the syncs in progress,
+* the token bucket allows: ENCOMPASS_SYNC_RATE syncs per minute, in bursts of up to ENCOMPASS_SYNC_BURST.
+The rest wait for the next run. Dispatched syncs expire when they are not started before the next run.
+
+A sync claims its loan profile with a PostgreSQL advisory lock held for the whole sync, so a loan profile is never
+synced by two workers at once, even when find_stale_in_progress_loan_profiles made it ready again meanwhile.
+
+Backlog depth, syncs in progress and sync latency are logged and kept in the cache, see get_stats().
+'''
+
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from core.utils import TokenBucket
+from loans.models import LoanProfileV1
+
+logger = logging.getLogger('sample.advisor_portal.encompass_sync')
+
+# first key of the advisory locks of loan profile syncs, the loan profile id is the second
+LOCK_NAMESPACE = 0x454e43
+# syncs not started before the next run of the scheduler expire, the next run dispatches them again
+DISPATCH_EXPIRES = 55
+BUCKET_KEY = 'advisor_portal.encompass_sync.bucket'
+STATS_KEY = 'advisor_portal.encompass_sync.{}'
+GAUGES = ('backlog', 'in_progress', 'dispatched')
+COUNTERS = ('synced', 'failed', 'latency_total')
+
+
+def get_cache():
+    return caches['default']
+
+
+def get_token_bucket():
+    return TokenBucket(BUCKET_KEY, settings.ENCOMPASS_SYNC_RATE / 60.0, settings.ENCOMPASS_SYNC_BURST)
+
+
+def get_ready_loan_profile_ids():
+    return LoanProfileV1.objects.filter(
+        encompass_sync_status=LoanProfileV1.ENCOMPASS_READY_TO_SYNC
+    ).order_by('updated', 'id').values_list('id', flat=True)
+
+
+def schedule():
+    '''Return ids of the loan profiles to sync now.'''
+    backlog = get_ready_loan_profile_ids().count()
+    in_progress = LoanProfileV1.objects.filter(
+        encompass_sync_status=LoanProfileV1.ENCOMPASS_SYNC_IN_PROGRESS
+    ).count()
+
+    window = max(0, min(backlog, settings.ENCOMPASS_SYNC_CONCURRENCY - in_progress))
+    if window and settings.ENCOMPASS_SYNC_RATE:
+        window = get_token_bucket().take(window)
+    loan_profile_ids = list(get_ready_loan_profile_ids()[:window]) if window else []
+
+    get_cache().set_many({
+        STATS_KEY.format('backlog'): backlog,
+        STATS_KEY.format('in_progress'): in_progress,
+        STATS_KEY.format('dispatched'): len(loan_profile_ids),
+    }, None)
+    logger.info('ENCOMPASS-SYNC-SCHEDULED backlog %s in_progress %s dispatched %s',
+                backlog, in_progress, len(loan_profile_ids))
+    return loan_profile_ids
+
+
+def record_sync(loan_profile, successful):
+    '''Count the sync, and for a successful sync its latency, from the claim to now, the end of the sync.'''
+    latency = 0
+    if loan_profile.datetime_sent_to_encompass:
+        latency = max(0, (timezone.now() - loan_profile.datetime_sent_to_encompass).total_seconds())
+    counts = [('synced', 1), ('latency_total', int(latency * 1000))] if successful else [('failed', 1)]
+    cache = get_cache()
+    for key, value in counts:
+        if value and not cache.add(STATS_KEY.format(key), value, None):
+            cache.incr(STATS_KEY.format(key), value)
+    logger.info('ENCOMPASS-SYNC-LATENCY guid %s successful %s seconds %.1f',
+                loan_profile.guid, successful, latency)
+
+
+def get_stats():
+    cache = get_cache()
+    values = cache.get_many([STATS_KEY.format(key) for key in GAUGES + COUNTERS])
+    stats = {key: values.get(STATS_KEY.format(key)) or 0 for key in GAUGES + COUNTERS}
+    latency_total = stats.pop('latency_total')
+    # only successful syncs count their latency
+    stats['average_latency'] = float(latency_total) / 1000 / stats['synced'] if stats['synced'] else 0.0
+    return stats
@@ -1,4 +1,14 @@
-from rest_framework.pagination import PageNumberPagination, LimitOffsetPagination
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination, LimitOffsetPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class SmallPagePagination(PageNumberPagination):
@@ -14,3 +24,89 @@ class LargePagePagination(PageNumberPagination):
 class SmallLimitOffsetPagination(LimitOffsetPagination):
     default_limit = 10
     max_limit = 10
+
+
+class LoanProfileKeysetPagination(BasePagination):
+    """
+    Keyset pagination of loan profile ids on
+    (respa_triggered_within_last_week, updated, id), all descending.
+
+    The cursor holds the key of the last row of the previous page,
+    so any page is selected with a range condition and a LIMIT
+    instead of scanning and discarding OFFSET rows.
+    An empty `cursor` query param requests the first page.
+    """
+
+    limit_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    default_limit = 10
+    max_limit = 10
+    invalid_cursor_message = 'Invalid cursor'
+
+    ordering = ('-respa_triggered_within_last_week', '-updated', '-id')
+    position_fields = ('respa_triggered_within_last_week', 'updated', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Return ids of the page, the queryset must be
+        annotated with respa_triggered_within_last_week.
+        """
+        self.request = request
+        self.limit = self.get_limit(request)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position))
+
+        rows = list(queryset.order_by(*self.ordering).values_list(*self.position_fields)[:self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        rows = rows[:self.limit]
+        self.next_position = rows[-1] if rows else None
+        return [row[-1] for row in rows]
+
+    def get_limit(self, request):
+        try:
+            return _positive_int(request.query_params[self.limit_query_param], strict=True, cutoff=self.max_limit)
+        except (KeyError, ValueError):
+            return self.default_limit
+
+    @staticmethod
+    def get_position_filter(position):
+        """Rows after the position in the descending ordering."""
+        respa_triggered, updated, pk = position
+        position_filter = (
+            Q(respa_triggered_within_last_week=respa_triggered, updated__lt=updated) |
+            Q(respa_triggered_within_last_week=respa_triggered, updated=updated, id__lt=pk)
+        )
+        if respa_triggered:
+            position_filter |= Q(respa_triggered_within_last_week=False)
+        return position_filter
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            respa_triggered, updated, pk = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            updated = parse_datetime(updated)
+            if updated is None:
+                raise ValueError(encoded)
+            return bool(respa_triggered), updated, int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        respa_triggered, updated, pk = position
+        encoded = base64.urlsafe_b64encode(json.dumps([respa_triggered, updated.isoformat(), pk]))
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
@@ -36,6 +36,20 @@ AdvisorModelSerializer.serializer_field_mapping[models.TextField] = NullableChar
 AdvisorModelSerializer.serializer_field_mapping[models.EmailField] = NullableEmailField
 
 
+class SparseFieldsetMixin(object):
+    """
+    Keeps only the fields named in the `fields`
+    argument, unknown names are ignored.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super(SparseFieldsetMixin, self).__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
 class AddressV1Serializer(AdvisorModelSerializer):
     class Meta:
         model = AddressV1
@@ -360,7 +374,7 @@ class AdvisorLoanProfileV1ComplexSerializer(AdvisorModelSerializer):
             return loan_profile_obj
 
 
-class LoanProfileV1Serializer(AdvisorModelSerializer):
+class LoanProfileV1Serializer(SparseFieldsetMixin, AdvisorModelSerializer):
     borrowers = BorrowerV1Serializer(many=True, required=False)
     new_property_address = AddressV1Serializer(required=False)
     credit_request_responses = CreditRequestResponseSerializer(many=True, required=False)
@@ -390,3 +404,34 @@ class LoanProfileV1SyncInProgressSerializer(AdvisorModelSerializer):
     class Meta:
         model = LoanProfileV1
         fields = ('id', 'encompass_sync_status', 'borrowers',)
+
+
+class CoborrowerV1SummarySerializer(AdvisorModelSerializer):
+    class Meta:
+        model = CoborrowerV1
+        fields = ('id', 'first_name', 'last_name', 'email', 'is_active',)
+
+
+class BorrowerV1SummarySerializer(AdvisorModelSerializer):
+    coborrower = CoborrowerV1SummarySerializer(read_only=True)
+
+    class Meta:
+        model = BorrowerV1
+        fields = ('id', 'first_name', 'last_name', 'email', 'is_active', 'coborrower',)
+
+
+class LoanProfileV1SummarySerializer(SparseFieldsetMixin, AdvisorModelSerializer):
+    """
+    Loan profile list entry with names, statuses and dates only,
+    nothing here needs decryption.
+    """
+    borrowers = BorrowerV1SummarySerializer(many=True, read_only=True)
+    source = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = LoanProfileV1
+        fields = (
+            'id', 'guid', 'created', 'updated', 'purpose_of_loan', 'lock_owner', 'source',
+            'encompass_sync_status', 'datetime_synced_with_encompass', 'respa_triggered_at', 'borrowers',
+        )
+        read_only_fields = fields
@@ -1,6 +1,7 @@
 import datetime
 import logging
 
+from django.conf import settings
 from django.db import transaction
 from django.utils.timezone import now
 
@@ -8,10 +9,13 @@ from celery import group
 from celery.task import task
 
 import box.api_v1 as api
+from advisor_portal import encompass_sync
 from storage.tasks import send_document_to_encompass
 from storage.models import Storage
 from core.models import EncompassSync
+from core.utils import SynchronousTask, advisory_lock
 from loans.models import LoanProfileV1
+from loans.versions import bump_loan_profile_versions
 
 
 logger = logging.getLogger('sample.advisor_portal.tasks')
@@ -32,29 +36,40 @@ def sync_loan_profile_with_encompass(loan_profile_id):
     """
     Celery task to sync the loan profile from sample to Encompass.
 
+    The loan profile is claimed with an advisory lock for the whole sync,
+    see advisor_portal.encompass_sync.
+
     :param loan_profile_id: the GUID of the loan profile
     """
-    # Need to select object for update to prevent modifications
-    # in the time of encompass synchronization.
-    with transaction.atomic():
-        logger.info('ENCOMPASS-SYNC-BEGIN-LOAN-PROFILE LoanProfleV1 object with id %s',
-                    loan_profile_id)
-        loan_profile = _get_loan_profile_with_lock(loan_profile_id)
-        if not loan_profile:
-            logger.info('ENCOMPASS-SYNC-BEGIN No LoanProfleV1 object found with id %s',
-                        loan_profile_id)
+    with advisory_lock(encompass_sync.LOCK_NAMESPACE, loan_profile_id) as acquired:
+        if not acquired:
+            logger.info('ENCOMPASS-SYNC-ALREADY-CLAIMED LoanProfleV1 object with id %s', loan_profile_id)
             return
-        logger.info('ENCOMPASS-SYNC-SET-IN-PROGRESS-FLAG guid %s', loan_profile.guid)
-        loan_profile.encompass_sync_status = LoanProfileV1.ENCOMPASS_SYNC_IN_PROGRESS
-        loan_profile.datetime_sent_to_encompass = now()
-        loan_profile.save(
-            update_fields=['encompass_sync_status', 'datetime_sent_to_encompass']
-        )
-
-    # Now need to select object again because lock is no longer exists.
-    # FIXME: It is possible that some other process may change something
-    #        before loan profile will selected FOR UPDATE again.
-    #        Maybe we should use PostgreSQL's advisory locks.
+        _sync_loan_profile_with_encompass(loan_profile_id)
+
+
+def _sync_loan_profile_with_encompass(loan_profile_id):
+    logger.info('ENCOMPASS-SYNC-BEGIN-LOAN-PROFILE LoanProfleV1 object with id %s',
+                loan_profile_id)
+    loan_profile = LoanProfileV1.objects.filter(id=loan_profile_id).first()
+    if not loan_profile:
+        logger.info('ENCOMPASS-SYNC-BEGIN No LoanProfleV1 object found with id %s',
+                    loan_profile_id)
+        return
+    # an expired or repeated dispatch of a loan profile which was synced meanwhile
+    if loan_profile.encompass_sync_status != LoanProfileV1.ENCOMPASS_READY_TO_SYNC:
+        logger.info('ENCOMPASS-SYNC-NOT-READY guid %s status %s',
+                    loan_profile.guid, loan_profile.encompass_sync_status)
+        return
+    logger.info('ENCOMPASS-SYNC-SET-IN-PROGRESS-FLAG guid %s', loan_profile.guid)
+    loan_profile.encompass_sync_status = LoanProfileV1.ENCOMPASS_SYNC_IN_PROGRESS
+    loan_profile.datetime_sent_to_encompass = now()
+    loan_profile.save(
+        update_fields=['encompass_sync_status', 'datetime_sent_to_encompass']
+    )
+
+    # Other syncs are kept out by the advisory lock, the row lock
+    # prevents modifications in the time of encompass synchronization.
     with transaction.atomic():
         loan_profile = _get_loan_profile_with_lock(loan_profile_id)
         if not loan_profile:
@@ -80,6 +95,8 @@ def sync_loan_profile_with_encompass(loan_profile_id):
             loan_profile.save(update_fields=['encompass_sync_status',
                                              'datetime_synced_with_encompass'])
 
+    encompass_sync.record_sync(loan_profile, successful=exception is None)
+
     # Need to re-raise the exception outside of the `with transaction.atomic()`
     # otherwise, we override setting the status to FAILED on errors.
     if exception:
@@ -106,32 +123,30 @@ def sync_loan_profile_with_encompass(loan_profile_id):
             raise
 
 
-@task
-#pylint disable=C0103
-def sync_all_loan_profiles_with_encompass():
+class SyncAllLoanProfilesWithEncompass(SynchronousTask):
     """
-    Iterate through all loan profiles that have not been synced
-    and sync them with Encompass.
+    Dispatch syncs of the loan profiles ready to sync with Encompass,
+    within the concurrency window and the rate limit,
+    see advisor_portal.encompass_sync.
     """
-    # check to see if encompass sync is enabled
-    if not EncompassSync.enabled():
-        logger.info('ENCOMPASS-SYNC-SKIPPED-NOT-ENABLED')
-        return
+    name = 'advisor_portal.tasks.sync_all_loan_profiles_with_encompass'
+    use_args_in_lock_key = False
 
-    tasks = []
-    # Selecting loan profiles ids which we need to sync with
-    # encompass. We're getting ids instead of objects
-    # to pass id to the subtask. Passing django object
-    # as argument may cause unexpected bugs.
-    loan_profiles_ids = LoanProfileV1.objects.filter(
-        encompass_sync_status__in=[
-            LoanProfileV1.ENCOMPASS_READY_TO_SYNC,
-        ]
-    ).values_list('id', flat=True)
-    for lp_id in loan_profiles_ids:
-        tasks.append(sync_loan_profile_with_encompass.s(lp_id))
-    job = group(*tasks)
-    job.apply_async()
+    def synchronous_run(self):
+        # check to see if encompass sync is enabled
+        if not EncompassSync.enabled():
+            logger.info('ENCOMPASS-SYNC-SKIPPED-NOT-ENABLED')
+            return
+
+        # Passing ids instead of objects to the subtasks,
+        # passing django object as argument may cause unexpected bugs.
+        loan_profiles_ids = encompass_sync.schedule()
+        if loan_profiles_ids:
+            job = group(*[sync_loan_profile_with_encompass.s(lp_id) for lp_id in loan_profiles_ids])
+            job.apply_async(expires=encompass_sync.DISPATCH_EXPIRES)
+
+
+sync_all_loan_profiles_with_encompass = SyncAllLoanProfilesWithEncompass()
 
 
 @task
@@ -146,31 +161,44 @@ def find_stale_in_progress_loan_profiles():
         encompass_sync_status=LoanProfileV1.ENCOMPASS_SYNC_IN_PROGRESS,
         datetime_sent_to_encompass__lte=datetime_now - datetime.timedelta(minutes=5)
     )
-    if loan_profiles:
-        logger.info('ENCOMPASS-SYNC-STALE-LOAN-PROFILES %s',
-                    loan_profiles.values_list('id', flat=True))
-        loan_profiles.update(encompass_sync_status=LoanProfileV1.ENCOMPASS_READY_TO_SYNC)
+    loan_profile_ids = list(loan_profiles.values_list('id', flat=True))
+    if loan_profile_ids:
+        logger.info('ENCOMPASS-SYNC-STALE-LOAN-PROFILES %s', loan_profile_ids)
+        LoanProfileV1.objects.filter(id__in=loan_profile_ids).update(
+            encompass_sync_status=LoanProfileV1.ENCOMPASS_READY_TO_SYNC)
+        # a queryset update sends no signals
+        bump_loan_profile_versions(loan_profile_ids)
 
 
 @task
 #pylint disable=C0103
 def set_ready_to_sync_with_encompass_loan_profiles():
     """
-    Select for update RESPA triggered Loan Profiles.
+    Select RESPA triggered Loan Profiles in batches.
     Prepare them for syncing with Encompass.
     """
     logger.info('SET-READY-TO-SYNC-WITH-ENCOMPASS-LOAN-PROFILES is started.')
-    for loan_profile in LoanProfileV1.objects.filter(
-            _respa_triggered=True,
-            encompass_sync_status=LoanProfileV1.ENCOMPASS_NEVER_SYNCED):
-
-        can_sync = loan_profile.sync_to_encompass()
-        if can_sync:
-            logger.info('SET-READY-TO-SYNC-FLAG guid %s', loan_profile.guid)
-        else:
-            reason = loan_profile.encompass_sync_warnings()
-            logger.warning('READY-TO-SYNC-FLAG was not set, guid %s, reason %s',
-                           loan_profile.guid,
-                           reason)
+    queryset = LoanProfileV1.objects.filter(
+        _respa_triggered=True,
+        encompass_sync_status=LoanProfileV1.ENCOMPASS_NEVER_SYNCED,
+    ).order_by('id')
+    last_id = 0
+    while True:
+        loan_profiles = list(queryset.filter(id__gt=last_id).select_related(
+            'new_property_address'
+        )[:settings.ENCOMPASS_SYNC_BATCH_SIZE])
+        if not loan_profiles:
+            break
+        last_id = loan_profiles[-1].id
+
+        for loan_profile in loan_profiles:
+            can_sync = loan_profile.sync_to_encompass()
+            if can_sync:
+                logger.info('SET-READY-TO-SYNC-FLAG guid %s', loan_profile.guid)
+            else:
+                reason = loan_profile.encompass_sync_warnings()
+                logger.warning('READY-TO-SYNC-FLAG was not set, guid %s, reason %s',
+                               loan_profile.guid,
+                               reason)
 
     logger.info('SET-READY-TO-SYNC-WITH-ENCOMPASS-LOAN-PROFILES is finished.')
@@ -1,14 +1,16 @@
 import datetime
+from contextlib import contextmanager
 import mock
 
+from django.test import override_settings
 from django.utils.timezone import now
 
-from core.tests import CeleryTaskTestCase
+from core.tests import LOCMEM_CACHES, CeleryTaskTestCase
 from core.utils import LogMutingTestMixinBase
 from loans import factories as loans_factories
 from loans.models import LoanProfileV1
 
-from advisor_portal import tasks
+from advisor_portal import encompass_sync, tasks
 
 
 class AdvisorPortalTasksMutingMixin(LogMutingTestMixinBase):
@@ -89,6 +91,63 @@ class TestSyncLoanProfileWithEncompass(AdvisorPortalTasksMutingMixin, CeleryTask
         finally:
             LoanProfileV1.los_sync = los_sync_copy
 
+    @override_settings(ENCOMPASS_SYNC_CONCURRENCY=2)
+    @mock.patch('loans.models.LoanProfileV1.los_sync')
+    def test_sync_within_concurrency_window(self, mocked_los_sync):
+        mocked_los_sync.return_value = 111
+        loans_factories.LoanProfileV1Factory(encompass_sync_status=LoanProfileV1.ENCOMPASS_SYNC_IN_PROGRESS)
+        lp1 = self._create_lp_ready_to_sync()
+        lp2 = self._create_lp_ready_to_sync()
+        task_result = self._call_task()
+        self.assertTrue(task_result.successful())
+        self.assertEqual(mocked_los_sync.call_count, 1)
+        self.assertEncompassSuccessfulSync(lp1.id)
+        self.assertEqual(LoanProfileV1.objects.get(id=lp2.id).encompass_sync_status,
+                         LoanProfileV1.ENCOMPASS_READY_TO_SYNC)
+        self.assertEqual(encompass_sync.get_stats()['backlog'], 2)
+
+    @override_settings(ENCOMPASS_SYNC_RATE=1, ENCOMPASS_SYNC_BURST=2)
+    @mock.patch('loans.models.LoanProfileV1.los_sync')
+    def test_sync_within_rate_limit(self, mocked_los_sync):
+        mocked_los_sync.return_value = 111
+        encompass_sync.get_cache().delete(encompass_sync.BUCKET_KEY)
+        for _ in range(3):
+            self._create_lp_ready_to_sync()
+        self._call_task()
+        self._call_task()
+        self.assertEqual(mocked_los_sync.call_count, 2)
+
+    @mock.patch('loans.models.LoanProfileV1.los_sync')
+    def test_claimed_loan_profile_is_not_synced(self, mocked_los_sync):
+        @contextmanager
+        def claimed(*args):
+            yield False
+
+        lp = self._create_lp_ready_to_sync()
+        with mock.patch('advisor_portal.tasks.advisory_lock', claimed):
+            tasks.sync_loan_profile_with_encompass.delay(lp.id)
+        self.assertFalse(mocked_los_sync.called)
+        self.assertEqual(LoanProfileV1.objects.get(id=lp.id).encompass_sync_status,
+                         LoanProfileV1.ENCOMPASS_READY_TO_SYNC)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TestRecordSync(AdvisorPortalTasksMutingMixin, CeleryTaskTestCase):
+    def test_latency_of_successful_syncs(self):
+        sent = now() - datetime.timedelta(seconds=10)
+        # a failed sync still has the time of the previous sync, which was before it was sent
+        failed = loans_factories.LoanProfileV1Factory(
+            datetime_sent_to_encompass=sent, datetime_synced_with_encompass=sent - datetime.timedelta(days=1))
+        synced = loans_factories.LoanProfileV1Factory(datetime_sent_to_encompass=sent)
+
+        encompass_sync.record_sync(failed, successful=False)
+        encompass_sync.record_sync(synced, successful=True)
+
+        stats = encompass_sync.get_stats()
+        self.assertEqual((stats['synced'], stats['failed']), (1, 1))
+        self.assertGreaterEqual(stats['average_latency'], 10)
+        self.assertLess(stats['average_latency'], 60)
+
 
 class TestFindStaleInProgressLoanProfiles(AdvisorPortalTasksMutingMixin, CeleryTaskTestCase):
     @staticmethod
@@ -123,3 +182,10 @@ class TestFindStaleInProgressLoanProfiles(AdvisorPortalTasksMutingMixin, CeleryT
         self.assertStatusUpdated(lp1.id)
         self.assertStatusUpdated(lp2.id)
         self.assertStatusNotUpdated(lp3.id)
+
+    @mock.patch('advisor_portal.tasks.bump_loan_profile_versions')
+    def test_versions_are_bumped(self, mocked_bump):
+        lp1 = self._create_lp_in_progress(now() - datetime.timedelta(minutes=5))
+        self._create_lp_in_progress(now() - datetime.timedelta(minutes=4, seconds=50))
+        self._call_task()
+        mocked_bump.assert_called_once_with([lp1.id])
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import base64
 import json
 import importlib
 import logging
@@ -15,6 +16,7 @@ from django.test import override_settings, TransactionTestCase
 
 from rest_framework import status
 
+from core.tests import LOCMEM_CACHES
 from core.utils import db_connection_close
 from accounts import factories as accounts_factories
 from loans import factories as loan_factories
@@ -462,6 +464,13 @@ class TestAdvisorLoanProfileV1View(AdvisorAPITestCase, AdvisorCRUDTestMixin):
             HTTP_AUTHORIZATION=self.get_jwt_auth() if with_auth else '',
         )
 
+    def _thumbnails(self, loanprofile_id, ids, with_auth=True):
+        return self.client.get(
+            reverse('advisor-portal:loanprofilev1-thumbnails', args=[loanprofile_id]),
+            data={'ids': ','.join(str(document_id) for document_id in ids)},
+            HTTP_AUTHORIZATION=self.get_jwt_auth() if with_auth else '',
+        )
+
     def _new_property_address(self, loanprofile_id, with_auth=True):
         return self.client.post(
             reverse('advisor-portal:loanprofilev1-new-property-address', args=[loanprofile_id]),
@@ -571,6 +580,43 @@ class TestAdvisorLoanProfileV1View(AdvisorAPITestCase, AdvisorCRUDTestMixin):
         response = self._storage(lp.id)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+    @mock.patch('advisor_portal.views.loan_profile_v1.get_thumbnails')
+    def test_thumbnails(self, mocked_get_thumbnails):
+        lp = loan_factories.LoanProfileV1Factory(advisor=self.user)
+        own_storage, other_storage = storage_factories.StorageFactory(), storage_factories.StorageFactory()
+        own = storage_factories.DocumentFactory.create_batch(2, storage=own_storage)
+        other = storage_factories.DocumentFactory(storage=other_storage)
+        mocked_get_thumbnails.side_effect = lambda documents: {
+            document.id: 'thumbnail' if document.id == own[0].id else None for document in documents}
+
+        with mock.patch('storage.models.Storage.get_loan_profile', autospec=True,
+                        side_effect=lambda storage: lp if storage.id == own_storage.id else None):
+            response = self._thumbnails(lp.id, [own[0].id, own[1].id, other.id])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['thumbnails'], {
+            str(own[0].id): base64.b64encode('thumbnail'),
+            str(own[1].id): None,
+        })
+        self.assertEqual(sorted(document.id for document in mocked_get_thumbnails.call_args[0][0]),
+                         sorted(document.id for document in own))
+
+    def test_thumbnails_invalid_ids_returns_400(self):
+        lp = loan_factories.LoanProfileV1Factory(advisor=self.user)
+        response = self._thumbnails(lp.id, ['a', 'b'])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(BOX_THUMBNAIL_BATCH_SIZE=2)
+    def test_thumbnails_too_many_ids_returns_400(self):
+        lp = loan_factories.LoanProfileV1Factory(advisor=self.user)
+        response = self._thumbnails(lp.id, [1, 2, 3])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_thumbnails_of_another_advisor_returns_404(self):
+        lp = loan_factories.LoanProfileV1Factory()
+        response = self._thumbnails(lp.id, [1])
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_storage_creation_without_auth_returns_401(self):
         lp = loan_factories.LoanProfileV1Factory(advisor=self.user)
         loan_factories.BorrowerV1Factory(loan_profile=lp)
@@ -716,6 +762,179 @@ class TestAdvisorLoanProfileV1View(AdvisorAPITestCase, AdvisorCRUDTestMixin):
         response = self._trigger_respa(lp.id)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def _list(self, data=None, url=None):
+        return self.client.get(
+            url or reverse('advisor-portal:loanprofilev1-list'),
+            HTTP_AUTHORIZATION=self.get_jwt_auth(),
+            data=data,
+        )
+
+    def test_successful_list(self):
+        lps = loan_factories.LoanProfileV1Factory.create_batch(3, advisor=self.user)
+        response = self._list(data={'limit': 2, 'offset': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([item['id'] for item in response.data['results']], [lps[1].id, lps[0].id])
+
+    def test_cursor_list_pages_through_all_loan_profiles(self):
+        lps = loan_factories.LoanProfileV1Factory.create_batch(7, advisor=self.user)
+        LoanProfileV1.objects.filter(id=lps[2].id).update(_respa_triggered=True)
+        expected_ids = [lps[2].id] + [lp.id for lp in reversed(lps) if lp.id != lps[2].id]
+
+        ids, url, data = [], None, {'cursor': '', 'limit': 3}
+        while True:
+            response = self._list(data=data, url=url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            url, data = response.data['next'], None
+            if url is None:
+                break
+        self.assertEqual(ids, expected_ids)
+
+    def test_cursor_list_with_invalid_cursor_returns_404(self):
+        response = self._list(data={'cursor': 'invalid'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_list_with_ordering_returns_400(self):
+        response = self._list(data={'cursor': '', 'ordering': 'updated'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_summary_list(self):
+        lp = loan_factories.LoanProfileV1Factory(advisor=self.user)
+        borrower = loan_factories.BorrowerV1Factory(loan_profile=lp, first_name='Kate', ssn='666121234')
+        loan_factories.CoborrowerV1Factory(borrower=borrower, first_name='John')
+
+        response = self._list(data={'view': 'summary'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        result = response.data['results'][0]
+        self.assertEqual(result['id'], lp.id)
+        self.assertNotIn('new_property_address', result)
+        self.assertEqual(result['borrowers'][0]['first_name'], 'Kate')
+        self.assertNotIn('ssn', result['borrowers'][0])
+        self.assertEqual(result['borrowers'][0]['coborrower']['first_name'], 'John')
+
+    def test_list_with_fields(self):
+        lp = loan_factories.LoanProfileV1Factory(advisor=self.user)
+        loan_factories.BorrowerV1Factory(loan_profile=lp, first_name='Kate')
+
+        response = self._list(data={'fields': 'id,borrowers'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        result = response.data['results'][0]
+        self.assertEqual(set(result), {'id', 'borrowers'})
+        self.assertEqual(result['borrowers'][0]['first_name'], 'Kate')
+
+        response = self._list(data={'view': 'summary', 'fields': 'id,updated'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'updated'})
+
+    def _batch(self, loanprofile_id, operations, with_auth=True):
+        return self.client.patch(
+            reverse('advisor-portal:loanprofilev1-batch', args=[loanprofile_id]),
+            HTTP_AUTHORIZATION=self.get_jwt_auth() if with_auth else '',
+            data={'operations': operations},
+        )
+
+    def test_successful_batch(self):
+        lp = loan_factories.LoanProfileV1Factory(advisor=self.user, purpose_of_loan='purchase')
+        borrower = loan_factories.BorrowerV1Factory(loan_profile=lp, first_name='Kate')
+        coborrower = loan_factories.CoborrowerV1Factory(borrower=borrower)
+        expense = loan_factories.ExpenseV1Factory()
+        borrower.expense.add(expense)
+
+        response = self._batch(lp.id, [
+            {'op': 'replace', 'path': '/', 'value': {'purposeOfLoan': 'refinance'}},
+            {'op': 'replace', 'path': '/borrowers/{}'.format(borrower.id), 'value': {'firstName': 'Anna'}},
+            {'op': 'add', 'path': '/borrowers/{}/income'.format(borrower.id),
+             'value': {'kind': IncomeV1.BONUS, 'value': 100}},
+            {'op': 'add', 'path': '/borrowers/{}/coborrower/income'.format(borrower.id),
+             'value': {'kind': IncomeV1.OTHER, 'value': 200}},
+            {'op': 'remove', 'path': '/borrowers/{}/expense/{}'.format(borrower.id, expense.id)},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['purpose_of_loan'], 'refinance')
+        self.assertEqual(LoanProfileV1.objects.get(id=lp.id).purpose_of_loan, 'refinance')
+        self.assertEqual(BorrowerV1.objects.get(id=borrower.id).first_name, 'Anna')
+        self.assertEqual(list(borrower.income.values_list('kind', flat=True)), [IncomeV1.BONUS])
+        self.assertEqual(list(coborrower.income.values_list('kind', flat=True)), [IncomeV1.OTHER])
+        self.assertFalse(ExpenseV1.objects.filter(id=expense.id).exists())
+
+    def test_invalid_batch_returns_400_and_changes_nothing(self):
+        lp = loan_factories.LoanProfileV1Factory(advisor=self.user, purpose_of_loan='purchase')
+        borrower = loan_factories.BorrowerV1Factory(loan_profile=lp)
+
+        response = self._batch(lp.id, [
+            {'op': 'replace', 'path': '/', 'value': {'purposeOfLoan': 'refinance'}},
+            {'op': 'add', 'path': '/borrowers/{}/income'.format(borrower.id),
+             'value': {'kind': IncomeV1.BONUS, 'value': 100}},
+            {'op': 'add', 'path': '/borrowers/{}/income'.format(borrower.id),
+             'value': {'kind': IncomeV1.BONUS, 'value': 200}},
+            {'op': 'remove', 'path': '/borrowers/{}/unknown/1'.format(borrower.id)},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data['operations']), {2, 3})
+        self.assertEqual(LoanProfileV1.objects.get(id=lp.id).purpose_of_loan, 'purchase')
+        self.assertFalse(borrower.income.exists())
+
+    def test_batch_with_nested_fields_returns_400(self):
+        lp = loan_factories.LoanProfileV1Factory(advisor=self.user)
+        borrower = loan_factories.BorrowerV1Factory(loan_profile=lp)
+        employment = loan_factories.EmploymentV1Factory()
+        borrower.previous_employment.add(employment)
+        address_count = AddressV1.objects.count()
+
+        response = self._batch(lp.id, [
+            {'op': 'replace', 'path': '/borrowers/{}'.format(borrower.id),
+             'value': {'mailingAddress': {'city': 'Austin'}}},
+            {'op': 'add', 'path': '/borrowers/{}/previousEmployment'.format(borrower.id),
+             'value': {'companyName': 'Acme', 'companyAddress': {'city': 'Austin'}}},
+            {'op': 'replace', 'path': '/borrowers/{}/previousEmployment/{}'.format(borrower.id, employment.id),
+             'value': {'address': {'city': 'Austin'}}},
+            {'op': 'add', 'path': '/borrowers/{}/holdingAssets'.format(borrower.id),
+             'value': {'kind': 'checking', 'institutionAddress': {'city': 'Austin'}}},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data['operations']), {0, 1, 2, 3})
+        self.assertEqual(AddressV1.objects.count(), address_count)
+        self.assertEqual(borrower.previous_employment.count(), 1)
+
+    @override_settings(CACHES=LOCMEM_CACHES, LOAN_PROFILE_CACHE_TIMEOUT=60)
+    def test_retrieve_with_response_cache(self):
+        lp = loan_factories.LoanProfileV1Factory(advisor=self.user)
+        borrower = loan_factories.BorrowerV1Factory(loan_profile=lp, first_name='Kate')
+
+        response = self._retrieve(lp.id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        response = self._retrieve(lp.id)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.data['borrowers'][0]['first_name'], 'Kate')
+
+        url = reverse('advisor-portal:loanprofilev1-detail', args=[lp.id])
+        response = self.client.get(url, HTTP_AUTHORIZATION=self.get_jwt_auth(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        borrower.income.add(loan_factories.IncomeV1Factory(kind=IncomeV1.BONUS))
+        response = self.client.get(url, HTTP_AUTHORIZATION=self.get_jwt_auth(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['borrowers'][0]['income'][0]['kind'], IncomeV1.BONUS)
+
+        borrower.first_name = 'Anna'
+        borrower.save()
+        response = self._retrieve(lp.id)
+        self.assertEqual(response.data['borrowers'][0]['first_name'], 'Anna')
+
+    @override_settings(CACHES=LOCMEM_CACHES, LOAN_PROFILE_CACHE_TIMEOUT=60)
+    def test_retrieve_with_response_cache_of_another_advisor_returns_404(self):
+        lp = loan_factories.LoanProfileV1Factory()
+        response = self._retrieve(lp.id)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_batch_of_another_advisor_returns_404(self):
+        lp = loan_factories.LoanProfileV1Factory()
+        response = self._batch(lp.id, [{'op': 'replace', 'path': '/', 'value': {'purposeOfLoan': 'refinance'}}])
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
 ############
 # BORROWER #
 ############
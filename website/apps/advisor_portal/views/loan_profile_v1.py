@@ -1,12 +1,17 @@
+import base64
 import logging
 import datetime
 
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Prefetch, BooleanField, Case, Value, When, Q
+from django.db.models.constants import LOOKUP_SEP
 from django.http import Http404
 
 from rest_framework import viewsets, decorators, status, filters
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.serializers import ValidationError
 from rest_framework.settings import api_settings
 
 from rest_framework_extensions.mixins import NestedViewSetMixin
@@ -15,14 +20,16 @@ from advisor_portal.views.mixins import AdvisorTokenAuthMixin
 from advisor_portal.filters import LoanProfileInProgressFilter
 from advisor_portal.views import CRUD_ACTIONS, ENDPOINT_PROPERTY_METHODS
 from advisor_portal.views.mixins import AdvisorSetMixin
+from advisor_portal.views.loan_profile_v1_batch import LoanProfileBatch
 from advisor_portal.views.loan_profile_v1_common import (
     AdvisorLoanProfileV1BorrowerBaseView, BorrowerResourcesMixin,
     CoborrowerResourcesMixin, CommonAddressView,
     RestrictKindCreation, RestrictIncomesKindCreation,
     HoldingAssetsOwnershipMixin, SelectForUpdateMixin, LiabilitiesRestrictionMixin,
+    LoanProfileResponseCacheMixin,
 )
 from advisor_portal.paginators import (
-    SmallLimitOffsetPagination, LargePagePagination
+    SmallLimitOffsetPagination, LargePagePagination, LoanProfileKeysetPagination,
 )
 from advisor_portal.permissions import (
     AllowAdvisorPermission, LoanProfileModifyOperationsPermission,
@@ -41,6 +48,7 @@ from advisor_portal.serializers.loan_profile_v1 import (
     IncomeV1Serializer,
     LiabilityV1Serializer,
     LoanProfileV1Serializer,
+    LoanProfileV1SummarySerializer,
 )
 from loans.models import (
     AddressV1, BorrowerV1, CoborrowerV1, EmploymentV1, ExpenseV1,
@@ -49,7 +57,8 @@ from loans.models import (
 )
 from mismo_credit.models import CreditRequestResponse
 from mismo_credit.tasks import start_credit_pull
-from box.api_v1 import box_file_get
+from box.api_v1 import box_file_get, get_thumbnails
+from storage.models import Document
 
 logger = logging.getLogger('sample.advisor_portal.views')
 
@@ -59,6 +68,7 @@ logger = logging.getLogger('sample.advisor_portal.views')
 
 
 class AdvisorLoanProfileV1ComplexView(AdvisorTokenAuthMixin,
+                                      LoanProfileResponseCacheMixin,
                                       AdvisorSetMixin,
                                       viewsets.GenericViewSet,
                                       viewsets.mixins.RetrieveModelMixin,
@@ -83,17 +93,16 @@ class AdvisorLoanProfileV1ComplexView(AdvisorTokenAuthMixin,
         headers = self.get_success_headers(serializer.data)
         return Response({'id': serializer.data['id']}, status=status.HTTP_201_CREATED, headers=headers)
 
-    def retrieve(self, request, *args, **kwargs):
+    def get_object(self):
         """
         Overriding to do a hack with related borrower and coborrower
         objects.
         """
-        instance = self.get_object()
+        instance = super(AdvisorLoanProfileV1ComplexView, self).get_object()
         instance.borrower = instance.borrowers.last()
         if instance.borrower:
             instance.coborrower = instance.borrower.coborrower
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        return instance
 
     def get_queryset(self):
         return self.request.user.loan_profilesV1.all()
@@ -109,6 +118,7 @@ advisor_loan_profile_complex_view = AdvisorLoanProfileV1ComplexView.as_view({'ge
 # Main
 
 class AdvisorLoanProfileV1View(AdvisorTokenAuthMixin,
+                               LoanProfileResponseCacheMixin,
                                SelectForUpdateMixin,
                                AdvisorSetMixin,
                                NestedViewSetMixin,
@@ -120,12 +130,19 @@ class AdvisorLoanProfileV1View(AdvisorTokenAuthMixin,
                                viewsets.mixins.DestroyModelMixin):
     """
     Base loan profile view.
+
+    The list is paginated with limit/offset, or with a cursor
+    when the `cursor` query param is passed (empty for the first page).
+    `view=summary` lists names, statuses and dates only, and `fields`
+    restricts the list to comma separated fields; both also restrict
+    what is prefetched.
     """
 
     permission_classes = [IsAuthenticated, AllowAdvisorPermission, LoanProfileModifyOperationsPermission, ]
     serializer_class = LoanProfileV1Serializer
     filter_class = LoanProfileInProgressFilter
     pagination_class = SmallLimitOffsetPagination
+    keyset_pagination_class = LoanProfileKeysetPagination
     filter_backends = [filters.OrderingFilter] + api_settings.DEFAULT_FILTER_BACKENDS
     ordering = ('-respa_triggered_within_last_week', '-updated')
     ordering_fields = ('updated', 'borrowers__first_name', 'borrowers__last_name',)
@@ -171,6 +188,21 @@ class AdvisorLoanProfileV1View(AdvisorTokenAuthMixin,
 
         Prefetch('credit_request_responses'),
     ]
+    summary_serializer_class = LoanProfileV1SummarySerializer
+    summary_prefetch_list = [
+        Prefetch(
+            'borrowers',
+            queryset=BorrowerV1.objects.only(
+                'id', 'loan_profile', 'first_name', 'last_name', 'email', 'is_active',
+            )
+        ),
+        Prefetch(
+            'borrowers__coborrower',
+            queryset=CoborrowerV1.objects.filter(is_active=True).only(
+                'id', 'borrower', 'first_name', 'last_name', 'email', 'is_active',
+            )
+        ),
+    ]
 
     def _get_paginated_lp_ids(self):
         """
@@ -190,6 +222,18 @@ class AdvisorLoanProfileV1View(AdvisorTokenAuthMixin,
         qs = self.filter_queryset(qs)
         return self.paginate_queryset(qs)
 
+    def is_keyset_paginated(self):
+        return (self.keyset_pagination_class is not None and
+                self.keyset_pagination_class.cursor_query_param in self.request.query_params)
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and self.is_keyset_paginated():
+            if api_settings.ORDERING_PARAM in self.request.query_params:
+                raise ValidationError({api_settings.ORDERING_PARAM: 'Ordering is not supported with a cursor.'})
+            self._paginator = self.keyset_pagination_class()
+        return super(AdvisorLoanProfileV1View, self).paginator
+
     def annotate_queryset(self, qs):
         today = datetime.date.today()
         week_ago = today - datetime.timedelta(days=7)
@@ -203,15 +247,16 @@ class AdvisorLoanProfileV1View(AdvisorTokenAuthMixin,
         return qs.annotate(respa_triggered_within_last_week=is_respa_triggered_within_last_week_expr)
 
     def get_paginated_qs(self):
+        """
+        Return loan profiles of the page in the order of the paginated ids,
+        the ids query already did the annotating and ordering.
+        """
         assert hasattr(self, '_get_paginated_lp_ids'), "%s has not '_get_paginated_lp_ids' attribute" % self
-        qs = self.request.user.loan_profilesV1.prefetch_related(
-            *self.prefetch_list
-        ).filter(
-            id__in=self._get_paginated_lp_ids()
-        )
-        qs = self.annotate_queryset(qs)
-        qs = filters.OrderingFilter().filter_queryset(self.request, qs, self)
-        return qs
+        lp_ids = self._get_paginated_lp_ids()
+        loan_profiles = self.request.user.loan_profilesV1.prefetch_related(
+            *self.get_list_prefetch_list()
+        ).in_bulk(lp_ids)
+        return [loan_profiles[lp_id] for lp_id in lp_ids if lp_id in loan_profiles]
 
     def get_queryset(self):
         return self.request.user.loan_profilesV1.prefetch_related(
@@ -220,6 +265,37 @@ class AdvisorLoanProfileV1View(AdvisorTokenAuthMixin,
             **self.qs_filter_kwargs
         )
 
+    def get_response_cache_queryset(self):
+        return self.request.user.loan_profilesV1.filter(**self.qs_filter_kwargs)
+
+    def is_summary(self):
+        return self.action == 'list' and self.request.query_params.get('view') == 'summary'
+
+    def get_list_fields(self):
+        fields = self.request.query_params.get('fields') if self.action == 'list' else None
+        if not fields:
+            return None
+        return [name.strip() for name in fields.split(',') if name.strip()]
+
+    def get_list_prefetch_list(self):
+        prefetch_list = self.summary_prefetch_list if self.is_summary() else self.prefetch_list
+        fields = self.get_list_fields()
+        if fields is None:
+            return prefetch_list
+        return [prefetch for prefetch in prefetch_list
+                if prefetch.prefetch_through.split(LOOKUP_SEP)[0] in fields]
+
+    def get_serializer_class(self):
+        if self.is_summary():
+            return self.summary_serializer_class
+        return super(AdvisorLoanProfileV1View, self).get_serializer_class()
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_list_fields()
+        if fields is not None:
+            kwargs['fields'] = fields
+        return super(AdvisorLoanProfileV1View, self).get_serializer(*args, **kwargs)
+
     def list(self, request, *args, **kwargs):
         """
         Overriding method because we don't need to paginate
@@ -235,6 +311,28 @@ class AdvisorLoanProfileV1View(AdvisorTokenAuthMixin,
         instance.is_active = False
         instance.save()
 
+    def for_update(self):
+        # a batch locks the loan profile once for all of its operations
+        return self.action == 'batch' or super(AdvisorLoanProfileV1View, self).for_update()
+
+    @decorators.detail_route(methods=['patch'])
+    def batch(self, request, *args, **kwargs):
+        """
+        Apply a batch of operations on the loan profile, its borrowers,
+        coborrowers and their resources in one transaction and
+        return the updated loan profile.
+        See advisor_portal.views.loan_profile_v1_batch for the format.
+        """
+        with transaction.atomic():
+            instance = self.get_object()
+            changes = LoanProfileBatch(
+                instance, request.data.get('operations'), BATCH_RESOURCE_VIEWS,
+                context=self.get_serializer_context(),
+            ).apply()
+        logger.info('LOAN-PROFILE-BATCH %s %s', instance.id, changes)
+        serializer = self.get_serializer(self.get_queryset().get(pk=instance.pk))
+        return Response(serializer.data)
+
     # properties
 
     @decorators.detail_route(methods=['post'], permission_classes=[IsAuthenticated, AllowAdvisorPermission])
@@ -326,6 +424,37 @@ class AdvisorLoanProfileV1View(AdvisorTokenAuthMixin,
 
         return Response(data=data, status=resp_status)
 
+    @decorators.detail_route(methods=['get'])
+    def thumbnails(self, request, *args, **kwargs):
+        """
+        Thumbnails of documents of the loan profile, base64 encoded by document id,
+        for up to BOX_THUMBNAIL_BATCH_SIZE ids given as `?ids=1,2,3`.
+        Documents of other loan profiles are left out, failed thumbnails are null.
+        """
+        instance = self.get_object()
+        try:
+            ids = {int(value) for value in request.query_params.get('ids', '').split(',') if value}
+        except ValueError:
+            raise ValidationError({'ids': 'A comma separated list of document ids is required.'})
+        if len(ids) > settings.BOX_THUMBNAIL_BATCH_SIZE:
+            raise ValidationError(
+                {'ids': 'At most {} documents are allowed.'.format(settings.BOX_THUMBNAIL_BATCH_SIZE)})
+
+        documents, storage_loan_profiles = [], {}
+        for document in Document.objects.filter(id__in=ids, is_deleted=False).select_related('storage'):
+            if document.storage_id not in storage_loan_profiles:
+                loan_profile = document.storage.get_loan_profile()
+                storage_loan_profiles[document.storage_id] = loan_profile and loan_profile.id
+            if storage_loan_profiles[document.storage_id] == instance.id:
+                documents.append(document)
+
+        thumbnails = get_thumbnails(documents)
+        data = {'thumbnails': {
+            str(document_id): base64.b64encode(content) if content is not None else None
+            for document_id, content in thumbnails.items()
+        }}
+        return Response(data)
+
     @decorators.detail_route(methods=['post'])
     def unlock_loan(self, *args, **kwargs):
         instance = self.get_object()
@@ -345,6 +474,7 @@ class AdvisorLoanProfileV1SyncInProgressView(AdvisorLoanProfileV1View):
     permission_classes = [IsAuthenticated, AllowAdvisorPermission, ]
     serializer_class = LoanProfileV1Serializer
     pagination_class = LargePagePagination
+    keyset_pagination_class = None
     ordering = ('-updated')
 
     qs_filter_kwargs = {
@@ -696,3 +826,18 @@ class CoborrowerLiabilitiesView(LiabilitiesRestrictionMixin, CoborrowerResources
     serializer_class = LiabilityV1Serializer
     model = LiabilityV1
     m2m_rel_attr = 'liabilities'
+
+
+# Resources of AdvisorLoanProfileV1View.batch, coborrower views share the same configuration
+BATCH_RESOURCE_VIEWS = {
+    view.m2m_rel_attr: view for view in (
+        BorrowerPreviousAddressesView,
+        BorrowerPreviousEmploymentsView,
+        BorrowerHoldingAssetsView,
+        BorrowerVehicleAssetsView,
+        BorrowerInsuranceAssetsView,
+        BorrowerIncomesView,
+        BorrowerExpensesView,
+        BorrowerLiabilitiesView,
+    )
+}
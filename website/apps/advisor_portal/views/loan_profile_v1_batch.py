@@ -0,0 +1,298 @@
+"""
+Batch editing of a loan profile graph in a single request.
+
+A batch is a JSON-Patch like list of operations, for example:
+
+    {"operations": [
+        {"op": "replace", "path": "/", "value": {"purposeOfLoan": "refinance"}},
+        {"op": "replace", "path": "/borrowers/12", "value": {"firstName": "Kate"}},
+        {"op": "replace", "path": "/borrowers/12/coborrower/mailingAddress", "value": {"city": "Austin"}},
+        {"op": "add", "path": "/borrowers/12/income", "value": {"kind": "base", "value": 1000}},
+        {"op": "replace", "path": "/borrowers/12/liabilities/7", "value": {"comment": "Paid off"}},
+        {"op": "remove", "path": "/borrowers/12/coborrower/expense/3"}
+    ]}
+
+Paths follow the keys of the loan profile representation.
+Resources and properties are configured by their nested views, so the same
+serializers, count maximums, kind and editability restrictions apply.
+
+All operations are validated before anything is written. Then replaces are
+applied in order, adds are inserted with one bulk insert per owner and resource,
+and removes are deleted with one query per resource.
+"""
+from collections import namedtuple, OrderedDict
+
+from rest_framework import serializers
+
+from core.parsers import camel_to_underscore
+from loans.models import BorrowerV1, CoborrowerV1, LoanProfileV1
+from advisor_portal.serializers.loan_profile_v1 import (
+    BorrowerV1Serializer, CoborrowerV1Serializer, LoanProfileV1Serializer,
+)
+from advisor_portal.views.loan_profile_v1_common import (
+    CommonAddressView, CommonContactView, CommonDemographicsView,
+)
+
+OP_ADD = 'add'
+OP_REPLACE = 'replace'
+OP_REMOVE = 'remove'
+
+Target = namedtuple('Target', ['kind', 'owner', 'attr', 'view', 'object_id'])
+
+# Target kinds, with their allowed operations
+OWNER = 'owner'
+PROPERTY = 'property'
+RESOURCE_LIST = 'resource_list'
+RESOURCE = 'resource'
+ALLOWED_OPERATIONS = {
+    OWNER: (OP_REPLACE,),
+    PROPERTY: (OP_REPLACE,),
+    RESOURCE_LIST: (OP_ADD,),
+    RESOURCE: (OP_REPLACE, OP_REMOVE),
+}
+
+
+class OperationError(Exception):
+    pass
+
+
+class LoanProfileBatch(object):
+    """
+    Validates and applies a batch of operations to a loan profile,
+    which is expected to be locked by the caller.
+    """
+
+    max_operations = 100
+
+    # (co)borrower foreign keys and their property views
+    properties = {
+        'mailing_address': CommonAddressView,
+        'demographics': CommonDemographicsView,
+        'realtor': CommonContactView,
+    }
+    owner_serializers = {
+        LoanProfileV1: LoanProfileV1Serializer,
+        BorrowerV1: BorrowerV1Serializer,
+        CoborrowerV1: CoborrowerV1Serializer,
+    }
+
+    def __init__(self, loan_profile, operations, resources, context=None):
+        """
+        `resources` maps (co)borrower many to many attributes to their resource views.
+        """
+        self.loan_profile = loan_profile
+        self.operations = operations
+        self.resources = resources
+        self.context = context or {}
+        self._borrowers = None
+        self._resources = {}
+
+    # resolving
+
+    @property
+    def borrowers(self):
+        if self._borrowers is None:
+            # prefetch instead of select_related, to keep encrypted fields deferred
+            borrowers = self.loan_profile.borrowers.filter(is_active=True).prefetch_related('coborrower')
+            self._borrowers = {borrower.id: borrower for borrower in borrowers}
+        return self._borrowers
+
+    def get_resources(self, owner, attr):
+        """Return owner resources by id, loaded once per owner and attribute."""
+        key = (owner.__class__, owner.pk, attr)
+        if key not in self._resources:
+            self._resources[key] = OrderedDict((item.id, item) for item in getattr(owner, attr).all())
+        return self._resources[key]
+
+    @staticmethod
+    def parse_id(segment):
+        try:
+            return int(segment)
+        except ValueError:
+            raise OperationError('Invalid id "{}".'.format(segment))
+
+    def resolve(self, path):
+        segments = [camel_to_underscore(segment) for segment in path.strip('/').split('/') if segment]
+        if not segments:
+            return Target(OWNER, self.loan_profile, None, None, None)
+        if segments == ['new_property_address']:
+            return Target(PROPERTY, self.loan_profile, 'new_property_address', CommonAddressView, None)
+        if segments[0] != 'borrowers' or len(segments) < 2:
+            raise OperationError('Unknown path "{}".'.format(path))
+
+        owner = self.borrowers.get(self.parse_id(segments[1]))
+        if owner is None:
+            raise OperationError('Borrower "{}" does not exist.'.format(segments[1]))
+        rest = segments[2:]
+        if rest[:1] == ['coborrower']:
+            owner = owner.get_active_coborrower()
+            if owner is None:
+                raise OperationError('Borrower "{}" has no coborrower.'.format(segments[1]))
+            rest = rest[1:]
+
+        if not rest:
+            return Target(OWNER, owner, None, None, None)
+        attr = rest[0]
+        if attr in self.properties and len(rest) == 1:
+            return Target(PROPERTY, owner, attr, self.properties[attr], None)
+        if attr in self.resources and len(rest) == 1:
+            return Target(RESOURCE_LIST, owner, attr, self.resources[attr], None)
+        if attr in self.resources and len(rest) == 2:
+            object_id = self.parse_id(rest[1])
+            if object_id not in self.get_resources(owner, attr):
+                raise OperationError('{} "{}" does not exist.'.format(attr, object_id))
+            return Target(RESOURCE, owner, attr, self.resources[attr], object_id)
+        raise OperationError('Unknown path "{}".'.format(path))
+
+    # validation
+
+    def get_serializer(self, serializer_class, *args, **kwargs):
+        kwargs['context'] = self.context
+        return serializer_class(*args, **kwargs)
+
+    @staticmethod
+    def check_nested_fields(target, serializer, value):
+        """
+        Reject nested serializer fields: some of them write on validation, before the whole batch is valid,
+        and nested updates are not supported.
+        """
+        nested = ', '.join(sorted(
+            key for key in value if isinstance(serializer.fields.get(key), serializers.BaseSerializer)))
+        if nested and target.kind == OWNER:
+            raise OperationError('Nested fields can not be changed here, use their paths: {}.'.format(nested))
+        if nested:
+            raise OperationError('Nested fields can not be changed in a batch: {}.'.format(nested))
+
+    def validate_operation(self, operation):
+        if not isinstance(operation, dict):
+            raise OperationError('Operation must be an object.')
+        op, path, value = operation.get('op'), operation.get('path'), operation.get('value')
+        if not isinstance(path, basestring):
+            raise OperationError('Path is required.')
+        target = self.resolve(path)
+        if op not in ALLOWED_OPERATIONS[target.kind]:
+            raise OperationError('Operation "{}" is not allowed on "{}".'.format(op, path))
+        if op != OP_REMOVE and not isinstance(value, dict):
+            raise OperationError('Value must be an object.')
+
+        if target.kind == OWNER:
+            serializer = self.get_serializer(
+                self.owner_serializers[target.owner.__class__], target.owner, data=value, partial=True)
+        elif target.kind == PROPERTY:
+            instance = getattr(target.owner, target.attr)
+            serializer = self.get_serializer(
+                target.view.serializer_class, instance, data=value, partial=instance is not None)
+        elif target.kind == RESOURCE_LIST:
+            serializer = self.get_serializer(target.view.serializer_class, data=value)
+        elif op == OP_REPLACE:
+            instance = self.get_resources(target.owner, target.attr)[target.object_id]
+            self.check_editable(target, instance, value)
+            serializer = self.get_serializer(target.view.serializer_class, instance, data=value, partial=True)
+        else:
+            serializer = None
+
+        if serializer is not None:
+            self.check_nested_fields(target, serializer, value)
+            if not serializer.is_valid():
+                raise OperationError(serializer.errors)
+        return op, target, serializer
+
+    @staticmethod
+    def check_editable(target, instance, value):
+        """Apply LiabilitiesRestrictionMixin rules of the resource view."""
+        allowed_fields = getattr(target.view, 'allowed_to_change_fields', None)
+        if allowed_fields is None or getattr(instance, 'is_editable', True):
+            return
+        not_allowed_keys = [key for key in value
+                            if key not in allowed_fields and not (key == 'id' and value[key] == instance.id)]
+        if not_allowed_keys:
+            raise OperationError(
+                "Liability entry is not editable. "
+                "Can not change following fields: {0}.".format(", ".join(not_allowed_keys)))
+
+    def check_resource_lists(self, validated):
+        """Apply count maximum and kind restrictions to the resulting resource lists."""
+        errors = {}
+        lists = OrderedDict()
+        for index, (op, target, serializer) in validated:
+            if target.kind in (RESOURCE_LIST, RESOURCE):
+                lists.setdefault((target.owner.__class__, target.owner.pk, target.attr), []).append(
+                    (index, op, target, serializer))
+
+        for entries in lists.values():
+            _, _, target, _ = entries[0]
+            existing = self.get_resources(target.owner, target.attr)
+            removed = {entry_target.object_id for _, op, entry_target, _ in entries if op == OP_REMOVE}
+            count = len(existing) - len(removed)
+            allowed_kinds = getattr(target.view, 'allowed_kinds', None)
+            if allowed_kinds is not None:
+                kinds = {item.kind for item_id, item in existing.items() if item_id not in removed}
+            for index, op, _, serializer in entries:
+                if op != OP_ADD:
+                    continue
+                count += 1
+                if count > target.view.instance_count_maximum:
+                    errors[index] = 'Maximum of {} {} reached.'.format(
+                        target.view.instance_count_maximum, target.attr)
+                kind = serializer.validated_data.get('kind')
+                if allowed_kinds is not None and kind:
+                    if kind.lower() not in allowed_kinds and kind in kinds:
+                        errors[index] = 'Item with kind \'{}\' already exists.'.format(kind)
+                    kinds.add(kind)
+        return errors
+
+    def validate(self):
+        if not isinstance(self.operations, list) or not self.operations:
+            raise serializers.ValidationError({'operations': 'A list of operations is required.'})
+        if len(self.operations) > self.max_operations:
+            raise serializers.ValidationError(
+                {'operations': 'At most {} operations are allowed.'.format(self.max_operations)})
+
+        validated, errors = [], {}
+        for index, operation in enumerate(self.operations):
+            try:
+                validated.append((index, self.validate_operation(operation)))
+            except OperationError as exc:
+                errors[index] = exc.args[0]
+        errors.update(self.check_resource_lists(validated))
+        if errors:
+            raise serializers.ValidationError({'operations': errors})
+        return validated
+
+    # applying
+
+    def apply(self):
+        """Validate all operations then apply them, return counts of changes."""
+        validated = self.validate()
+        added, removed = OrderedDict(), OrderedDict()
+        replaced = 0
+        for _, (op, target, serializer) in validated:
+            if op == OP_REPLACE:
+                self.apply_replace(target, serializer)
+                replaced += 1
+            elif op == OP_ADD:
+                added.setdefault((target.owner, target.attr), []).append(serializer)
+            else:
+                removed.setdefault(target.view.model, []).append(target.object_id)
+
+        for (owner, attr), serializer_list in added.items():
+            model = self.resources[attr].model
+            instances = model.objects.bulk_create(
+                [model(**serializer.validated_data) for serializer in serializer_list])
+            getattr(owner, attr).add(*instances)
+        for model, ids in removed.items():
+            model.objects.filter(id__in=ids).delete()
+
+        return {
+            'replaced': replaced,
+            'added': sum(len(serializer_list) for serializer_list in added.values()),
+            'removed': sum(len(ids) for ids in removed.values()),
+        }
+
+    @staticmethod
+    def apply_replace(target, serializer):
+        created = serializer.instance is None
+        instance = serializer.save()
+        if target.kind == PROPERTY and created:
+            setattr(target.owner, target.attr, instance)
+            target.owner.save(update_fields=[target.attr])
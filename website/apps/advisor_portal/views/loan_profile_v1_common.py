@@ -1,10 +1,13 @@
 from django.db.models import Prefetch
 from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags, quote_etag
 
 from rest_framework import decorators, response, status, validators, viewsets
 from rest_framework.permissions import BasePermission, IsAuthenticated
 from rest_framework_extensions.mixins import NestedViewSetMixin
 
+from advisor_portal.cache import LoanProfileResponseCache
 from advisor_portal.permissions import AllowAdvisorPermission, ModifyOperationsPermission
 from advisor_portal.serializers.loan_profile_v1 import (
     AddressV1Serializer, DemographicsV1Serializer, EmploymentV1Serializer,
@@ -67,6 +70,51 @@ class SelectForUpdateMixin(object):
         return 'HTTP_X_FOR_UPDATE' in self.request._request.META
 
 
+class LoanProfileResponseCacheMixin(object):
+    """
+    Serve loan profile details from the encrypted response cache,
+    with an ETag; a matching If-None-Match gets a 304.
+    See advisor_portal.cache.
+    """
+
+    response_cache_endpoint = None
+
+    def get_response_cache(self):
+        return LoanProfileResponseCache(self.response_cache_endpoint or self.__class__.__name__)
+
+    def get_response_cache_queryset(self):
+        return self.request.user.loan_profilesV1.all()
+
+    def get_response_cache_object(self):
+        """
+        Return the loan profile without prefetching its graph,
+        to check permissions before the cache is used.
+        """
+        lookup_value = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        lookup_field = 'guid' if core_utils.is_uuid4(lookup_value) else self.lookup_field
+        queryset = self.get_response_cache_queryset().only('id', 'encompass_sync_status')
+        obj = get_object_or_404(queryset, **{lookup_field: lookup_value})
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    def retrieve(self, request, *args, **kwargs):
+        response_cache = self.get_response_cache()
+        if not response_cache.enabled:
+            return super(LoanProfileResponseCacheMixin, self).retrieve(request, *args, **kwargs)
+
+        # the version stamp is read before the loan profile, a change in between only makes the entry unreachable
+        etag = response_cache.get_etag(self.get_response_cache_object().id, request.user.id)
+        headers = {'ETag': quote_etag(etag), 'Cache-Control': 'private, no-cache'}
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')) and response_cache.has(etag):
+            return response.Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        data = response_cache.get(etag)
+        if data is None:
+            data = super(LoanProfileResponseCacheMixin, self).retrieve(request, *args, **kwargs).data
+            response_cache.set(etag, data)
+        return response.Response(data, headers=headers)
+
+
 # Property-like common views
 class CommonPropertyLikeView(AdvisorTokenAuthMixin,
                              SelectForUpdateMixin,
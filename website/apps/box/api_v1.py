@@ -7,9 +7,14 @@ import requests
 
 from boxsdk.exception import BoxAPIException
 from boxsdk.object.collaboration import CollaborationRole
+from boxsdk.object.folder import Folder
+from concurrent.futures import ThreadPoolExecutor
 
+from django.conf import settings
 from django.utils.encoding import force_text
 
+from box.cache import forget_folder, get_subfolder_id, set_subfolder_id
+from box.thumbnails import ThumbnailCache
 from box.utils import box_client_factory
 from core.utils import is_sample_email
 from core.exceptions import ServiceInternalErrorException, ServiceUnavailableException
@@ -111,6 +116,28 @@ def box_exception_handler(custom_log=None):
     return wrapper
 
 
+def box_calls_run(calls, workers=None):
+    """
+    Run Box API calls concurrently.
+
+    :param calls: List of (function, args) tuples. Functions must not use the database,
+        threads have database connections of their own.
+    :param workers: Maximum number of threads. Defaults to BOX_PROVISIONING_WORKERS
+    :return: List of results, in the order of calls
+
+    :raises: The exception of the first failed call, once all calls are done
+    """
+    workers = min(workers or settings.BOX_PROVISIONING_WORKERS, len(calls))
+    if workers <= 1:
+        return [func(*args) for func, args in calls]
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = [executor.submit(func, *args) for func, args in calls]
+        return [future.result() for future in futures]
+    finally:
+        executor.shutdown()
+
+
 @box_exception_handler('file {box_file.object_id} folder {box_folder.object_id}')
 def box_file_move(box_file, box_folder):
     """
@@ -267,7 +294,11 @@ def box_folder_save(parent, name, acls, may_exist=False, description=None):
     try:
         box_folder = parent.create_subfolder(name)
         logger.debug('FOLDER-CREATED parent %s name %s', parent.object_id, name)
+        set_subfolder_id(parent.object_id, name, box_folder.id)
     except BoxAPIException as exc:
+        if exc.code == 'item_name_in_use':
+            # cached subfolders of the parent are out of date
+            forget_folder(parent.object_id)
         # If folder exists get it
         if may_exist and (exc.code == 'item_name_in_use'):
             box_folder = box_subfolder_get(parent, name)
@@ -343,8 +374,8 @@ def advisor_loan_folder_create(parent_folder, advisor):
     folder_name = ADVISOR_LOAN_FOLDER_FORMAT.format(advisor.username)
     acls = [(force_text(advisor.email), ADVISOR_ACL)]
     folder = box_folder_save(parent_folder, folder_name, acls)
-    for folder_name in ADVISOR_LOAN_SUBFOLDERS.values():
-        box_folder_save(folder, folder_name, acls=None, may_exist=True)
+    box_calls_run([(box_folder_save, (folder, folder_name, None, True))
+                   for folder_name in ADVISOR_LOAN_SUBFOLDERS.values()])
     return folder
 
 
@@ -412,11 +443,14 @@ def customer_loan_internal_folders_create(folder_name_base, parent_folder):
     :param folder_name_base: Base folder name. Use from generation full folder name
     :param parent_folder: Box folder object in which you want to create an subfolders
     :return: None
+
+    Note: Subfolders are created concurrently, see box_calls_run
     """
     acls = []
-    for key, folder_fmt in CUSTOMER_INTERNAL_SUBFOLDERS_FORMATS.items():
-        folder_name = folder_fmt.format(folder_name_base)
-        box_folder = box_folder_save(parent_folder, folder_name, acls)
+    subfolders = CUSTOMER_INTERNAL_SUBFOLDERS_FORMATS.items()
+    box_folders = box_calls_run([(box_folder_save, (parent_folder, folder_fmt.format(folder_name_base), acls))
+                                 for _, folder_fmt in subfolders])
+    for (key, _), box_folder in zip(subfolders, box_folders):
         if key == SUBMISSION:
             # Cyclic import. This file imported in models.py app storage
             from storage.models import Storage
@@ -480,15 +514,20 @@ def box_folder_acls_set(folder, acls):
     :return: None
 
     :raises BoxAPIException: Raise if box api response 4xx or 5xx http code
+
+    Note: Collaborators are added concurrently, see box_calls_run
     """
-    for email, role in acls:
-        try:
-            folder.add_collaborator(email, role, True if is_sample_email(email) else False)
-        except BoxAPIException as exc:
-            email = email if is_sample_email(email) else 'email_blocked_since_not_sample_email'
-            if getattr(exc, 'code', None) != 'user_already_collaborator':
-                logger.error('FOLDER-ACL-SET-EXCEPTION %s email %s exc %s', folder.object_id, email, exc)
-                raise
+    box_calls_run([(_box_folder_acl_add, (folder, email, role)) for email, role in acls])
+
+
+def _box_folder_acl_add(folder, email, role):
+    try:
+        folder.add_collaborator(email, role, True if is_sample_email(email) else False)
+    except BoxAPIException as exc:
+        email = email if is_sample_email(email) else 'email_blocked_since_not_sample_email'
+        if getattr(exc, 'code', None) != 'user_already_collaborator':
+            logger.error('FOLDER-ACL-SET-EXCEPTION %s email %s exc %s', folder.object_id, email, exc)
+            raise
 
 
 @service_unavailable_notification(service_name='Box', custom_log='{loan_profile.guid}')
@@ -523,7 +562,15 @@ def box_subfolder_get(parent_folder, subfolder_name, should_exist=False):
     :param subfolder_name: Name subfolder
     :param should_exist: If True add warning logging. Defaults to False
     :return: Box folder on success; None if subfolder not found in parent folder
+
+    Note: Found subfolders are cached, see box.cache
     """
+    folder_id = get_subfolder_id(parent_folder.object_id, subfolder_name)
+    if folder_id is not None:
+        # pylint: disable=protected-access
+        return Folder(box_client_factory()._session, folder_id,
+                      {'type': 'folder', 'id': folder_id, 'name': subfolder_name})
+
     try:
         folder_items = parent_folder.get_items(FOLDER_ITEMS_LIMIT)
     except BoxAPIException as exc:
@@ -532,6 +579,8 @@ def box_subfolder_get(parent_folder, subfolder_name, should_exist=False):
 
     for entry in folder_items:
         if entry.name == subfolder_name:
+            if getattr(entry, 'type', None) == 'folder':
+                set_subfolder_id(parent_folder.object_id, subfolder_name, entry.id)
             break
     else:
         if should_exist:
@@ -573,6 +622,7 @@ def customer_loan_external_folders_create(customer, parent_folder, folder_name_b
 
     customer_external_folder = box_folder_copy(template_folder, parent_folder)
     box_folder_rename(customer_external_folder, external_folder_name)
+    set_subfolder_id(parent_folder.object_id, external_folder_name, customer_external_folder.id)
     if customer.email:
         customer_acl = [(customer.email, CUSTOMER_ACL)]
         box_folder_acls_set(customer_external_folder, customer_acl)
@@ -848,6 +898,36 @@ def get_thumbnail(document_obj):
     :param document_obj: Document model object
     :return: Content thumbnail ob success; None if box api response 4xx or 5xx http code
 
+    Note: Thumbnails are cached, see box.thumbnails
+    """
+    thumbnail_cache = ThumbnailCache()
+    content = thumbnail_cache.get(document_obj)
+    if content is None:
+        content = _thumbnail_fetch(document_obj)
+        thumbnail_cache.set(document_obj, content)
+    return content
+
+
+def get_thumbnails(documents):
+    """
+    Get thumbnails of many box files, the ones not cached are fetched concurrently.
+
+    :param documents: List of Document model objects
+    :return: Dict of thumbnail contents by document id, None for failed ones
+    """
+    thumbnail_cache = ThumbnailCache()
+    thumbnails = thumbnail_cache.get_many(documents)
+    missing = [document for document in documents if document.id not in thumbnails]
+    if missing:
+        contents = box_calls_run([(_thumbnail_fetch, (document,)) for document in missing],
+                                 workers=settings.BOX_THUMBNAIL_WORKERS)
+        thumbnail_cache.set_many(dict(zip(missing, contents)))
+        thumbnails.update((document.id, content) for document, content in zip(missing, contents))
+    return thumbnails
+
+
+def _thumbnail_fetch(document_obj):
+    """
     Note: Eating exceptions like BoxAPIException and requests.exceptions.RequestException
     """
     box_client = box_client_factory()
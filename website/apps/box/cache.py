@@ -0,0 +1,62 @@
+'''
+Cache of Box folder trees.
+
+Subfolder ids are cached by parent folder id and subfolder name, so looking a subfolder up does not list the
+parent folder. Entries of a parent are stamped with a version of the parent (see core.version_stamps):
+forgetting a parent drops its stamp, every name cached under it becomes unreachable at once.
+
+A parent is forgotten when Box answers item_name_in_use for it, see box.api_v1.box_folder_save, and when Box
+reports an item of it was deleted, see box.views.BoxEventCallback.
+Entries are only kept while BOX_FOLDER_CACHE_TIMEOUT is set.
+'''
+
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core.version_stamps import drop_version_stamps, get_version_stamp
+
+logger = logging.getLogger('sample.box.cache')
+
+VERSION_KEY = 'box.folder.{}.version'
+SUBFOLDER_KEY = 'box.folder.{}.{}.{}'
+
+
+def folder_cache_enabled():
+    return bool(settings.BOX_FOLDER_CACHE_TIMEOUT)
+
+
+def get_cache():
+    return caches[settings.BOX_FOLDER_CACHE_NAME]
+
+
+def _get_version(parent_id):
+    return get_version_stamp(get_cache(), VERSION_KEY.format(parent_id), settings.BOX_FOLDER_CACHE_TIMEOUT)
+
+
+def _get_key(parent_id, name):
+    name_digest = hashlib.sha1(name.encode('utf-8')).hexdigest()
+    return SUBFOLDER_KEY.format(parent_id, _get_version(parent_id), name_digest)
+
+
+def get_subfolder_id(parent_id, name):
+    '''Return the cached id of the named subfolder of the parent, None when unknown.'''
+    if not folder_cache_enabled():
+        return None
+    folder_id = get_cache().get(_get_key(parent_id, name))
+    logger.debug('BOX-FOLDER-CACHE-%s parent %s', 'MISS' if folder_id is None else 'HIT', parent_id)
+    return folder_id
+
+
+def set_subfolder_id(parent_id, name, folder_id):
+    if folder_cache_enabled():
+        get_cache().set(_get_key(parent_id, name), folder_id, settings.BOX_FOLDER_CACHE_TIMEOUT)
+
+
+def forget_folder(parent_id):
+    '''Forget every subfolder cached under the parent.'''
+    if folder_cache_enabled():
+        drop_version_stamps(get_cache(), [VERSION_KEY.format(parent_id)])
+        logger.debug('BOX-FOLDER-CACHE-FORGOTTEN parent %s', parent_id)
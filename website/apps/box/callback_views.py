@@ -8,7 +8,7 @@ from django.http import HttpResponseRedirect
 from django.http import HttpResponseServerError
 from django.views.generic import View
 
-from .utils import store_tokens_callback
+from .utils import token_store
 
 
 BOX_API_OAUTH_STATE_SESSION_NAME = 'box_oauth_state'
@@ -47,7 +47,7 @@ class OAuthRedirectUrlSelf(View):
             # TODO need review. Asana #287939142987747
             oauth = OAuth2(settings.BOX_API_OAUTH_CLIENT_ID,
                            settings.BOX_API_OAUTH_CLIENT_SECRET,
-                           store_tokens=store_tokens_callback)
+                           store_tokens=token_store.store)
             try:
                 _, refresh_token = oauth.authenticate(request_code)
             except BoxException as exc:
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('box', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoxEventWatermark',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_event_id', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Box Event Watermark',
+            },
+        ),
+    ]
@@ -1,8 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 
 from core.models import TimeStampedModel
 
 from model_utils import Choices
+from solo.models import SingletonModel
 
 
 class BoxEvent(TimeStampedModel):
@@ -28,9 +29,21 @@ class BoxEvent(TimeStampedModel):
 
     def run_processing(self):
         if not self.is_processed:
-            from .tasks import delete_document_by_box_event, create_document_by_box_event
+            from .tasks import sync_unprocessed_box_events
 
-            if self.box_event_type == self.BOX_EVENT_TYPE_CHOICES.deleted:
-                delete_document_by_box_event.delay(self.id)
-            elif self.box_event_type == self.BOX_EVENT_TYPE_CHOICES.uploaded:
-                create_document_by_box_event.delay(self.id)
+            # events are processed in batches, a run already in progress picks this one up as well;
+            # queued once the event is committed, so the run can read it
+            transaction.on_commit(sync_unprocessed_box_events.delay)
+
+
+class BoxEventWatermark(SingletonModel):
+    """
+    High-water mark of Box events processing: every event up to last_event_id is processed.
+    """
+    last_event_id = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return "last event id: {}".format(self.last_event_id)
+
+    class Meta:
+        verbose_name = "Box Event Watermark"
@@ -1,16 +1,29 @@
 import logging
+from collections import defaultdict, OrderedDict
+from datetime import timedelta
 
+import requests
+from boxsdk.exception import BoxAPIException
 from celery.exceptions import Retry
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
 
 from box.api_v1 import box_file_get
-from box.models import BoxEvent
+from box.models import BoxEvent, BoxEventWatermark
 from encompass.client import EncompassClient
 from storage.tasks import send_document_to_encompass
 from storage.models import Document, DocumentType
+from core.exceptions import ServiceUnavailableException
 from core.utils import SynchronousTask
 
 logger = logging.getLogger('sample.box.tasks')
 
+# Box file info which could not be fetched now, the event is processed again by the next run
+UNAVAILABLE = object()
+
 
 class DeleteDocumentByBoxEvent(SynchronousTask):
     """
@@ -31,26 +44,177 @@ class DeleteDocumentByBoxEvent(SynchronousTask):
 
 
 class SyncUnprocessedBoxEvents(SynchronousTask):
+    """
+    Process Box events in batches, from the high-water mark on.
+
+    Events of a batch are coalesced by storage and document, the last event of a document wins.
+    Box file info of uploaded documents is fetched concurrently, documents are upserted in bulk.
+    Uploads to storages with documents in transmission, and uploads whose Box file info is temporarily
+    unavailable, are deferred: the run stops after their batch, so no later event of their document is applied
+    first, and the high-water mark stops before them so the next run processes them again.
+
+    Webhook requests may commit events out of id order. The high-water mark only passes events created more than
+    BOX_EVENTS_WATERMARK_LAG seconds ago, so an event committed late below newer ones is still read by a later run.
+    """
     use_args_in_lock_key = False
 
-    def synchronous_run(self, offset_event_id=None, limit=1000):
+    _log_prefix = 'SYNC-UNPROCESSED-BOX-EVENTS'
+
+    def synchronous_run(self, max_batches=None):
+        max_batches = max_batches or settings.BOX_EVENTS_MAX_BATCHES
+        watermark = BoxEventWatermark.get_solo()
+        last_event_id, first_deferred_id = watermark.last_event_id, None
+
+        for _ in range(max_batches):
+            events = list(BoxEvent.objects.filter(
+                id__gt=last_event_id, is_processed=False
+            ).select_related('storage').order_by('id')[:settings.BOX_EVENTS_BATCH_SIZE])
+            if not events:
+                break
+            deferred_ids = self.process_batch(events)
+            last_event_id = events[-1].id
+            if deferred_ids:
+                first_deferred_id = min(deferred_ids)
+                break
+
+        if first_deferred_id is not None:
+            last_event_id = first_deferred_id - 1
+        last_event_id = min(last_event_id, self.get_settled_event_id(last_event_id))
+        if last_event_id > watermark.last_event_id:
+            watermark.last_event_id = last_event_id
+            watermark.save(update_fields=['last_event_id'])
+        logger.info('%s watermark %s', self._log_prefix, watermark.last_event_id)
+
+    @staticmethod
+    def get_settled_event_id(last_event_id):
+        """
+        Return the highest event id up to last_event_id created more than BOX_EVENTS_WATERMARK_LAG seconds ago,
+        events below it are expected to be committed.
+        """
+        settled_before = timezone.now() - timedelta(seconds=settings.BOX_EVENTS_WATERMARK_LAG)
+        return BoxEvent.objects.filter(
+            id__lte=last_event_id, created__lt=settled_before
+        ).aggregate(Max('id'))['id__max'] or 0
+
+    def process_batch(self, events):
+        """
+        Process a batch of events ordered by id, return ids of the deferred events.
         """
-        Run processing for unprocessed box events
+        coalesced = OrderedDict()
+        for event in events:
+            coalesced.setdefault((event.storage_id, event.document_id), []).append(event)
 
-        :param offset_event_id: event id
-        It is necessary to make offset for unprocessed objects and
-        be sure that the processing of the previous objects does not affect the next fetching
+        busy_storage_ids = set(Document.objects.filter(
+            transmission_status=Document.TRANSMISSION_INPROGRESS,
+            storage_id__in={event.storage_id for event in events},
+        ).values_list('storage_id', flat=True).distinct())
 
-        :param limit: limit fetch objects in one task
+        uploads, deletes, deferred = OrderedDict(), OrderedDict(), []
+        for key, document_events in coalesced.items():
+            last_event = document_events[-1]
+            if last_event.box_event_type == BoxEvent.BOX_EVENT_TYPE_CHOICES.deleted:
+                deletes[key] = document_events
+            elif key[0] in busy_storage_ids:
+                deferred.extend(document_events)
+            else:
+                uploads[key] = document_events
+
+        box_files = self._fetch_box_files([document_id for _, document_id in uploads])
+        for key in list(uploads):
+            if box_files.get(key[1]) is UNAVAILABLE:
+                deferred.extend(uploads.pop(key))
+
+        self._delete_documents(deletes)
+        self._upsert_documents(uploads, box_files)
+
+        processed_ids = [event.id for document_events in deletes.values() + uploads.values()
+                         for event in document_events]
+        BoxEvent.objects.filter(id__in=processed_ids).update(is_processed=True)
+        logger.info('%s-BATCH events %s processed %s deferred %s', self._log_prefix,
+                    len(events), len(processed_ids), len(deferred))
+        return [event.id for event in deferred]
+
+    def _fetch_box_files(self, document_ids):
         """
-        filter_queryset = {'is_processed': False}
-        if offset_event_id:
-            filter_queryset['id__gt'] = offset_event_id
-        events = BoxEvent.objects.filter(**filter_queryset).order_by('id')[:limit]
-        if events.exists():
-            for event in events:
-                event.run_processing()
-            sync_unprocessed_box_events.delay(offset_event_id=event.id, limit=limit)
+        Return Box files by document id. Temporarily unavailable ones are UNAVAILABLE, failed ones None.
+        """
+        if not document_ids:
+            return {}
+        executor = ThreadPoolExecutor(max_workers=min(len(document_ids), settings.BOX_EVENTS_FETCH_WORKERS))
+        try:
+            return dict(zip(document_ids, executor.map(self._fetch_box_file, document_ids)))
+        finally:
+            executor.shutdown()
+
+    def _fetch_box_file(self, document_id):
+        try:
+            return box_file_get(document_id).get()
+        except (ServiceUnavailableException, requests.exceptions.RequestException) as exc:
+            logger.warning('%s-BOX-FILE-UNAVAILABLE document_id %s reason %s', self._log_prefix, document_id, exc)
+            return UNAVAILABLE
+        except BoxAPIException as exc:
+            if exc.status in (429, 503):
+                logger.warning('%s-BOX-FILE-UNAVAILABLE document_id %s reason %s', self._log_prefix, document_id, exc)
+                return UNAVAILABLE
+            logger.error('%s-BOX-FILE-FAILED document_id %s reason %s', self._log_prefix, document_id, exc)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('%s-BOX-FILE-FAILED document_id %s', self._log_prefix, document_id)
+        return None
+
+    @staticmethod
+    def _delete_documents(deletes):
+        by_user = defaultdict(list)
+        for (_, document_id), document_events in deletes.items():
+            by_user[document_events[-1].user_id].append(document_id)
+        for user_id, document_ids in by_user.items():
+            Document.objects.filter(document_id__in=document_ids).update(is_deleted=True, deleted_by=user_id)
+
+    def _upsert_documents(self, uploads, box_files):
+        uploads = OrderedDict((key, document_events) for key, document_events in uploads.items()
+                              if box_files.get(key[1]) is not None)
+        if not uploads:
+            return
+
+        existing = {}
+        for document in Document.objects.filter(
+                storage_id__in={storage_id for storage_id, _ in uploads},
+                document_id__in=[document_id for _, document_id in uploads]):
+            existing[(document.storage_id, document.document_id)] = document
+
+        storages = {document_events[-1].storage_id: document_events[-1].storage for document_events in uploads.values()}
+        changed, created = [], []
+        default_document_type = None
+        for key, document_events in uploads.items():
+            box_file = box_files[key[1]]
+            document = existing.get(key)
+            if document is None:
+                if default_document_type is None:
+                    default_document_type = DocumentType.objects.get_default()
+                created.append(Document(
+                    storage=storages[key[0]],
+                    document_id=key[1],
+                    transmission_status=Document.TRANSMISSION_RECEIPT,
+                    document_type=default_document_type,
+                    name=box_file.name,
+                    checksum=box_file.sha1,
+                ))
+            elif (document.name, document.checksum) != (box_file.name, box_file.sha1):
+                document.name = box_file.name
+                document.checksum = box_file.sha1
+                document.save(update_fields=['name', 'checksum'])
+                changed.append(document)
+        # ids of bulk created rows are set on PostgreSQL
+        created = Document.objects.bulk_create(created)
+
+        loan_profiles = {}
+        for document in changed + created:
+            if document.storage_id not in loan_profiles:
+                loan_profiles[document.storage_id] = storages[document.storage_id].get_loan_profile()
+            lp = loan_profiles[document.storage_id]
+            if lp and lp.is_encompass_synced:
+                # submit attachment to Encompass if loan has been already synced
+                send_document_to_encompass.delay(document.id)
+        logger.info('%s-DOCUMENTS created %s updated %s', self._log_prefix, len(created), len(changed))
 
 
 class CreateDocumentByBoxEvent(SynchronousTask):
@@ -0,0 +1,180 @@
+from datetime import timedelta
+
+import mock
+
+from boxsdk.exception import BoxAPIException
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.tests import CeleryTaskTestCase
+from box.tasks import SyncUnprocessedBoxEvents
+from box.models import BoxEvent, BoxEventWatermark
+from box import factories as box_factories
+from storage.models import Document
+from storage import factories as storage_factories
+from box.tests.tasks.test_create_document_by_box_event import BoxTasksLogMutingMixin
+
+UPLOADED = BoxEvent.BOX_EVENT_TYPE_CHOICES.uploaded
+DELETED = BoxEvent.BOX_EVENT_TYPE_CHOICES.deleted
+
+
+def get_box_file_mock(name='fileName.doc', sha1='test-sha1'):
+    box_file_mock = mock.MagicMock()
+    box_file_mock.configure_mock(name=name, sha1=sha1)
+    box_file_mock.get.return_value = box_file_mock
+    return box_file_mock
+
+
+@override_settings(BOX_EVENTS_WATERMARK_LAG=0)
+@mock.patch('storage.models.Storage.get_loan_profile', mock.Mock(return_value=None))
+class SyncUnprocessedBoxEventsTaskTest(BoxTasksLogMutingMixin, CeleryTaskTestCase):
+    def setUp(self):
+        super(SyncUnprocessedBoxEventsTaskTest, self).setUp()
+        self.patcher = mock.patch('box.models.BoxEvent.run_processing')
+        self.patcher.start()
+        self.document_type = storage_factories.DocumentTypeFactory()
+        self.storage = storage_factories.StorageFactory()
+        self.task = SyncUnprocessedBoxEvents()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def _event(self, box_event_type, document_id='1001', storage=None):
+        return box_factories.BoxEventFactory(
+            storage=storage or self.storage, document_id=document_id, box_event_type=box_event_type)
+
+    def assertProcessed(self, *events):
+        self.assertEqual(
+            set(BoxEvent.objects.filter(is_processed=True).values_list('id', flat=True)),
+            {event.id for event in events})
+
+    @mock.patch('box.tasks.box_file_get')
+    def test_events_of_a_document_are_coalesced(self, mock_box_file_get):
+        mock_box_file_get.return_value = get_box_file_mock()
+        first, second = self._event(UPLOADED), self._event(UPLOADED)
+
+        self.task.synchronous_run()
+
+        mock_box_file_get.assert_called_once_with('1001')
+        document = Document.objects.get()
+        self.assertEqual((document.storage, document.name, document.checksum),
+                         (self.storage, 'fileName.doc', 'test-sha1'))
+        self.assertProcessed(first, second)
+        self.assertEqual(BoxEventWatermark.get_solo().last_event_id, second.id)
+
+    @mock.patch('box.tasks.box_file_get')
+    def test_last_event_of_a_document_wins(self, mock_box_file_get):
+        document = storage_factories.DocumentFactory(storage=self.storage, document_id='1001')
+        uploaded, deleted = self._event(UPLOADED), self._event(DELETED)
+
+        self.task.synchronous_run()
+
+        self.assertFalse(mock_box_file_get.called)
+        self.assertTrue(Document.objects.get(id=document.id).is_deleted)
+        self.assertProcessed(uploaded, deleted)
+
+    @mock.patch('box.tasks.send_document_to_encompass')
+    @mock.patch('box.tasks.box_file_get')
+    def test_only_changed_documents_are_updated(self, mock_box_file_get, mock_send_document):
+        changed = storage_factories.DocumentFactory(storage=self.storage, document_id='1001', name='old.doc')
+        unchanged = storage_factories.DocumentFactory(
+            storage=self.storage, document_id='1002', name='fileName.doc', checksum='test-sha1')
+        mock_box_file_get.return_value = get_box_file_mock()
+        for document_id in ('1001', '1002', '1003'):
+            self._event(UPLOADED, document_id)
+        loan_profile = mock.Mock(is_encompass_synced=True)
+
+        with mock.patch('storage.models.Storage.get_loan_profile', return_value=loan_profile) as mock_get_lp:
+            self.task.synchronous_run()
+
+        self.assertEqual(Document.objects.get(id=changed.id).name, 'fileName.doc')
+        self.assertEqual(Document.objects.count(), 3)
+        created = Document.objects.get(document_id='1003')
+        self.assertEqual(mock_get_lp.call_count, 1)
+        self.assertEqual(sorted(call[0][0] for call in mock_send_document.delay.call_args_list),
+                         sorted([changed.id, created.id]))
+        self.assertNotIn(unchanged.id, [call[0][0] for call in mock_send_document.delay.call_args_list])
+
+    @mock.patch('box.tasks.box_file_get')
+    def test_uploads_to_busy_storages_are_deferred(self, mock_box_file_get):
+        mock_box_file_get.return_value = get_box_file_mock()
+        storage_factories.DocumentFactory(storage=self.storage, transmission_status=Document.TRANSMISSION_INPROGRESS)
+        deferred = self._event(UPLOADED, '1001')
+        processed = self._event(UPLOADED, '1002', storage=storage_factories.StorageFactory())
+
+        self.task.synchronous_run()
+
+        self.assertProcessed(processed)
+        self.assertEqual(BoxEventWatermark.get_solo().last_event_id, deferred.id - 1)
+
+        Document.objects.filter(storage=self.storage).update(transmission_status=Document.TRANSMISSION_RECEIPT)
+        self.task.synchronous_run()
+
+        self.assertProcessed(deferred, processed)
+        self.assertEqual(BoxEventWatermark.get_solo().last_event_id, processed.id)
+
+    @mock.patch('box.tasks.box_file_get')
+    def test_unavailable_box_files_are_deferred(self, mock_box_file_get):
+        mock_box_file_get.return_value.get.side_effect = BoxAPIException(status=503)
+        deferred = self._event(UPLOADED)
+
+        self.task.synchronous_run()
+
+        self.assertProcessed()
+        self.assertFalse(Document.objects.exists())
+        self.assertEqual(BoxEventWatermark.get_solo().last_event_id, deferred.id - 1)
+
+    @mock.patch('box.tasks.box_file_get')
+    def test_batches(self, mock_box_file_get):
+        mock_box_file_get.return_value = get_box_file_mock()
+        events = [self._event(UPLOADED, str(document_id)) for document_id in range(1001, 1006)]
+
+        with self.settings(BOX_EVENTS_BATCH_SIZE=2):
+            self.task.synchronous_run(max_batches=2)
+        self.assertProcessed(*events[:4])
+        self.assertEqual(BoxEventWatermark.get_solo().last_event_id, events[3].id)
+
+        with self.settings(BOX_EVENTS_BATCH_SIZE=2):
+            self.task.synchronous_run()
+        self.assertProcessed(*events)
+
+    @mock.patch('box.tasks.box_file_get')
+    def test_run_stops_at_deferred_event(self, mock_box_file_get):
+        """A later delete of a deferred upload must not be applied before it."""
+        mock_box_file_get.return_value = get_box_file_mock()
+        storage_factories.DocumentFactory(storage=self.storage, transmission_status=Document.TRANSMISSION_INPROGRESS)
+        document = storage_factories.DocumentFactory(storage=self.storage, document_id='1001')
+        uploaded, deleted = self._event(UPLOADED), self._event(DELETED)
+
+        with self.settings(BOX_EVENTS_BATCH_SIZE=1):
+            self.task.synchronous_run()
+
+        self.assertProcessed()
+        self.assertFalse(Document.objects.get(id=document.id).is_deleted)
+        self.assertEqual(BoxEventWatermark.get_solo().last_event_id, uploaded.id - 1)
+        self.assertFalse(BoxEvent.objects.get(id=deleted.id).is_processed)
+
+    @mock.patch('box.tasks.box_file_get')
+    def test_watermark_lags_recent_events(self, mock_box_file_get):
+        """Events committed late below newer ones are still read once the newer ones are processed."""
+        mock_box_file_get.return_value = get_box_file_mock()
+        settled = self._event(UPLOADED, '1001')
+        BoxEvent.objects.filter(id=settled.id).update(created=timezone.now() - timedelta(minutes=10))
+        recent = self._event(UPLOADED, '1002')
+
+        with self.settings(BOX_EVENTS_WATERMARK_LAG=60):
+            self.task.synchronous_run()
+
+        self.assertProcessed(settled, recent)
+        self.assertEqual(BoxEventWatermark.get_solo().last_event_id, settled.id)
+
+
+class BoxEventRunProcessingTest(TestCase):
+    @mock.patch('box.tasks.sync_unprocessed_box_events')
+    @mock.patch('box.models.transaction.on_commit')
+    def test_processing_is_queued_on_commit(self, mock_on_commit, mock_sync):
+        box_factories.BoxEventFactory(storage=storage_factories.StorageFactory(), document_id='1001',
+                                      box_event_type=UPLOADED)
+
+        self.assertFalse(mock_sync.delay.called)
+        mock_on_commit.assert_called_once_with(mock_sync.delay)
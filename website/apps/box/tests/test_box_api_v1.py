@@ -10,13 +10,14 @@ import requests
 
 from httmock import with_httmock
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from rest_framework import status
 
 from box import api_v1 as api
 from box.utils import box_client_factory
 from core.exceptions import ServiceInternalErrorException, ServiceUnavailableException
+from core.tests import LOCMEM_CACHES
 from core.utils import LogMutingTestMixinBase
 from loans.factories import BorrowerV1
 from box.factories import (
@@ -68,6 +69,49 @@ class BoxApiV1MethodsTest(BoxApiV1MutingMixin, TestCase):
         self.assertIsNone(api.get_thumbnail(mock.Mock()))
 
 
+@override_settings(BOX_THUMBNAIL_CACHE_TIMEOUT=60, BOX_THUMBNAIL_WORKERS=4,
+                   CACHES=LOCMEM_CACHES)
+@mock.patch('box.api_v1._thumbnail_fetch')
+class ThumbnailCacheTest(BoxApiV1MutingMixin, TestCase):
+    def setUp(self):
+        super(ThumbnailCacheTest, self).setUp()
+        self.documents = [mock.Mock(id=document_id, checksum='sha1-{}'.format(document_id))
+                          for document_id in range(1, 4)]
+
+    def test_thumbnail_is_cached(self, mocked_fetch):
+        mocked_fetch.return_value = 'thumbnail'
+        self.assertEqual(api.get_thumbnail(self.documents[0]), 'thumbnail')
+        self.assertEqual(api.get_thumbnail(self.documents[0]), 'thumbnail')
+        self.assertEqual(mocked_fetch.call_count, 1)
+
+    def test_new_checksum_is_fetched(self, mocked_fetch):
+        mocked_fetch.return_value = 'thumbnail'
+        api.get_thumbnail(self.documents[0])
+        self.documents[0].checksum = 'new-sha1'
+        api.get_thumbnail(self.documents[0])
+        self.assertEqual(mocked_fetch.call_count, 2)
+
+    def test_failed_and_checksumless_thumbnails_are_not_cached(self, mocked_fetch):
+        mocked_fetch.return_value = None
+        api.get_thumbnail(self.documents[0])
+        mocked_fetch.return_value = 'thumbnail'
+        document = mock.Mock(id=4, checksum='')
+        api.get_thumbnail(self.documents[0])
+        api.get_thumbnail(document)
+        api.get_thumbnail(document)
+        self.assertEqual(mocked_fetch.call_count, 4)
+
+    def test_get_thumbnails_fetches_misses(self, mocked_fetch):
+        mocked_fetch.side_effect = lambda document: 'thumbnail-{}'.format(document.id)
+        api.get_thumbnail(self.documents[0])
+        mocked_fetch.reset_mock()
+
+        thumbnails = api.get_thumbnails(self.documents)
+
+        self.assertEqual(thumbnails, {1: 'thumbnail-1', 2: 'thumbnail-2', 3: 'thumbnail-3'})
+        self.assertEqual(sorted(call[0][0].id for call in mocked_fetch.call_args_list), [2, 3])
+
+
 class BoxExceptionHandler(BoxApiV1MutingMixin, TestCase):
 
     def setUp(self):
@@ -129,6 +173,64 @@ class SubfolderGetTest(BoxApiV1MutingMixin, TestCase):
         self.assertIsNone(folder)
 
 
+@override_settings(BOX_FOLDER_CACHE_TIMEOUT=60,
+                   CACHES=LOCMEM_CACHES)
+@mock.patch('box.api_v1.box_client_factory', mock.Mock())
+class SubfolderCacheTest(BoxApiV1MutingMixin, TestCase):
+    def setUp(self):
+        self.parent = mock.Mock(object_id='PARENT-ID')
+        self.parent.get_items.return_value = [named_mock(name, id=name.upper(), type='folder')
+                                              for name in ('aaa', 'bbb', 'ccc')]
+        super(SubfolderCacheTest, self).setUp()
+
+    def test_found_subfolder_is_cached(self):
+        self.assertEqual(api.box_subfolder_get(self.parent, 'bbb').id, 'BBB')
+        subfolder = api.box_subfolder_get(self.parent, 'bbb')
+        self.assertEqual((subfolder.id, subfolder.object_id, subfolder.name), ('BBB', 'BBB', 'bbb'))
+        self.assertEqual(self.parent.get_items.call_count, 1)
+
+    def test_created_subfolder_is_cached(self):
+        self.parent.create_subfolder.return_value = named_mock('eee', id='EEE')
+        api.box_folder_save(self.parent, 'eee', [])
+        self.assertEqual(api.box_subfolder_get(self.parent, 'eee').id, 'EEE')
+        self.assertFalse(self.parent.get_items.called)
+
+    def test_name_in_use_forgets_parent(self):
+        api.box_subfolder_get(self.parent, 'bbb')
+        self.parent.get_items.return_value = [named_mock('bbb', id='NEW-BBB', type='folder')]
+        self.parent.create_subfolder.side_effect = boxsdk.exception.BoxAPIException(
+            status=409, code='item_name_in_use')
+
+        folder = api.box_folder_save(self.parent, 'bbb', [], may_exist=True)
+
+        self.assertEqual(folder.id, 'NEW-BBB')
+        self.assertEqual(self.parent.get_items.call_count, 2)
+
+    def test_not_found_is_not_cached(self):
+        self.assertIsNone(api.box_subfolder_get(self.parent, 'eee'))
+        self.assertIsNone(api.box_subfolder_get(self.parent, 'eee'))
+        self.assertEqual(self.parent.get_items.call_count, 2)
+
+
+@override_settings(BOX_PROVISIONING_WORKERS=4)
+class BoxCallsRunTest(BoxApiV1MutingMixin, TestCase):
+    def test_results_in_order(self):
+        calls = [(lambda value: value * 2, (value,)) for value in range(10)]
+        self.assertEqual(api.box_calls_run(calls), [value * 2 for value in range(10)])
+
+    def test_collaborators_added_concurrently(self):
+        folder = mock.Mock(object_id='FOLDER-ID')
+        acls = [('first@sample.com', api.ADVISOR_ACL), ('second@sample.com', api.COORDINATOR_ACL)]
+        api.box_folder_acls_set(folder, acls)
+        self.assertEqual(sorted(call[0][:2] for call in folder.add_collaborator.call_args_list), sorted(acls))
+
+    def test_failed_call_raises(self):
+        def fail():
+            raise boxsdk.exception.BoxAPIException(status=400, code='fake_error')
+        with self.assertRaises(boxsdk.exception.BoxAPIException):
+            api.box_calls_run([(fail, ()), (lambda: None, ())])
+
+
 class FolderUpdateTest(BoxApiV1MutingMixin, TestCase):
     def setUp(self):
         self.parent = mock.Mock(
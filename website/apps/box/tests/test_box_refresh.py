@@ -13,9 +13,12 @@ from boxsdk.auth import CooperativelyManagedOAuth2
 
 from django.conf import settings
 from django.core.urlresolvers import reverse
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
-from box.utils import retrieve_tokens_callback, store_tokens_callback
+from box.utils import (
+    BoxCallStats, BoxClientProvider, SharedOAuth2, retrieve_tokens_callback, store_tokens_callback, token_store,
+)
+from core.tests import LOCMEM_CACHES
 from core.utils import LogMutingTestMixinBase
 
 
@@ -35,7 +38,9 @@ class BoxSettingsMixin(object):
             'box.utils.settings',
             BOX_API_OAUTH_CLIENT_ID=self.client_id,
             BOX_API_OAUTH_CLIENT_SECRET=self.client_secret,
-            BOX_API_OAUTH_TOKEN_STORE=self.token_store)
+            BOX_API_OAUTH_TOKEN_STORE=self.token_store,
+            BOX_TOKEN_CACHE_NAME='default',
+            BOX_HTTP_POOL_SIZE=10)
         settings_patcher.start()
         if os.access(self.token_store, os.R_OK):
             os.remove(self.token_store)
@@ -116,6 +121,71 @@ class BoxRefreshTest(BoxRefreshMutingMixin, BoxSettingsMixin, TestCase):
         self.assertEqual(self.refresh_token, self.oauth._refresh_token)
 
 
+@override_settings(CACHES=LOCMEM_CACHES)
+class BoxTokenStoreTest(BoxRefreshMutingMixin, BoxSettingsMixin, TestCase):
+    def setUp(self):
+        super(BoxTokenStoreTest, self).setUp()
+        token_store.get_cache().clear()
+
+    def test_retrieve_falls_back_to_file(self):
+        store_tokens_callback(self.access_token, self.refresh_token)
+        self.assertEqual(token_store.retrieve(), (self.access_token, self.refresh_token))
+        # kept in the cache from now on
+        store_tokens_callback('file-access-token', 'file-refresh-token')
+        self.assertEqual(token_store.retrieve(), (self.access_token, self.refresh_token))
+
+    def test_store_writes_cache_and_file(self):
+        token_store.store(self.access_token, self.refresh_token)
+        self.assertEqual(retrieve_tokens_callback(), (self.access_token, self.refresh_token))
+        self.assertEqual(token_store.get_cache().get(token_store.KEY), (self.access_token, self.refresh_token))
+
+    def test_refresh_adopts_tokens_refreshed_by_another_process(self):
+        network_layer = mock.Mock()
+        oauth = SharedOAuth2(
+            client_id=self.client_id,
+            client_secret=self.client_secret,
+            store_tokens=token_store.store,
+            retrieve_tokens=token_store.retrieve,
+            access_token=self.access_token,
+            refresh_token=self.refresh_token,
+            network_layer=network_layer)
+        token_store.store('other-access-token', 'other-refresh-token')
+
+        result = oauth.refresh(self.access_token)
+
+        self.assertFalse(network_layer.request.called)
+        self.assertEqual(result, ('other-access-token', 'other-refresh-token'))
+        self.assertIsNone(token_store.get_cache().get(token_store.LOCK_KEY))
+
+    @mock.patch('box.utils.token_store.retrieve', mock.Mock(return_value=('access', 'refresh')))
+    def test_one_client_per_process(self):
+        provider = BoxClientProvider()
+        client = provider.get_client()
+        self.assertIs(provider.get_client(), client)
+        with mock.patch('box.utils.os.getpid', return_value=-1):
+            self.assertIsNot(provider.get_client(), client)
+
+
+class BoxCallStatsTest(TestCase):
+    def test_endpoint(self):
+        self.assertEqual(BoxCallStats.get_endpoint('get', 'https://api.box.com/2.0/folders/1234/items?limit=10'),
+                         'GET /folders/:id/items')
+        self.assertEqual(BoxCallStats.get_endpoint('post', 'https://api.box.com/oauth2/token'),
+                         'POST /oauth2/token')
+
+    def test_record(self):
+        stats = BoxCallStats()
+        stats.record('GET /folders/:id', 0.03)
+        stats.record('GET /folders/:id', 0.2, failed=True)
+        stats.record('GET /folders/:id', 10)
+        counters = stats.as_dict()['GET /folders/:id']
+        self.assertEqual((counters['calls'], counters['errors']), (3, 1))
+        self.assertEqual(counters['histogram']['50'], 1)
+        self.assertEqual(counters['histogram']['250'], 1)
+        self.assertEqual(counters['histogram']['+inf'], 1)
+        self.assertAlmostEqual(counters['average_latency'], 10230 / 3.0)
+
+
 class TestOAuthSelf(BoxRefreshMutingMixin, BoxSettingsMixin, TestCase):
     def get_redirect_url(self):
         url = reverse('self_oauth')
@@ -0,0 +1,64 @@
+'''
+Cache of Box document thumbnails.
+
+Thumbnails are cached under the document id and the Box sha1 of the file (Document.checksum), so a new version
+of the file gets a new entry and the old one is never read again. Documents without checksum are not cached.
+
+Every hit stores the thumbnail again with a fresh timeout: thumbnails in use stay cached, the least recently
+used ones expire first. Redis caches with a volatile-lru maxmemory policy also evict them first under pressure.
+A timeout of 0 disables the cache.
+'''
+
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger('sample.box.thumbnails')
+
+
+class ThumbnailCache(object):
+    KEY_PREFIX = 'box.thumbnail'
+
+    def __init__(self, cache_name=None, timeout=None):
+        self.cache_name = cache_name or settings.BOX_THUMBNAIL_CACHE_NAME
+        self.timeout = settings.BOX_THUMBNAIL_CACHE_TIMEOUT if timeout is None else timeout
+
+    @property
+    def enabled(self):
+        return bool(self.timeout)
+
+    def get_cache(self):
+        return caches[self.cache_name]
+
+    def get_key(self, document):
+        if not document.checksum:
+            return None
+        return '{}.{}.{}'.format(self.KEY_PREFIX, document.id, document.checksum)
+
+    def get_many(self, documents):
+        '''Return cached thumbnails by document id.'''
+        keys = {self.get_key(document): document.id for document in documents}
+        keys.pop(None, None)
+        if not (self.enabled and keys):
+            return {}
+        cached = self.get_cache().get_many(list(keys))
+        if cached:
+            # slide the timeout of used thumbnails
+            self.get_cache().set_many(cached, self.timeout)
+        logger.debug('BOX-THUMBNAIL-CACHE hits %s misses %s', len(cached), len(documents) - len(cached))
+        return {keys[key]: content for key, content in cached.items()}
+
+    def get(self, document):
+        return self.get_many([document]).get(document.id)
+
+    def set_many(self, thumbnails):
+        '''Cache thumbnails given by document.'''
+        entries = {self.get_key(document): content for document, content in thumbnails.items()
+                   if content is not None}
+        entries.pop(None, None)
+        if self.enabled and entries:
+            self.get_cache().set_many(entries, self.timeout)
+
+    def set(self, document, content):
+        self.set_many({document: content})
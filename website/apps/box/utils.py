@@ -1,16 +1,26 @@
 import logging
+import os
+import threading
+import time
+from collections import defaultdict, OrderedDict
+from contextlib import contextmanager
+from urlparse import urlparse
 
 from django.conf import settings
+from django.core.cache import caches
 
 import fasteners
+import requests
 from boxsdk.client import Client
 from boxsdk.auth import CooperativelyManagedOAuth2
+from boxsdk.network.default_network import DefaultNetwork
+
+from core.utils import cache_lock
 
 
 logger = logging.getLogger('sample.box.utils')
 
 
-_client = None
 rw_lock = fasteners.ReaderWriterLock()
 
 
@@ -47,25 +57,172 @@ def retrieve_tokens_callback():
         return (access, refresh)
 
 
-# Who loves singletons?
-def box_client_factory():
-    # pylint: disable=W0603, protected-access
-    global _client
-    _access_token, _refresh_token = retrieve_tokens_callback()
-    if _client is None:
-        oauth = CooperativelyManagedOAuth2(
+class BoxTokenStore(object):
+    """
+    Box OAuth tokens shared by all processes through the cache.
+
+    The token file stays the durable copy: tokens are written to both, and read from the file
+    when the cache does not have them. Refreshes are serialized across processes by a lock in the cache,
+    the refresh token can only be used once.
+    """
+
+    KEY = 'box.oauth.tokens'
+    LOCK_KEY = 'box.oauth.refresh_lock'
+    LOCK_TIMEOUT = 30
+
+    def get_cache(self):
+        return caches[settings.BOX_TOKEN_CACHE_NAME]
+
+    def retrieve(self):
+        tokens = self.get_cache().get(self.KEY)
+        if tokens is None:
+            tokens = retrieve_tokens_callback()
+            self.get_cache().set(self.KEY, tokens, None)
+        return tuple(tokens)
+
+    def store(self, access_token, refresh_token):
+        store_tokens_callback(access_token, refresh_token)
+        self.get_cache().set(self.KEY, (access_token, refresh_token), None)
+        logger.info('BOX-UTILS-TOKENS-STORED')
+
+    @contextmanager
+    def refresh_lock(self):
+        with cache_lock(self.LOCK_KEY, self.LOCK_TIMEOUT, settings.BOX_TOKEN_CACHE_NAME) as acquired:
+            if not acquired:
+                logger.warning('BOX-UTILS-REFRESH-LOCK-TIMEOUT')
+            yield
+
+
+token_store = BoxTokenStore()
+
+
+class SharedOAuth2(CooperativelyManagedOAuth2):
+    """
+    Tokens are kept in memory, a refresh compares them to the shared ones under the refresh lock:
+    tokens refreshed by another process are adopted, only the process holding the current tokens refreshes them.
+    """
+
+    def refresh(self, access_token_to_refresh):
+        with token_store.refresh_lock():
+            return super(SharedOAuth2, self).refresh(access_token_to_refresh)
+
+
+class BoxCallStats(object):
+    """Box API call counts and latency histograms per endpoint, for the lifetime of the process."""
+
+    # upper bounds of latency buckets, milliseconds
+    BUCKETS = (50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = defaultdict(self._new_counters)
+
+    def _new_counters(self):
+        return {'calls': 0, 'errors': 0, 'latency_total': 0.0,
+                'histogram': OrderedDict((str(bound), 0) for bound in self.BUCKETS + ('+inf',))}
+
+    @staticmethod
+    def get_endpoint(method, url):
+        segments = [':id' if segment.isdigit() else segment for segment in urlparse(url).path.strip('/').split('/')]
+        if segments[:1] == ['2.0']:
+            segments = segments[1:]
+        return '{} /{}'.format(method.upper(), '/'.join(segments))
+
+    def record(self, endpoint, seconds, failed=False):
+        milliseconds = seconds * 1000
+        bucket = next((str(bound) for bound in self.BUCKETS if milliseconds <= bound), '+inf')
+        with self.lock:
+            counters = self.endpoints[endpoint]
+            counters['calls'] += 1
+            counters['errors'] += int(failed)
+            counters['latency_total'] += milliseconds
+            counters['histogram'][bucket] += 1
+
+    def as_dict(self):
+        with self.lock:
+            stats = {}
+            for endpoint, counters in self.endpoints.items():
+                stats[endpoint] = dict(counters, histogram=OrderedDict(counters['histogram']))
+                stats[endpoint]['average_latency'] = counters['latency_total'] / counters['calls']
+            return stats
+
+    def clear(self):
+        with self.lock:
+            self.endpoints.clear()
+
+
+box_call_stats = BoxCallStats()
+
+
+class PooledNetwork(DefaultNetwork):
+    """
+    Network layer with a connection pool sized for concurrent Box calls, see box.api_v1.box_calls_run.
+    Calls are counted in box_call_stats.
+    """
+
+    def __init__(self):
+        super(PooledNetwork, self).__init__()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=settings.BOX_HTTP_POOL_SIZE)
+        # pylint: disable=protected-access
+        self._session.mount('https://', adapter)
+
+    def request(self, method, url, access_token, **kwargs):
+        start, failed = time.time(), True
+        try:
+            response = super(PooledNetwork, self).request(method, url, access_token, **kwargs)
+            failed = not response.ok
+            return response
+        finally:
+            box_call_stats.record(box_call_stats.get_endpoint(method, url), time.time() - start, failed)
+
+
+class BoxClientProvider(object):
+    """
+    One Box client per process, with its pooled network layer and tokens in memory.
+    Forked processes create their own, connections are not shared across processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client = None
+        self._pid = None
+
+    def get_client(self):
+        pid = os.getpid()
+        if self._client is None or self._pid != pid:
+            with self._lock:
+                if self._client is None or self._pid != pid:
+                    self._client = self._create_client()
+                    self._pid = pid
+        return self._client
+
+    @staticmethod
+    def _create_client():
+        access_token, refresh_token = token_store.retrieve()
+        network = PooledNetwork()
+        oauth = SharedOAuth2(
             client_id=settings.BOX_API_OAUTH_CLIENT_ID,
             client_secret=settings.BOX_API_OAUTH_CLIENT_SECRET,
-            access_token=_access_token,
-            refresh_token=_refresh_token,
-            store_tokens=store_tokens_callback,
-            retrieve_tokens=retrieve_tokens_callback
+            access_token=access_token,
+            refresh_token=refresh_token,
+            store_tokens=token_store.store,
+            retrieve_tokens=token_store.retrieve,
+            network_layer=network,
         )
-        _client = Client(oauth)
         logger.debug('BOX-UTILS-CLIENT-INSTANTIATED')
-    else:
-        _client._oauth._access_token, _client._oauth._refresh_token = (_access_token, _refresh_token)
-    return _client
+        return Client(oauth, network_layer=network)
+
+    def reset(self):
+        with self._lock:
+            self._client = None
+
+
+client_provider = BoxClientProvider()
+
+
+def box_client_factory():
+    """Return the Box client of the process."""
+    return client_provider.get_client()
 
 
 def auth_exercise():
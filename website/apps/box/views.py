@@ -1,4 +1,5 @@
 import logging
+import os
 
 from boxsdk.exception import BoxAPIException
 
@@ -6,12 +7,15 @@ from django.http import HttpResponse
 from django.views.generic import View
 
 from rest_framework import status
+from rest_framework.permissions import IsAdminUser
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
 from accounts.models import User
+from box.cache import forget_folder
+from box.models import BoxEvent
 from box.permissions import BoxEventCallbackPermission
-from box.utils import auth_exercise, box_client_factory
+from box.utils import auth_exercise, box_call_stats, box_client_factory
 from box.serializers import BoxEventModelSerializer
 from core.utils import send_exception_notification
 from storage.models import Storage
@@ -29,6 +33,19 @@ class BoxAuthExercise(View):
 box_auth_exercise = BoxAuthExercise.as_view()
 
 
+class BoxCallStatsView(APIView):
+    """
+    Box API call counts and latency histograms per endpoint, of the serving process.
+    """
+    permission_classes = (IsAdminUser,)
+
+    # pylint: disable=no-self-use
+    def get(self, request):
+        return Response({'pid': os.getpid(), 'endpoints': box_call_stats.as_dict()})
+
+box_call_stats_view = BoxCallStatsView.as_view()
+
+
 class BoxEventCallback(APIView):
     """
     View for store events from BOX UI.
@@ -54,7 +71,7 @@ class BoxEventCallback(APIView):
         if serializer.is_valid(raise_exception=False):
             # Temporary solution. Do not save user.
             # user = self.get_user(serializer.validated_data.get('box_user_id'))
-            serializer.save()
+            self._save_event(serializer)
             logger.debug('%s-SUCCESS received callback from Box', self._log_prefix)
         else:
             self._handle_errors(serializer.errors)
@@ -70,13 +87,21 @@ class BoxEventCallback(APIView):
         if serializer.is_valid(raise_exception=False):
             # Temporary solution. Do not save user.
             # user = self.get_user(serializer.validated_data.get('box_user_id'))
-            serializer.save()
+            self._save_event(serializer)
             logger.debug('%s-SUCCESS received callback from Box', self._log_prefix)
         else:
             self._handle_errors(serializer.errors)
         # we should return success response on each request independent on results
         return Response(status=status.HTTP_200_OK)
 
+    @staticmethod
+    def _save_event(serializer):
+        event = serializer.save()
+        if event.box_event_type == BoxEvent.BOX_EVENT_TYPE_CHOICES.deleted:
+            # the deleted item may be a cached subfolder
+            forget_folder(event.storage.storage_id)
+        return event
+
     def _handle_errors(self, errors):
         errors_values = sum(errors.values(), [])
 
@@ -12,7 +12,7 @@ from rest_framework import generics, permissions, views, response, status
 from core import utils as core_utils
 from mortgage_profiles.models import MortgageProfile, RateQuoteLender
 from mortgage_profiles.mortech import MortechFees
-from core.utils import memoize
+from core.utils import memoize_method
 from referral.models import ContactRequestReferrer
 from vendors.tasks import push_lead_to_salesforce
 
@@ -105,7 +105,7 @@ class NotificationMixin(object):
             context
         )
 
-    @memoize
+    @memoize_method
     def get_next_receiver(self):
         length = NotificationReceiver.objects.active().count()
         if length:
@@ -23,6 +23,9 @@ class CoreConfig(AppConfig):
 
         post_migrate.connect(create_notice_types, sender=self)
 
+        from core.config import connect_config_signals
+        connect_config_signals()
+
         # FIXME: By some reason django-appconf, which is used
         #        pinax-notifications does not want to set configured
         #        data to the settings.
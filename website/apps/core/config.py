@@ -0,0 +1,85 @@
+'''
+Process-local cache of the configuration singletons edited in the admin, see core.models.ConfigSingletonModel.
+
+Every process keeps the last instance it loaded of each singleton, stamped with the version the shared cache
+had for the singleton at load time. Within CONFIG_CACHE_TIMEOUT seconds of a check the instance is returned
+as is; after that the version is read again from the shared cache, one cache read, and the singleton is only
+loaded again when it changed. Saving or deleting a singleton drops its version (see core.version_stamps),
+so every process sees an edit within CONFIG_CACHE_TIMEOUT seconds.
+A timeout of 0 disables the cache.
+'''
+
+import logging
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+
+from core.version_stamps import drop_version_stamps, get_version_stamp
+
+logger = logging.getLogger('sample.core.config')
+
+VERSION_KEY = 'core.config.{}.version'
+
+# model label -> (instance, version, time of the last version check)
+_instances = {}
+
+
+def config_cache_enabled():
+    return bool(settings.CONFIG_CACHE_TIMEOUT)
+
+
+def get_cache():
+    return caches[settings.CONFIG_CACHE_NAME]
+
+
+def get_version(model):
+    return get_version_stamp(get_cache(), VERSION_KEY.format(model._meta.label))
+
+
+def get_config(model, load):
+    '''Return the cached singleton of the model, calling `load` to load it when missing or outdated.'''
+    if not config_cache_enabled():
+        return load()
+    label = model._meta.label
+    now = time.time()
+    instance, version, checked = _instances.get(label, (None, None, 0))
+    if instance is not None and now - checked < settings.CONFIG_CACHE_TIMEOUT:
+        return instance
+
+    current_version = get_version(model)
+    if instance is None or version != current_version:
+        logger.debug('CONFIG-CACHE-LOAD %s', label)
+        instance = load()
+    _instances[label] = (instance, current_version, now)
+    return instance
+
+
+def forget_config(model):
+    '''Make every process load the singleton of the model again.'''
+    label = model._meta.label
+    _instances.pop(label, None)
+    if config_cache_enabled():
+        drop_version_stamps(get_cache(), [VERSION_KEY.format(label)])
+        logger.debug('CONFIG-CACHE-FORGOTTEN %s', label)
+
+
+def forget_instance_config(sender, **kwargs):
+    forget_config(sender)
+
+
+def clear_local_config():
+    '''Drop the singletons cached by this process.'''
+    _instances.clear()
+
+
+def connect_config_signals():
+    from core.models import ConfigSingletonModel
+
+    for model in apps.get_models():
+        if issubclass(model, ConfigSingletonModel):
+            uid = 'forget_config.{}'.format(model._meta.label)
+            post_save.connect(forget_instance_config, sender=model, dispatch_uid=uid)
+            post_delete.connect(forget_instance_config, sender=model, dispatch_uid=uid)
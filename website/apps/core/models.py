@@ -10,6 +10,8 @@ from django.db import models
 from encrypted_fields import EncryptedFieldMixin
 from solo.models import SingletonModel
 
+from core.config import get_config
+
 logger = logging.getLogger('sample.core.models')
 
 MORTGAGE_TYPE_CHOICES = (
@@ -22,7 +24,21 @@ MORTGAGE_TYPE_CHOICES = (
 ##############################
 # Singletons                 #
 ##############################
-class OfficeAddress(SingletonModel):
+class ConfigSingletonModel(SingletonModel):
+    """
+    Singleton edited in the admin and read on hot paths.
+    get_solo() returns the instance cached by the process, see core.config.
+    """
+
+    @classmethod
+    def get_solo(cls):
+        return get_config(cls, super(ConfigSingletonModel, cls).get_solo)
+
+    class Meta:
+        abstract = True
+
+
+class OfficeAddress(ConfigSingletonModel):
     address = models.CharField(max_length=100)
     suite = models.CharField(max_length=30)
     city = models.CharField(max_length=50)
@@ -33,7 +49,7 @@ class OfficeAddress(SingletonModel):
     latitude = models.FloatField(default=0)
 
 
-class EncompassSync(SingletonModel):
+class EncompassSync(ConfigSingletonModel):
     enable = models.BooleanField(default=True)
 
     @classmethod
@@ -44,7 +60,7 @@ class EncompassSync(SingletonModel):
         verbose_name = "Encompass Sync"
 
 
-class Recaptcha(SingletonModel):
+class Recaptcha(ConfigSingletonModel):
     enable = models.BooleanField(default=True)
     site_key = models.CharField(max_length=100)
     secret_key = models.CharField(max_length=100)
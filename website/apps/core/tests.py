@@ -2,6 +2,9 @@
 from collections import OrderedDict
 import logging
 import pytest
+import time
+
+import mock
 
 from django.utils.six import StringIO
 from django.test import TestCase, override_settings
@@ -12,7 +15,7 @@ from rest_framework import serializers
 
 from accounts.factories import CustomerFactory
 from accounts.models import Advisor
-from core import utils as core_utils
+from core import config, utils as core_utils, version_stamps
 from core.models import Recaptcha, ResetToken
 from core.parsers import camel_to_underscore, underscoreize, CamelCaseFormParser
 from core.renderers import underscore_to_camelcase, camelize
@@ -21,6 +24,9 @@ from pages.models import StateLicense
 
 logger = logging.getLogger('sample.tests.smoke')
 
+# for tests of code keeping state in the default cache
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
 
 class CoreUtilsTest(TestCase):
     @override_settings(CP_URL={'PROTOCOL': 'https', 'HOST': 'example.com'})
@@ -30,6 +36,153 @@ class CoreUtilsTest(TestCase):
         self.assertEqual(customer_portal_base_url, expected_url)
 
 
+class MemoizeTestCase(TestCase):
+    class Calculator(object):
+        def __init__(self):
+            self.calls = 0
+
+        @core_utils.memoize_method
+        def double(self, value):
+            self.calls += 1
+            return value * 2
+
+    def test_memoize_method_per_instance(self):
+        first, second = self.Calculator(), self.Calculator()
+        self.assertEqual(first.double(2), 4)
+        self.assertEqual(first.double(2), 4)
+        self.assertEqual(second.double(2), 4)
+        self.assertEqual((first.calls, second.calls), (1, 1))
+
+        core_utils.clear_memoized(first)
+        first.double(2)
+        self.assertEqual(first.calls, 2)
+
+    def test_memoize_method_key(self):
+        class Fees(object):
+            @core_utils.memoize_method(key=lambda item: item['id'])
+            def get_fee(self, item):
+                return object()
+
+        fees = Fees()
+        self.assertIs(fees.get_fee({'id': 1}), fees.get_fee({'id': 1, 'ignored': True}))
+        self.assertIsNot(fees.get_fee({'id': 1}), fees.get_fee({'id': 2}))
+
+    def test_lru_memoize_bounded(self):
+        calls = []
+
+        @core_utils.lru_memoize(maxsize=2)
+        def square(value):
+            calls.append(value)
+            return value ** 2
+
+        for value in (1, 2, 1, 3, 2):
+            square(value)
+
+        # 2 was least recently used when 3 was added
+        self.assertEqual(calls, [1, 2, 3, 2])
+        stats = square.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size'], stats['maxsize']), (1, 4, 2, 2))
+
+        square.cache_clear()
+        self.assertEqual(square.stats()['size'], 0)
+
+    def test_lru_memoize_timeout(self):
+        calls = []
+
+        @core_utils.lru_memoize(timeout=10)
+        def identity(value):
+            calls.append(value)
+            return value
+
+        with mock.patch('core.utils.time.time', return_value=100):
+            identity(1)
+            identity(1)
+        with mock.patch('core.utils.time.time', return_value=111):
+            identity(1)
+        self.assertEqual(calls, [1, 1])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TokenBucketTestCase(TestCase):
+    def test_take_refills_with_time(self):
+        bucket = core_utils.TokenBucket('test.token_bucket', rate=0.5, capacity=3)
+        bucket.get_cache().delete(bucket.key)
+        with mock.patch('core.utils.time.time', return_value=100):
+            self.assertEqual(bucket.take(2), 2)
+            self.assertEqual(bucket.take(2), 1)
+            self.assertEqual(bucket.take(1), 0)
+        with mock.patch('core.utils.time.time', return_value=104):
+            self.assertEqual(bucket.take(5), 2)
+        with mock.patch('core.utils.time.time', return_value=200):
+            self.assertEqual(bucket.take(5), 3)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class VersionStampTestCase(TestCase):
+    def test_stamp_is_kept_until_dropped(self):
+        cache = config.get_cache()
+        stamp = version_stamps.get_version_stamp(cache, 'test.version')
+        self.assertEqual(version_stamps.get_version_stamp(cache, 'test.version'), stamp)
+
+        with mock.patch('core.version_stamps.transaction.on_commit') as mocked_on_commit:
+            version_stamps.drop_version_stamps(cache, ['test.version'])
+        self.assertIsNone(cache.get('test.version'))
+
+        new_stamp = version_stamps.get_version_stamp(cache, 'test.version')
+        self.assertNotEqual(new_stamp, stamp)
+        # a stamp read before the commit is dropped again
+        mocked_on_commit.call_args[0][0]()
+        self.assertIsNone(cache.get('test.version'))
+
+
+class AdvisoryLockTestCase(TestCase):
+    def test_lock_is_released(self):
+        with core_utils.advisory_lock(1, 2) as acquired:
+            self.assertTrue(acquired)
+        with core_utils.advisory_lock(1, 2) as acquired:
+            self.assertTrue(acquired)
+
+
+@override_settings(CACHES=LOCMEM_CACHES,
+                   CONFIG_CACHE_NAME='default', CONFIG_CACHE_TIMEOUT=5)
+class ConfigCacheTestCase(TestCase):
+    def setUp(self):
+        config.clear_local_config()
+        config.get_cache().clear()
+        self.addCleanup(config.clear_local_config)
+
+    def test_singleton_is_reused(self):
+        recaptcha = Recaptcha.get_solo()
+        with self.assertNumQueries(0):
+            self.assertIs(Recaptcha.get_solo(), recaptcha)
+
+    def test_version_is_checked_after_timeout(self):
+        recaptcha = Recaptcha.get_solo()
+        with mock.patch('core.config.time.time', return_value=time.time() + 10), self.assertNumQueries(0):
+            self.assertIs(Recaptcha.get_solo(), recaptcha)
+
+        # saved by another process: the version is dropped, the instance of this process is kept
+        Recaptcha.objects.filter(pk=recaptcha.pk).update(enable=False)
+        config.get_cache().delete(config.VERSION_KEY.format(Recaptcha._meta.label))
+        self.assertTrue(Recaptcha.enabled())
+        with mock.patch('core.config.time.time', return_value=time.time() + 20):
+            self.assertFalse(Recaptcha.enabled())
+
+    def test_save_forgets_singleton(self):
+        recaptcha = Recaptcha.get_solo()
+        recaptcha.enable = False
+        recaptcha.save()
+
+        self.assertIsNot(Recaptcha.get_solo(), recaptcha)
+        self.assertFalse(Recaptcha.enabled())
+
+    @override_settings(CONFIG_CACHE_TIMEOUT=0)
+    def test_disabled(self):
+        Recaptcha.get_solo()
+        with self.assertNumQueries(1):
+            Recaptcha.get_solo()
+
+
 class CeleryTaskTestCase(TestCase):
     def setUp(self):
         settings.CELERY_ALWAYS_EAGER = True
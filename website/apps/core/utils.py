@@ -4,6 +4,10 @@ import logging
 import hashlib
 import json
 import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 
 import shortuuid
 from uuid import UUID
@@ -27,16 +31,117 @@ from moneyed.localization import format_money
 logger = logging.getLogger('sample.core.utils')
 
 
-def memoize(obj):
-    cache = obj.cache = {}
+class CacheStats(object):
+    """Hit and miss counters of a memoized function."""
 
-    @functools.wraps(obj)
-    def memoizer(*args, **kwargs):
-        key = str(args) + str(kwargs)
-        if key not in cache:
-            cache[key] = obj(*args, **kwargs)
-        return cache[key]
-    return memoizer
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def as_dict(self, **extra):
+        total = self.hits + self.misses
+        stats = {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': float(self.hits) / total if total else 0.0,
+        }
+        stats.update(extra)
+        return stats
+
+
+def _make_key(args, kwargs):
+    return (args, tuple(sorted(kwargs.items()))) if kwargs else args
+
+
+def memoize_method(func=None, key=None):
+    """
+    Cache method results on the instance, cached_property-style.
+
+    Results live in the instance ``__dict__`` and are released together with the instance.
+    Arguments must be hashable, or ``key`` must map them to a hashable value::
+
+        @memoize_method
+        def get_total_fees(self): ...
+
+        @memoize_method(key=lambda lender: lender.pk)
+        def get_calculations(self, lender): ...
+
+    ``wrapper.stats()`` returns hits and misses over all instances.
+    """
+    if func is None:
+        return functools.partial(memoize_method, key=key)
+
+    cache_name = '_memoized_{}'.format(func.__name__)
+    stats = CacheStats()
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        cache = self.__dict__.setdefault(cache_name, {})
+        cache_key = key(*args, **kwargs) if key else _make_key(args, kwargs)
+        try:
+            result = cache[cache_key]
+        except KeyError:
+            stats.misses += 1
+            result = cache[cache_key] = func(self, *args, **kwargs)
+        else:
+            stats.hits += 1
+        return result
+
+    wrapper.stats = stats.as_dict
+    wrapper.cache_name = cache_name
+    return wrapper
+
+
+def clear_memoized(instance):
+    """Drop all memoize_method results of the instance."""
+    for name in [name for name in instance.__dict__ if name.startswith('_memoized_')]:
+        del instance.__dict__[name]
+
+
+def lru_memoize(maxsize=128, timeout=None):
+    """
+    Bounded LRU cache with optional expiry for module level functions.
+
+    :param maxsize: `int`, maximum number of cached results, least recently used are evicted first
+    :param timeout: `int`, seconds until a result expires, None for no expiry
+
+    ``wrapper.stats()`` returns hits, misses and size, ``wrapper.cache_clear()`` empties the cache.
+    Arguments must be hashable.
+    """
+    def decorator(func):
+        cache = OrderedDict()
+        lock = threading.Lock()
+        stats = CacheStats()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache_key = _make_key(args, kwargs)
+            with lock:
+                if cache_key in cache:
+                    result, expires = cache.pop(cache_key)
+                    if expires is None or expires > time.time():
+                        cache[cache_key] = (result, expires)
+                        stats.hits += 1
+                        return result
+                stats.misses += 1
+
+            result = func(*args, **kwargs)
+            expires = time.time() + timeout if timeout else None
+            with lock:
+                cache.pop(cache_key, None)
+                cache[cache_key] = (result, expires)
+                while len(cache) > maxsize:
+                    cache.popitem(last=False)
+            return result
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+
+        wrapper.stats = lambda: stats.as_dict(size=len(cache), maxsize=maxsize)
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
 
 
 def get_state_code(state_name):
@@ -264,6 +369,70 @@ class SynchronousTask(Task):
         raise NotImplementedError
 
 
+@contextmanager
+def advisory_lock(namespace, key):
+    """
+    Hold a PostgreSQL session level advisory lock on (namespace, key) within the block, without waiting for it.
+    Yields whether the lock was acquired. The lock is released when the block exits, or when the connection closes.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute('SELECT pg_try_advisory_lock(%s, %s)', [namespace, key])
+        acquired = cursor.fetchone()[0]
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                cursor.execute('SELECT pg_advisory_unlock(%s, %s)', [namespace, key])
+    finally:
+        cursor.close()
+
+
+@contextmanager
+def cache_lock(key, timeout, cache_name='default', interval=0.1):
+    """
+    Hold a lock kept in the cache within the block, waiting up to `timeout` seconds for it.
+    Yields whether the lock was acquired, the block runs either way. The lock expires after `timeout` seconds.
+    """
+    cache = caches[cache_name]
+    deadline = time.time() + timeout
+    acquired = cache.add(key, 'True', timeout)
+    while not acquired and time.time() < deadline:
+        time.sleep(interval)
+        acquired = cache.add(key, 'True', timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(key)
+
+
+class TokenBucket(object):
+    """
+    Token bucket kept in the cache, refilled with `rate` tokens per second up to `capacity`.
+
+    Taking tokens is not atomic, callers are expected to be serialized, e.g. by a SynchronousTask.
+    """
+
+    def __init__(self, key, rate, capacity, cache_name='default'):
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity
+        self.cache_name = cache_name
+
+    def get_cache(self):
+        return caches[self.cache_name]
+
+    def take(self, count):
+        """Take up to `count` tokens, return how many were taken."""
+        now = time.time()
+        tokens, updated = self.get_cache().get(self.key) or (self.capacity, now)
+        tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+        taken = max(0, min(count, int(tokens)))
+        self.get_cache().set(self.key, (tokens - taken, now), None)
+        return taken
+
+
 def get_consumer_portal_base_url():
     return '{}://{}'.format(settings.CP_URL['PROTOCOL'], settings.CP_URL['HOST'])
 
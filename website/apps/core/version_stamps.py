@@ -0,0 +1,27 @@
+'''
+Version stamps kept in a cache.
+
+Values cached under a key which embeds the stamp of what they depend on become unreachable, all at once, when the
+stamp is dropped: the next read stores a new random stamp. Stamps are dropped right away and again on commit,
+so a stamp read while the change was not committed yet does not outlive it.
+
+Used by loans.versions, core.config and box.cache.
+'''
+
+import uuid
+
+from django.db import transaction
+
+
+def get_version_stamp(cache, key, timeout=None):
+    '''Return the version stamp kept in the cache under `key`, a random one is stored when missing.'''
+    cache.add(key, uuid.uuid4().hex, timeout)
+    return cache.get(key)
+
+
+def drop_version_stamps(cache, keys):
+    '''Drop the version stamps kept in the cache under `keys`, right away and again on commit.'''
+    keys = list(keys)
+    if keys:
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -5,4 +5,6 @@ urlpatterns = [
     url(r'^tags/', views.GoogleAnalyticsTagView.as_view(), name='ga-tags'),
     url(r'^events/', views.GoogleAnalyticsEventView.as_view(), name='ga-events'),
     url(r'^pageviews/', views.GoogleAnalyticsPageviewView.as_view(), name='ga-pageviews'),
+    url(r'^stats/', views.GoogleAnalyticsProxyStatsView.as_view(), name='ga-stats'),
+    url(r'^stub/batch/', views.GoogleAnalyticsBatchStubView.as_view(), name='ga-stub-batch'),
 ]
@@ -1,5 +1,25 @@
+'''
+Transport of Google Analytics Measurement Protocol hits.
+
+In ENABLE mode hits are queued and a background thread of the process posts them to the batch endpoint,
+up to 20 hits per request, over one pooled session. The queue holds at most GA_PROXY_QUEUE_SIZE hits: when it is
+full new hits are dropped, web threads never wait for Google. A batch waits GA_PROXY_BATCH_WAIT seconds at most
+for more hits. Failed batches are dropped too, hits are counted, see GampBatchTransport.get_stats().
+
+The queue, the thread and the session are created on the first hit of every process, they do not survive a fork.
+GA_PROXY_BATCH_URL can point to the local stub of ga_proxy.views.GoogleAnalyticsBatchStubView.
+'''
+
 import logging
+import os
+import threading
+import time
+import Queue
+from urllib import urlencode
+
+import requests
 from django.conf import settings
+from requests.adapters import HTTPAdapter
 from requests_futures.sessions import FuturesSession
 
 GAMP_URL = 'http://www.google-analytics.com/collect'
@@ -11,6 +31,161 @@ PROXY_MODE_DEBUG = "DEBUG"
 PROXY_MODE_OFF = "OFF"
 _proxy_mode = getattr(settings, 'GA_PROXY_MODE', PROXY_MODE_OFF)
 
+# limits of the Measurement Protocol batch endpoint
+BATCH_MAX_HITS = 20
+BATCH_MAX_BYTES = 16 * 1024
+HIT_MAX_BYTES = 8 * 1024
+REQUEST_TIMEOUT = 10
+
+
+def encode_hit(payload):
+    '''Return the payload as a line of a batch request.'''
+    return urlencode([(key, value.encode('utf-8') if isinstance(value, unicode) else value)
+                      for key, value in sorted(payload.items())])
+
+
+def build_batches(hits):
+    '''Split encoded hits in batches within the limits of the batch endpoint.'''
+    batches, batch, size = [], [], 0
+    for hit in hits:
+        if batch and (len(batch) == BATCH_MAX_HITS or size + len(hit) + 1 > BATCH_MAX_BYTES):
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(hit)
+        size += len(hit) + 1
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class GampTransportStats(object):
+    '''Hit counters of the process.'''
+
+    COUNTERS = ('queued', 'dropped', 'oversized', 'sent', 'failed', 'batches')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def incr(self, counter, count=1):
+        with self._lock:
+            self._counters[counter] += count
+
+    def as_dict(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def clear(self):
+        self._counters = dict.fromkeys(self.COUNTERS, 0)
+
+
+class GampBatchTransport(object):
+    '''
+    Queue of hits of the process, drained by a background sender.
+    With start_sender=False nothing is sent until send_pending() is called.
+    '''
+
+    def __init__(self, start_sender=True):
+        self.start_sender = start_sender
+        self.stats = GampTransportStats()
+        self._lock = threading.Lock()
+        self._pid = None
+        self.queue = None
+        self.session = None
+        self.futures_session = None
+
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = Queue.Queue(maxsize=settings.GA_PROXY_QUEUE_SIZE)
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=2)
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+            self.futures_session = FuturesSession(max_workers=2)
+            if self.start_sender:
+                sender = threading.Thread(target=self._run, name='gamp-sender')
+                sender.daemon = True
+                sender.start()
+            self._pid = os.getpid()
+            logger.info('GA-PROXY-TRANSPORT-STARTED pid %s', self._pid)
+
+    def put(self, payload):
+        '''Queue the hit, return whether it was queued.'''
+        hit = encode_hit(payload)
+        if len(hit) > HIT_MAX_BYTES:
+            self.stats.incr('oversized')
+            logger.warning('GA-PROXY-HIT-OVERSIZED bytes %s', len(hit))
+            return False
+        self.ensure_started()
+        try:
+            self.queue.put_nowait(hit)
+        except Queue.Full:
+            self.stats.incr('dropped')
+            logger.debug('GA-PROXY-QUEUE-FULL hit dropped')
+            return False
+        self.stats.incr('queued')
+        return True
+
+    def _take_batch(self):
+        '''Wait for a hit, then for more hits up to a full batch or GA_PROXY_BATCH_WAIT seconds.'''
+        hits = [self.queue.get()]
+        deadline = time.time() + settings.GA_PROXY_BATCH_WAIT
+        while len(hits) < BATCH_MAX_HITS:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                hits.append(self.queue.get(timeout=remaining))
+            except Queue.Empty:
+                break
+        return hits
+
+    def _post(self, hits):
+        try:
+            response = self.session.post(settings.GA_PROXY_BATCH_URL, data='\n'.join(hits),
+                                         timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+        except requests.RequestException:
+            self.stats.incr('failed', len(hits))
+            logger.warning('GA-PROXY-BATCH-FAILED hits %s', len(hits), exc_info=True)
+        else:
+            self.stats.incr('sent', len(hits))
+            self.stats.incr('batches')
+            logger.debug('GA-PROXY-BATCH-SENT hits %s', len(hits))
+
+    def _run(self):
+        while True:
+            try:
+                for batch in build_batches(self._take_batch()):
+                    self._post(batch)
+            except Exception:  # pylint: disable=broad-except
+                # the sender must outlive any error
+                logger.exception('GA-PROXY-SENDER-ERROR')
+
+    def send_pending(self):
+        '''Send the queued hits now, from the calling thread.'''
+        self.ensure_started()
+        hits = []
+        while True:
+            try:
+                hits.append(self.queue.get_nowait())
+            except Queue.Empty:
+                break
+        for batch in build_batches(hits):
+            self._post(batch)
+
+    def get_stats(self):
+        stats = self.stats.as_dict()
+        stats['queue_size'] = self.queue.qsize() if self._pid == os.getpid() else 0
+        return stats
+
+
+transport = GampBatchTransport()
+
 
 def send(payload):
     '''
@@ -18,7 +193,7 @@ def send(payload):
     no return value
     '''
     if _proxy_mode == PROXY_MODE_ENABLE:
-        _send_immediate(payload)
+        transport.put(payload)
     elif _proxy_mode == PROXY_MODE_DEBUG:
         send_validate(payload)
 
@@ -47,11 +222,11 @@ def _send_immediate(payload, wait_for_response=False, destination=GAMP_URL):
     wait_for_response - boolean - should we wait for and return a response
     desintation - a url, the analytics end point
 
-    Send POST immeidately
+    Send POST immeidately, over the long-lived futures session of the transport
     all network activity occurs in the background unless waited for
     '''
-    session = FuturesSession()
-    future = session.post(destination, params=payload)
+    transport.ensure_started()
+    future = transport.futures_session.post(destination, params=payload, timeout=REQUEST_TIMEOUT)
     if wait_for_response:
         return future.result()
 
@@ -1,4 +1,10 @@
-from django.test import TestCase
+import mock
+import requests
+
+from django.core.urlresolvers import reverse
+from django.test import TestCase, override_settings
+
+from ga_proxy import gamp_transport
 from ga_proxy.views import GampEvent, GampPageview, GampTag
 
 # Create your tests here.
@@ -85,3 +91,58 @@ class GampMessageTests(TestCase):
         t = "this is a strange tag"
         with self.assertRaisesMessage(TypeError, "Data must be a dict"):
             GampTag(t, 123)
+
+
+@override_settings(GA_PROXY_QUEUE_SIZE=3, GA_PROXY_BATCH_URL='http://testserver/batch')
+@mock.patch('ga_proxy.gamp_transport.logger', mock.Mock())
+class GampBatchTransportTests(TestCase):
+    def setUp(self):
+        self.transport = gamp_transport.GampBatchTransport(start_sender=False)
+
+    def test_build_batches(self):
+        hits = ['t=event&n={}'.format(number) for number in range(45)]
+        self.assertEqual([len(batch) for batch in gamp_transport.build_batches(hits)], [20, 20, 5])
+
+        large_hits = ['x' * 6000] * 3
+        self.assertEqual([len(batch) for batch in gamp_transport.build_batches(large_hits)], [2, 1])
+
+    def test_full_queue_drops_hits(self):
+        for number in range(5):
+            self.transport.put({'t': 'event', 'n': number})
+        self.assertFalse(self.transport.put({'t': 'event', 'dl': 'x' * gamp_transport.HIT_MAX_BYTES}))
+
+        stats = self.transport.get_stats()
+        self.assertEqual((stats['queued'], stats['dropped'], stats['oversized'], stats['queue_size']), (3, 2, 1, 3))
+
+    def test_send_pending(self):
+        self.transport.put({'t': 'event', 'ec': u'vid\xe9o'})
+        self.transport.put({'t': 'pageview', 'dp': '/home'})
+        with mock.patch.object(self.transport.session, 'post') as mock_post:
+            self.transport.send_pending()
+
+        mock_post.assert_called_once_with(
+            'http://testserver/batch', data='ec=vid%C3%A9o&t=event\ndp=%2Fhome&t=pageview',
+            timeout=gamp_transport.REQUEST_TIMEOUT)
+        stats = self.transport.get_stats()
+        self.assertEqual((stats['sent'], stats['batches'], stats['queue_size']), (2, 1, 0))
+
+    def test_failed_batches_are_dropped(self):
+        self.transport.put({'t': 'event'})
+        with mock.patch.object(self.transport.session, 'post', side_effect=requests.ConnectionError):
+            self.transport.send_pending()
+
+        stats = self.transport.get_stats()
+        self.assertEqual((stats['sent'], stats['failed'], stats['queue_size']), (0, 1, 0))
+
+
+@mock.patch('ga_proxy.views.logger', mock.Mock())
+class GoogleAnalyticsBatchStubViewTests(TestCase):
+    def test_stub(self):
+        url = reverse('ga-proxy:ga-stub-batch')
+        body = '\n'.join(['t=event&n={}'.format(number) for number in range(20)])
+
+        self.assertEqual(self.client.post(url, body, content_type='text/plain').status_code, 404)
+        with self.settings(GA_PROXY_STUB_ENABLED=True):
+            self.assertEqual(self.client.post(url, body, content_type='text/plain').status_code, 200)
+            self.assertEqual(self.client.post(url, body + '\nt=event', content_type='text/plain').status_code,
+                             400)
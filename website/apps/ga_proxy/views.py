@@ -6,17 +6,19 @@ Supports ga-proxy/events, ga-proxy/pageviews, and ga-proxy/tags
 import logging
 
 from django.conf import settings
+from django.http import Http404
 
 from rest_framework.generics import CreateAPIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.parsers import JSONParser
+from rest_framework.views import APIView
 
 from accounts.authentication import CustomWebTokenAuthentication
 
 from ga_proxy.gamp import GampEvent, GampPageview, GampTag, GampMessage, GampRawTag
-from ga_proxy.gamp_transport import send, PROXY_MODE_OFF
+from ga_proxy.gamp_transport import send, transport, BATCH_MAX_HITS, PROXY_MODE_OFF
 
 logger = logging.getLogger('ga-proxy-logger')
 
@@ -130,3 +132,33 @@ class GoogleAnalyticsTagView(BaseGoogleAnalyticsConfiguredTagView):
     """
 
     model = GampTag
+
+
+class GoogleAnalyticsProxyStatsView(APIView):
+    """
+    Hit counters and queue size of the transport in the process serving the request.
+    """
+    permission_classes = (IsAdminUser,)
+
+    # pylint: disable=no-self-use
+    def get(self, request, *args, **kwargs):
+        return Response(transport.get_stats())
+
+
+class GoogleAnalyticsBatchStubView(APIView):
+    """
+    Local stand-in of the Measurement Protocol batch endpoint, enabled by GA_PROXY_STUB_ENABLED.
+    Point GA_PROXY_BATCH_URL to it to exercise the transport without sending hits to Google.
+    """
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+
+    # pylint: disable=no-self-use
+    def post(self, request, *args, **kwargs):
+        if not settings.GA_PROXY_STUB_ENABLED:
+            raise Http404
+        hits = [line for line in request.body.splitlines() if line]
+        logger.info('GA-PROXY-STUB-BATCH hits %s', len(hits))
+        if not hits or len(hits) > BATCH_MAX_HITS:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_200_OK)
@@ -52,3 +52,6 @@ class LoansConfig(AppConfig):
 
     def ready(self):
         post_migrate.connect(create_notice_types, sender=self)
+
+        from loans.versions import connect_version_signals
+        connect_version_signals()
@@ -0,0 +1,209 @@
+'''
+Lazy decryption of PGP encrypted fields.
+
+PGPEncryptedManager decrypts every encrypted column in SQL for every query, including the counts, existence checks,
+orderings and prefetches which never read the values. EncryptedFieldsManager defers encrypted columns instead.
+The first access to an encrypted field of an instance decrypts that field for all instances loaded by the same
+query, in batches of DECRYPT_BATCH_SIZE, with one query through the model's `decrypted_objects` manager.
+
+Within a decryption context (one per request, see loans.middleware) decrypted values are cached by model, pk and
+field, and decryptions are counted; totals per endpoint are kept in `decryption_stats`.
+'''
+
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import models
+from django.db.models.query import ModelIterable
+from django.db.models.query_utils import DeferredAttribute
+from django.db.models.signals import class_prepared, post_delete, post_save
+
+from django_postgres_pgpfields.fields import NullBooleanPGPPublicKeyField, TextPGPPublicKeyField
+
+logger = logging.getLogger('sample.loans.encryption')
+
+ENCRYPTED_FIELD_CLASSES = (TextPGPPublicKeyField, NullBooleanPGPPublicKeyField)
+DECRYPT_BATCH_SIZE = 100
+BATCH_ATTR = '_decryption_batch'
+
+_local = threading.local()
+
+
+def encrypted_fields(model):
+    return [field for field in model._meta.concrete_fields if isinstance(field, ENCRYPTED_FIELD_CLASSES)]
+
+
+class DecryptionContext(object):
+    '''Decrypted values cache and counters of a request.'''
+
+    def __init__(self):
+        self.values = {}
+        self.queries = 0
+        self.decrypted = 0
+        self.hits = 0
+
+    def as_dict(self):
+        return {'queries': self.queries, 'decrypted': self.decrypted, 'hits': self.hits}
+
+
+class DecryptionStats(object):
+    '''Decryption counters per endpoint, for the lifetime of the process.'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = defaultdict(lambda: {'requests': 0, 'queries': 0, 'decrypted': 0, 'hits': 0})
+
+    def record(self, endpoint, context):
+        with self.lock:
+            counters = self.endpoints[endpoint]
+            counters['requests'] += 1
+            for key, value in context.as_dict().items():
+                counters[key] += value
+
+    def as_dict(self):
+        with self.lock:
+            return {endpoint: dict(counters) for endpoint, counters in self.endpoints.items()}
+
+    def clear(self):
+        with self.lock:
+            self.endpoints.clear()
+
+
+decryption_stats = DecryptionStats()
+
+
+def get_decryption_context():
+    return getattr(_local, 'context', None)
+
+
+def start_decryption_context():
+    _local.context = DecryptionContext()
+    return _local.context
+
+
+def end_decryption_context():
+    context = get_decryption_context()
+    _local.context = None
+    return context
+
+
+@contextmanager
+def decryption_context(endpoint=None):
+    '''Cache decrypted values within the block, counters are recorded under the endpoint if given.'''
+    previous = get_decryption_context()
+    context = start_decryption_context()
+    try:
+        yield context
+    finally:
+        _local.context = previous
+        if endpoint is not None:
+            decryption_stats.record(endpoint, context)
+
+
+class DecryptionBatch(object):
+    '''Instances loaded by the same query, decrypted together.'''
+
+    def __init__(self, instances):
+        self.instances = instances
+        for instance in instances:
+            instance.__dict__[BATCH_ATTR] = self
+
+    def __reduce__(self):
+        # pickled or copied instances do not drag the whole batch along
+        return DecryptionBatch, ([],)
+
+    def decrypt(self, instance, attname):
+        context = get_decryption_context()
+        pending = defaultdict(list)
+        for item in [instance] + [other for other in self.instances if other is not instance]:
+            if attname in item.__dict__:
+                continue
+            key = (item._meta.label, item.pk, attname)
+            if item.pk is None:
+                item.__dict__[attname] = None
+            elif context is not None and key in context.values:
+                item.__dict__[attname] = context.values[key]
+                context.hits += 1
+            else:
+                pending[item.pk].append(item)
+        if not pending:
+            return
+
+        model = type(instance)
+        queryset = model.decrypted_objects.filter(pk__in=list(pending)).only('pk', attname)
+        values = {obj.pk: obj.__dict__.get(attname) for obj in queryset}
+        for pk, items in pending.items():
+            for item in items:
+                item.__dict__[attname] = values.get(pk)
+
+        logger.debug('PGP-DECRYPT %s %s %s', model._meta.label, attname, len(values))
+        if context is not None:
+            context.queries += 1
+            context.decrypted += len(values)
+            context.values.update(((model._meta.label, pk, attname), value) for pk, value in values.items())
+
+
+class DecryptOnAccess(DeferredAttribute):
+    '''Decrypt a deferred encrypted field with the batch of the instance on first access.'''
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        if self.field_name not in instance.__dict__:
+            batch = instance.__dict__.get(BATCH_ATTR) or DecryptionBatch([instance])
+            batch.decrypt(instance, self.field_name)
+        return instance.__dict__[self.field_name]
+
+
+class DecryptionBatchIterable(ModelIterable):
+    def __iter__(self):
+        chunk = []
+        for instance in super(DecryptionBatchIterable, self).__iter__():
+            chunk.append(instance)
+            if len(chunk) == DECRYPT_BATCH_SIZE:
+                for item in DecryptionBatch(chunk).instances:
+                    yield item
+                chunk = []
+        for item in DecryptionBatch(chunk).instances:
+            yield item
+
+
+class EncryptedFieldsQuerySet(models.QuerySet):
+    def __init__(self, *args, **kwargs):
+        super(EncryptedFieldsQuerySet, self).__init__(*args, **kwargs)
+        self._iterable_class = DecryptionBatchIterable
+
+
+class EncryptedFieldsManager(models.Manager.from_queryset(EncryptedFieldsQuerySet)):
+    '''
+    Defer encrypted fields, they are decrypted on access.
+    Filtering or values() on decrypted values need the model's decrypted_objects manager.
+    '''
+
+    use_in_migrations = True
+
+    def get_queryset(self):
+        queryset = super(EncryptedFieldsManager, self).get_queryset()
+        return queryset.defer(*[field.name for field in encrypted_fields(self.model)])
+
+
+def forget_decrypted_values(sender, instance, **kwargs):
+    context = get_decryption_context()
+    if context is not None:
+        for field in encrypted_fields(sender):
+            context.values.pop((sender._meta.label, instance.pk, field.attname), None)
+
+
+def install_decrypt_on_access(sender, **kwargs):
+    if not isinstance(sender._meta.default_manager, EncryptedFieldsManager):
+        return
+    for field in encrypted_fields(sender):
+        setattr(sender, field.attname, DecryptOnAccess(field.attname, sender))
+    uid = 'forget_decrypted_values.{}'.format(sender._meta.label)
+    post_save.connect(forget_decrypted_values, sender=sender, dispatch_uid=uid)
+    post_delete.connect(forget_decrypted_values, sender=sender, dispatch_uid=uid)
+
+
+class_prepared.connect(install_decrypt_on_access)
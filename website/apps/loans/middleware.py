@@ -0,0 +1,27 @@
+import logging
+
+from loans.encryption import decryption_stats, end_decryption_context, start_decryption_context
+
+logger = logging.getLogger('sample.loans.encryption')
+
+
+class DecryptionContextMiddleware(object):
+    """
+    Caches decrypted field values for the duration of a request
+    and counts decryptions per endpoint, see loans.encryption.
+    """
+
+    @staticmethod
+    def process_request(request):
+        start_decryption_context()
+
+    @staticmethod
+    def process_response(request, response):
+        context = end_decryption_context()
+        if context is not None and context.queries:
+            resolver_match = getattr(request, 'resolver_match', None)
+            endpoint = resolver_match.view_name if resolver_match else request.path
+            decryption_stats.record(endpoint, context)
+            logger.info('PGP-DECRYPT-REQUEST %s queries %s decrypted %s hits %s',
+                        endpoint, context.queries, context.decrypted, context.hits)
+        return response
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.7 on 2026-10-18 15:00
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0003_loanprofilev1_assets_verification_method'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='loanprofilev1',
+            index_together=set([('advisor', 'updated', 'id')]),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.7 on 2026-10-18 16:00
+from __future__ import unicode_literals
+
+from django.db import migrations
+import django_postgres_pgpfields.managers
+import loans.encryption
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0004_auto_20261018_1500'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='borrowerv1',
+            options={'base_manager_name': 'objects'},
+        ),
+        migrations.AlterModelManagers(
+            name='borrowerv1',
+            managers=[
+                ('objects', loans.encryption.EncryptedFieldsManager()),
+                ('decrypted_objects', django_postgres_pgpfields.managers.PGPEncryptedManager()),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name='coborrowerv1',
+            options={'base_manager_name': 'objects'},
+        ),
+        migrations.AlterModelManagers(
+            name='coborrowerv1',
+            managers=[
+                ('objects', loans.encryption.EncryptedFieldsManager()),
+                ('decrypted_objects', django_postgres_pgpfields.managers.PGPEncryptedManager()),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name='holdingassetv1',
+            options={'base_manager_name': 'objects'},
+        ),
+        migrations.AlterModelManagers(
+            name='holdingassetv1',
+            managers=[
+                ('objects', loans.encryption.EncryptedFieldsManager()),
+                ('decrypted_objects', django_postgres_pgpfields.managers.PGPEncryptedManager()),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name='liabilityv1',
+            options={'base_manager_name': 'objects'},
+        ),
+        migrations.AlterModelManagers(
+            name='liabilityv1',
+            managers=[
+                ('objects', loans.encryption.EncryptedFieldsManager()),
+                ('decrypted_objects', django_postgres_pgpfields.managers.PGPEncryptedManager()),
+            ],
+        ),
+    ]
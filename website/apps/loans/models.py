@@ -28,6 +28,7 @@ from encompass.client import EncompassClient
 from box.api_v1 import archive_credit_report_storage
 from core.models import TimeStampedModel
 from core.fields import CustomArrayField
+from loans.encryption import EncryptedFieldsManager
 from encompass.client import EncompassConfig, EncompassClient
 from money.models.fields import MoneyField
 from mismo_credit.models import CreditRequestResponse
@@ -292,6 +293,10 @@ class LoanProfileV1(LoanProfilePurposeOfLoanMixinV1, TimeStampedModel):
 
     objects = LoanProfileV1Manager()
 
+    class Meta:
+        # keyset pagination of the advisor portal list, see LoanProfileKeysetPagination
+        index_together = [('advisor', 'updated', 'id')]
+
     def __str__(self):
         return "id: {0}, is active: {1}, encompass_sync_status: {2}".format(
             self.id, self.is_active, self.encompass_sync_status
@@ -1121,6 +1126,7 @@ class ContactV1(TimeStampedModel):
 class BorrowerBaseV1(TimeStampedModel):
     class Meta:
         abstract = True
+        base_manager_name = 'objects'
 
     # XXXrex: add to marital_status and citizenship_status field as choices to advisor portal
     # need to check does not break advisor portal serializers
@@ -1220,7 +1226,9 @@ class BorrowerBaseV1(TimeStampedModel):
     expense = models.ManyToManyField('ExpenseV1', related_name='%(class)s')
     liabilities = models.ManyToManyField('LiabilityV1', related_name='%(class)s')
 
-    objects = PGPEncryptedManager()
+    # encrypted fields are decrypted on access, see loans.encryption
+    objects = EncryptedFieldsManager()
+    decrypted_objects = PGPEncryptedManager()
 
     @property
     def dependents_count(self):
@@ -1496,7 +1504,12 @@ class HoldingAssetV1(TimeStampedModel):
                                             blank=True, on_delete=models.SET_NULL)
     is_liquidating_or_borrowing = models.NullBooleanField()
 
-    objects = PGPEncryptedManager()
+    class Meta:
+        base_manager_name = 'objects'
+
+    # encrypted fields are decrypted on access, see loans.encryption
+    objects = EncryptedFieldsManager()
+    decrypted_objects = PGPEncryptedManager()
 
     @property
     def mismo_kind(self):
@@ -1762,7 +1775,12 @@ class LiabilityV1(TimeStampedModel):
     def sample_to_mismo_kind(cls, kind):
         return cls.MISMO_TO_sample_LIABILITY_KIND.get(kind)
 
-    objects = PGPEncryptedManager()
+    class Meta:
+        base_manager_name = 'objects'
+
+    # encrypted fields are decrypted on access, see loans.encryption
+    objects = EncryptedFieldsManager()
+    decrypted_objects = PGPEncryptedManager()
 
     def __str__(self):
         return '{0}, {1}'.format(self.kind, self.holder_name)
@@ -5,10 +5,13 @@ from dateutil.relativedelta import relativedelta
 
 from django.core.exceptions import ValidationError
 from django.db.utils import DataError
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
+from core.tests import LOCMEM_CACHES
 from loans import factories
-from loans.models import DemographicsV1, LoanProfileV1
+from loans.encryption import decryption_context
+from loans.models import BorrowerV1, DemographicsV1, LoanProfileV1
+from loans.versions import get_loan_profile_version
 from mortgage_profiles.factories import MortgageProfileRefinanceFactory
 from mortgage_profiles.models import MortgageProfileRefinance
 
@@ -505,3 +508,87 @@ class TestPurposeOfLoanV1Mixin(TestCase):
             lock_owner_updated=datetime.datetime.today())
         with self.assertRaisesMessage(ValidationError, msg):
             lp.full_clean()
+
+
+class TestEncryptedFieldsDecryptOnAccess(TestCase):
+    def setUp(self):
+        self.loan_profile = factories.LoanProfileV1Factory()
+        for ssn in ('666121234', '666121235', '666121236'):
+            factories.BorrowerV1Factory(loan_profile=self.loan_profile, ssn=ssn)
+
+    def test_encrypted_fields_are_deferred(self):
+        with self.assertNumQueries(1):
+            borrowers = list(BorrowerV1.objects.filter(loan_profile=self.loan_profile))
+        self.assertEqual(len(borrowers), 3)
+        self.assertIn('ssn', borrowers[0].get_deferred_fields())
+
+    def test_access_decrypts_the_batch(self):
+        borrowers = list(BorrowerV1.objects.filter(loan_profile=self.loan_profile).order_by('id'))
+        with self.assertNumQueries(1):
+            ssns = [borrower.ssn for borrower in borrowers]
+        self.assertEqual(ssns, ['666121234', '666121235', '666121236'])
+
+    def test_prefetched_borrowers_are_decrypted_together(self):
+        loan_profile = LoanProfileV1.objects.prefetch_related('borrowers').get(id=self.loan_profile.id)
+        with self.assertNumQueries(1):
+            ssns = sorted(borrower.ssn for borrower in loan_profile.borrowers.all())
+        self.assertEqual(ssns, ['666121234', '666121235', '666121236'])
+
+    def test_decryption_context_caches_values(self):
+        with decryption_context() as context:
+            borrower = BorrowerV1.objects.order_by('id').first()
+            self.assertEqual(borrower.ssn, '666121234')
+            with self.assertNumQueries(1):
+                self.assertEqual(BorrowerV1.objects.order_by('id').first().ssn, '666121234')
+        self.assertEqual(context.as_dict(), {'queries': 1, 'decrypted': 1, 'hits': 1})
+
+    def test_save_forgets_cached_value(self):
+        with decryption_context():
+            borrower = BorrowerV1.objects.order_by('id').first()
+            self.assertEqual(borrower.ssn, '666121234')
+            borrower.ssn = '666129999'
+            borrower.save()
+            self.assertEqual(BorrowerV1.objects.get(id=borrower.id).ssn, '666129999')
+
+    def test_untouched_encrypted_field_is_not_saved(self):
+        borrower = BorrowerV1.objects.order_by('id').first()
+        borrower.first_name = 'Kate'
+        borrower.save()
+        self.assertEqual(BorrowerV1.objects.get(id=borrower.id).ssn, '666121234')
+
+
+@override_settings(CACHES=LOCMEM_CACHES,
+                   LOAN_PROFILE_CACHE_TIMEOUT=60)
+class TestLoanProfileVersions(TestCase):
+    def setUp(self):
+        self.loan_profile = factories.LoanProfileV1Factory()
+        self.borrower = factories.BorrowerV1Factory(loan_profile=self.loan_profile)
+        self.coborrower = factories.CoborrowerV1Factory(borrower=self.borrower)
+        self.other_loan_profile = factories.LoanProfileV1Factory()
+
+    def test_version_is_kept_without_changes(self):
+        version = get_loan_profile_version(self.loan_profile.id)
+        self.assertIsNotNone(version)
+        self.assertEqual(get_loan_profile_version(self.loan_profile.id), version)
+
+    def test_nested_changes_bump_version(self):
+        version = get_loan_profile_version(self.loan_profile.id)
+        other_version = get_loan_profile_version(self.other_loan_profile.id)
+
+        address = self.coborrower.mailing_address
+        address.city = 'Austin'
+        address.save()
+        self.assertNotEqual(get_loan_profile_version(self.loan_profile.id), version)
+        self.assertEqual(get_loan_profile_version(self.other_loan_profile.id), other_version)
+
+        version = get_loan_profile_version(self.loan_profile.id)
+        self.borrower.expense.add(factories.ExpenseV1Factory())
+        self.assertNotEqual(get_loan_profile_version(self.loan_profile.id), version)
+
+        version = get_loan_profile_version(self.loan_profile.id)
+        self.borrower.expense.all().delete()
+        self.assertNotEqual(get_loan_profile_version(self.loan_profile.id), version)
+
+    @override_settings(LOAN_PROFILE_CACHE_TIMEOUT=0)
+    def test_versions_disabled(self):
+        self.assertIsNone(get_loan_profile_version(self.loan_profile.id))
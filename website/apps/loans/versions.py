@@ -0,0 +1,124 @@
+'''
+Version stamps of loan profile graphs.
+
+A loan profile graph is the loan profile, its borrowers, coborrowers and everything nested in them. Every save or
+delete of a model of the graph, and every change of a (co)borrower many to many relation, drops the version stamp
+of the affected loan profiles; the next read creates a new random stamp. Responses cached under a stamp become
+unreachable as soon as anything in the graph changes, see advisor_portal.cache.
+
+Stamps are dropped right away and again on commit, see core.version_stamps.
+Stamps are only kept while LOAN_PROFILE_CACHE_TIMEOUT is set.
+
+Queryset update() sends no signals: call bump_loan_profile_versions after updating models of the graph that way.
+'''
+
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+
+from core.version_stamps import drop_version_stamps, get_version_stamp
+from loans.models import (
+    AddressV1, BorrowerV1, CoborrowerV1, ContactV1, DemographicsV1, EmploymentV1, ExpenseV1,
+    HoldingAssetV1, IncomeV1, InsuranceAssetV1, LiabilityV1, LoanProfileV1, VehicleAssetV1,
+)
+
+logger = logging.getLogger('sample.loans.versions')
+
+VERSION_KEY = 'loans.loan_profile.version.{}'
+BORROWER_LOOKUPS = ('borrowers', 'borrowers__coborrower')
+
+
+def versions_enabled():
+    return bool(settings.LOAN_PROFILE_CACHE_TIMEOUT)
+
+
+def get_cache():
+    return caches[settings.LOAN_PROFILE_CACHE_NAME]
+
+
+def get_loan_profile_version(loan_profile_id):
+    '''Return the version stamp of the loan profile graph, None when stamps are disabled.'''
+    if not versions_enabled():
+        return None
+    return get_version_stamp(get_cache(), VERSION_KEY.format(loan_profile_id), settings.LOAN_PROFILE_CACHE_TIMEOUT)
+
+
+def bump_loan_profile_versions(loan_profile_ids):
+    loan_profile_ids = set(loan_profile_ids)
+    if not (versions_enabled() and loan_profile_ids):
+        return
+    drop_version_stamps(get_cache(), [VERSION_KEY.format(loan_profile_id) for loan_profile_id in loan_profile_ids])
+    logger.debug('LOAN-PROFILE-VERSION-BUMPED %s', sorted(loan_profile_ids))
+
+
+def _borrower_lookups(*lookups):
+    return tuple('{}__{}'.format(owner, lookup) for owner in BORROWER_LOOKUPS for lookup in lookups)
+
+
+def _related_model(name):
+    return LoanProfileV1._meta.get_field(name).related_model
+
+
+def get_graph_lookups():
+    '''Return lookups from LoanProfileV1 to every model of the loan profile graph.'''
+    return {
+        BorrowerV1: ('borrowers',),
+        CoborrowerV1: ('borrowers__coborrower',),
+        AddressV1: ('new_property_address',) + _borrower_lookups(
+            'mailing_address', 'previous_addresses', 'realtor__address',
+            'previous_employment__company_address', 'previous_employment__address',
+            'holding_assets__institution_address',
+        ),
+        ContactV1: _borrower_lookups('realtor'),
+        DemographicsV1: _borrower_lookups('demographics'),
+        EmploymentV1: _borrower_lookups('previous_employment'),
+        HoldingAssetV1: _borrower_lookups('holding_assets'),
+        VehicleAssetV1: _borrower_lookups('vehicle_assets'),
+        InsuranceAssetV1: _borrower_lookups('insurance_assets'),
+        IncomeV1: _borrower_lookups('income'),
+        ExpenseV1: _borrower_lookups('expense'),
+        LiabilityV1: _borrower_lookups('liabilities'),
+        _related_model('credit_request_responses'): ('credit_request_responses',),
+        _related_model('aus_request_responses'): ('aus_request_responses',),
+    }
+
+
+def get_loan_profile_ids(instance):
+    '''Return ids of the loan profiles whose graph contains the instance.'''
+    if isinstance(instance, LoanProfileV1):
+        return {instance.pk}
+    if instance.pk is None:
+        return set()
+    lookups = get_graph_lookups().get(type(instance), ())
+    # one query per lookup, OR-ing multi-valued lookups would join all of them at once
+    loan_profile_ids = set()
+    for lookup in lookups:
+        loan_profile_ids.update(
+            LoanProfileV1.objects.filter(**{lookup: instance.pk}).order_by().values_list('id', flat=True))
+    return loan_profile_ids
+
+
+def bump_instance_versions(sender, instance, **kwargs):
+    if versions_enabled():
+        bump_loan_profile_versions(get_loan_profile_ids(instance))
+
+
+def bump_m2m_versions(sender, instance, action, **kwargs):
+    # removed items are resolved before they are unlinked, added ones after they are linked
+    if action in ('post_add', 'pre_remove', 'pre_clear') and versions_enabled():
+        bump_loan_profile_versions(get_loan_profile_ids(instance))
+
+
+def connect_version_signals():
+    models = [LoanProfileV1] + list(get_graph_lookups())
+    for model in models:
+        uid = 'bump_loan_profile_versions.{}'.format(model._meta.label)
+        post_save.connect(bump_instance_versions, sender=model, dispatch_uid=uid)
+        pre_delete.connect(bump_instance_versions, sender=model, dispatch_uid=uid)
+    for model in (BorrowerV1, CoborrowerV1):
+        for field in model._meta.many_to_many:
+            through = field.remote_field.through
+            uid = 'bump_loan_profile_versions.{}'.format(through._meta.label)
+            m2m_changed.connect(bump_m2m_versions, sender=through, dispatch_uid=uid)
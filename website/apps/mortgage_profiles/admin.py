@@ -1,11 +1,12 @@
 from django.conf import settings
-from django.contrib import admin
+from django.contrib import admin, messages
 
 from core.admin import MaskFieldsMixin
 from core.utils import mask_email
 from mortgage_profiles.models import (
     RateQuoteRequest, MortgageProfile, MortgageProfilePurchase, MortgageProfileRefinance,
 )
+from mortgage_profiles.mortech.cache import MortechResponseCache
 
 
 class MaskUserFieldMixin(MaskFieldsMixin):
@@ -77,6 +78,7 @@ class RateQuoteRequestAdmin(MaskUserFieldMixin, admin.ModelAdmin):
     list_display = ('uuid', 'created', 'mortgage_profile')
     list_display_links = ('uuid', 'mortgage_profile')
     readonly_fields = ('mortgage_profile', 'mortgage_profile_with_link', 'created')
+    actions = ['purge_mortech_cache']
 
     # pylint: disable=no-self-use
     def mortgage_profile_with_link(self, obj):
@@ -85,6 +87,15 @@ class RateQuoteRequestAdmin(MaskUserFieldMixin, admin.ModelAdmin):
 
     mortgage_profile_with_link.allow_tags = True
 
+    def purge_mortech_cache(self, request, queryset):
+        """Purge all cached Mortech responses, the selected requests do not matter."""
+        response_cache = MortechResponseCache()
+        stats = response_cache.get_stats()
+        response_cache.purge()
+        msg = 'Mortech response cache purged. Hits: {hits}, misses: {misses}, hit ratio: {hit_ratio:.2f}.'
+        self.message_user(request, msg.format(**stats), messages.SUCCESS)
+    purge_mortech_cache.short_description = 'Purge cached Mortech responses'
+
 admin.site.register(MortgageProfilePurchase, MortgageProfilePurchaseAdmin)
 admin.site.register(MortgageProfileRefinance, MortgageProfileRefinanceAdmin)
 admin.site.register(MortgageProfile, MortgageProfileAdmin)
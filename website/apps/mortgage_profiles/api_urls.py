@@ -14,7 +14,8 @@ from mortgage_profiles.views import (
     RateQuoteServiceView,
     RateQuoteLessResultView,
     RateQuoteFullResultView,
-    RateQuoteResultsView
+    RateQuoteResultsView,
+    RateQuoteStatusView,
 )
 
 
@@ -32,4 +33,6 @@ urlpatterns = format_suffix_patterns([
     url(r'^states/$', StateLicensesView.as_view(), name='licensed_states'),
     url(r'^rate-quote/(?P<uuid>[a-km-zA-HJ-NP-Z2-9]{22})/$', RateQuoteResultsView.as_view(), name='rate_quote'),
     url(r'^rate-quote-request/$', RateQuoteRequestView.as_view(), name='rate_quote_request'),
+    url(r'^rate-quote-status/(?P<uuid>[a-km-zA-HJ-NP-Z2-9]{22})/$', RateQuoteStatusView.as_view(),
+        name='rate_quote_status'),
 ])
@@ -0,0 +1,114 @@
+import gc
+import json
+import resource
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from mortgage_profiles.models import MortgageProfile, MortgageProfilePurchase
+from mortgage_profiles.mortech import MortechApi, MortechDirector
+from mortgage_profiles.serializers import RateQuoteLenderSerializer
+from mortgage_profiles.utils import MortechXMLParser
+from support.mortech_test.responses import build_response
+
+
+class Command(BaseCommand):
+    """
+    Benchmark our part of the rate quote pipeline, without Mortech latency:
+    * parse: MortechXMLParser.parse of the response
+    * save_lenders: MortechApi.save_lenders of the parsed response
+    * get_scenario: MortechDirector.get_scenario from the saved lenders
+    * serialize: RateQuoteLenderSerializer of all saved lenders
+
+    Responses of each size are built from the Mortech stub sample response (support/mortech_test).
+    Everything runs in a transaction which is rolled back, so the database is left untouched.
+
+    Reports mean time, throughput, peak RSS growth and objects retained after the run, per benchmark and size.
+    """
+    help = 'Benchmark rate quote parsing, storage, scenarios and serialization for several response sizes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quotes', default='100,1000,5000', help='Comma separated numbers of quotes.')
+        parser.add_argument('--iterations', type=int, default=10, help='Runs of each benchmark.')
+        parser.add_argument('--output', help='Write the results as JSON to this file, to compare between releases.')
+        parser.add_argument('--storage', choices=('rows', 'compact'),
+                            help='Lender storage to benchmark, RATE_QUOTE_LENDER_STORAGE by default.')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['quotes'].split(',')]
+        if options['storage']:
+            MortechApi.COMPACT_LENDERS = options['storage'] == 'compact'
+        results = []
+        with transaction.atomic():
+            mortgage_profile = self.create_mortgage_profile()
+            for quotes in sizes:
+                results.extend(self.run_benchmarks(mortgage_profile, quotes, options['iterations']))
+            transaction.set_rollback(True)
+
+        for result in results:
+            self.stdout.write(
+                '{name:<14} quotes {quotes:>6} iterations {iterations:>4} mean {mean_ms:>10.2f} ms '
+                'ops/s {ops_per_second:>10.2f} quotes/s {quotes_per_second:>12.0f} '
+                'peak rss +{peak_rss_kb:>8} kB objects +{objects:>8}'.format(**result))
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+
+    @staticmethod
+    def create_mortgage_profile():
+        return MortgageProfilePurchase.objects.create(
+            kind=MortgageProfile.PURCHASE,
+            credit_score=760,
+            purchase_timing=MortgageProfilePurchase.RESEARCHING_OPTIONS,
+            property_occupation=MortgageProfilePurchase.FIRST_TIME_HOMEBUYER,
+            purchase_down_payment=100000,
+            target_value=500000,
+            property_county='San Francisco',
+            property_state='California',
+            property_type=MortgageProfile.PROPERTY_TYPE_SINGLE_FAMILY,
+            ownership_time=MortgageProfile.LONG_TERM)
+
+    def run_benchmarks(self, mortgage_profile, quotes, iterations):
+        content = build_response(quotes=quotes)
+        parsed_response = MortechXMLParser().parse(content)
+        api = MortechApi(mortgage_profile)
+        api.save_lenders(parsed_response)
+        rate_quote_request = mortgage_profile.current_rate_quote_request()
+        lenders = list(rate_quote_request.rate_quote_lenders.all())
+        if rate_quote_request.compact_lenders:
+            # serialized lenders are always promoted to rows
+            lenders = rate_quote_request.promote_lenders(rate_quote_request.get_lender_set().get_lenders())
+
+        benchmarks = (
+            ('parse', lambda: MortechXMLParser().parse(content)),
+            ('save_lenders', lambda: api.save_lenders(parsed_response)),
+            ('get_scenario', lambda: MortechDirector(mortgage_profile).get_scenario()),
+            ('serialize', lambda: RateQuoteLenderSerializer(lenders, many=True).data),
+        )
+        return [self.measure(name, func, len(parsed_response.quotes), iterations) for name, func in benchmarks]
+
+    @staticmethod
+    def measure(name, func, quotes, iterations):
+        func()  # warm up
+        gc.collect()
+        objects = len(gc.get_objects())
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        start = time.time()
+        for _ in range(iterations):
+            func()
+        elapsed = time.time() - start
+
+        gc.collect()
+        return {
+            'name': name,
+            'quotes': quotes,
+            'iterations': iterations,
+            'mean_ms': elapsed * 1000 / iterations,
+            'ops_per_second': iterations / elapsed if elapsed else 0,
+            'quotes_per_second': quotes * iterations / elapsed if elapsed else 0,
+            'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - peak_rss,
+            'objects': len(gc.get_objects()) - objects,
+        }
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.7 on 2026-10-18 12:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mortgage_profiles', '0008_auto_20170601_1505'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mortgageprofile',
+            name='rate_quote_refresh_progress',
+            field=models.CharField(blank=True, choices=[(b'queued', b'Queued'), (b'in_progress', b'In Progress'), (b'complete', b'Complete'), (b'failed', b'Failed')], max_length=255),
+        ),
+    ]
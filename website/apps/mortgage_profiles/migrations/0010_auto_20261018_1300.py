@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.7 on 2026-10-18 13:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mortgage_profiles', '0009_auto_20261018_1200'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ratequoterequest',
+            name='compact_lenders',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='ratequotelender',
+            name='quote_index',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='ratequotelender',
+            unique_together=set([('request', 'quote_index')]),
+        ),
+        migrations.CreateModel(
+            name='RateQuoteLenderSet',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('payload', models.BinaryField()),
+                ('request', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='lender_set', to='mortgage_profiles.RateQuoteRequest')),
+            ],
+            options={
+                'verbose_name': 'Rate Quote Lender Set',
+                'verbose_name_plural': 'Rate Quote Lender Sets',
+            },
+        ),
+    ]
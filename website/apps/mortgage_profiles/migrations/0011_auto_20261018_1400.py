@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.7 on 2026-10-18 14:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mortgage_profiles', '0010_auto_20261018_1300'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateQuoteArchive',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=255)),
+                ('cutoff', models.DateTimeField()),
+                ('first_request_id', models.PositiveIntegerField()),
+                ('last_request_id', models.PositiveIntegerField()),
+                ('requests', models.PositiveIntegerField(default=0)),
+                ('lenders', models.PositiveIntegerField(default=0)),
+                ('size', models.PositiveIntegerField(default=0, help_text='Compressed size in bytes.')),
+            ],
+            options={
+                'ordering': ('-created',),
+                'verbose_name': 'Rate Quote Archive',
+                'verbose_name_plural': 'Rate Quote Archives',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='ratequotelender',
+            index_together=set([('request', 'term', 'amortization_type', 'points', 'rate')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='ratequoterequest',
+            index_together=set([('mortgage_profile', 'created')]),
+        ),
+    ]
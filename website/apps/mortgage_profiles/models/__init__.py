@@ -5,6 +5,8 @@ from website.apps.mortgage_profiles.models.mortgage_profiles import (
     MortgageProfileRefinance,
 )
 from website.apps.mortgage_profiles.models.lenders import (
+    RateQuoteArchive,
     RateQuoteLender,
+    RateQuoteLenderSet,
     RateQuoteRequest,
 )
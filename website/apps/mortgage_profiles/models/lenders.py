@@ -1,20 +1,25 @@
 # -*- coding: utf-8 -*-
 from decimal import Decimal
 from functools import partial
+import json
 import logging
+import zlib
 
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.urlresolvers import reverse
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.utils.functional import cached_property
 
 from model_utils import Choices
 from django.contrib.postgres.fields import JSONField
 from shortuuidfield import ShortUUIDField
 
 from core.models import TimeStampedModel
-from core.utils import memoize, create_shortuuid
+from core.utils import create_shortuuid
 from money.models.fields import MoneyField
 from .mortgage_profiles import MortgageProfile
 from .aus_calculations import AusCalculations
+from .scenario_engine import RateQuoteScenarioEngine
 
 logger = logging.getLogger('sample.mortech.models')
 
@@ -46,12 +51,16 @@ class RateQuoteRequest(TimeStampedModel):
 
     mortgage_profile = models.ForeignKey(MortgageProfile, related_name="rate_quote_requests")
     uuid = ShortUUIDField(max_length=22, default=partial(create_shortuuid), blank=True, editable=False, unique=True)
+    # Lenders are stored in a RateQuoteLenderSet instead of RateQuoteLender rows
+    compact_lenders = models.BooleanField(default=False)
 
     class Meta:
         ordering = ("-created",)
         verbose_name = "Rate Quote Request"
         verbose_name_plural = "All Rate Quote Requests"
         app_label = 'mortgage_profiles'
+        # latest request of a mortgage profile and retention scans
+        index_together = [('mortgage_profile', 'created')]
 
     def __unicode__(self):
         return u"Request for {} created on {}".format(self.mortgage_profile, self.created)
@@ -61,11 +70,20 @@ class RateQuoteRequest(TimeStampedModel):
 
     def has_failed(self):
         # TODO: Negative references are ...not good. Rewrite as has_lenders()
-        return not self.rate_quote_lenders.exists()
+        return not self.has_lenders
 
     def get_term_and_amortization(self):
         return self.SCENARIO_RECOMMENDATION[self.mortgage_profile.ownership_time]
 
+    @cached_property
+    def scenario_engine(self):
+        """
+        In-memory index of all lenders of the request, loaded with a single query on first use.
+
+        Lenders created afterwards are not seen by this instance.
+        """
+        return RateQuoteScenarioEngine.for_request(self)
+
     def get_rate_quote(self, term=None, amortization=None, rate=None):
         """
         Request a single lender product.
@@ -80,19 +98,9 @@ class RateQuoteRequest(TimeStampedModel):
         if not term and not amortization:
             term, amortization = self.get_term_and_amortization()
 
-        queryset = self.rate_quote_lenders.filter(term=term, amortization_type=amortization)
         if rate:
-            queryset = queryset.filter(rate=rate).order_by('points')
-            result = queryset.first()
-        else:
-            queryset = queryset.filter(points__lte=0.0).order_by('-points', 'rate')
-            if queryset.exists():
-                queryset = queryset[:5]
-                result = min(queryset, key=lambda item: item.rate)
-            else:
-                result = None
-
-        return result
+            return self.scenario_engine.get_best_price(term, amortization, rate)
+        return self.scenario_engine.get_par_lender(term, amortization)
 
     def get_par_lender(self, term=None, amortization=None, rate=None):
         """Return single lender closest to par."""
@@ -108,17 +116,9 @@ class RateQuoteRequest(TimeStampedModel):
         """Return top 5 of rate quotes by best price for given rate."""
         if not term and not amortization:
             term, amortization = self.get_term_and_amortization()
-        price_range = ['25.0', '12.5', '0.0', '-12.5', '-25.0']
-        results = []
-
-        lender = self.get_rate_quote(term, amortization)
-        if lender is not None:
-            for price in price_range:
-                new_rate = lender.rate + Decimal(price)
-                current = self.get_rate_quote(term, amortization, new_rate)
-                if current:
-                    results.append(current)
 
+        results = self.scenario_engine.get_rate_ladder(term, amortization)
+        if results:
             # Auto-update selected_rate_quote_lender only if new lenders available
             self.mortgage_profile.update_selected_lender()
 
@@ -126,24 +126,61 @@ class RateQuoteRequest(TimeStampedModel):
 
     def get_lender_by_rate(self, rate, term=None, amortization=None):
         """Return best par lender by rate."""
-        # get_rate_quote will have filtering refactored soon to mirror calls like this.
-        # for now, it must mirror the calls in results.py as much as possible XXXkayhudson
         if not term and not amortization:
             term, amortization = self.get_term_and_amortization()
 
-        return self.rate_quote_lenders.filter(
-            term=term, amortization_type=amortization).filter(
-                points__lte=0.0).filter(rate=rate).order_by('-points').first()
+        return self.scenario_engine.get_par_lender_by_rate(term, amortization, rate)
 
     @property
     def has_lenders(self):
         """Checks the request has lenders available."""
+        lender_set = self.get_lender_set()
+        if lender_set is not None:
+            return lender_set.count > 0
         return self.rate_quote_lenders.exists()
 
     def has_lender_product(self, term, amortization):
         """Checks the request has lenders with the specific term and amortization."""
+        if self.get_lender_set() is not None:
+            return self.scenario_engine.has_product(term, amortization)
         return self.rate_quote_lenders.filter(term=term, amortization_type=amortization).exists()
 
+    def get_lender_set(self):
+        """Return compact lender set of the request, None when lenders are stored as rows."""
+        if not self.compact_lenders:
+            return None
+        try:
+            return self.lender_set
+        except RateQuoteLenderSet.DoesNotExist:
+            return None
+
+    def promote_lenders(self, lenders):
+        """
+        Save lenders read from the compact lender set as RateQuoteLender rows, so they can be serialized,
+        selected and referenced. Lenders are updated in place and returned.
+        """
+        pending = [lender for lender in lenders if lender is not None and lender.pk is None]
+        count = len(pending)
+        while pending:
+            try:
+                with transaction.atomic():
+                    RateQuoteLender.objects.bulk_create(pending)
+                break
+            except IntegrityError:
+                # Promoted, all or some of them, by a concurrent request: reuse its rows and insert the others
+                rows = self.rate_quote_lenders.filter(quote_index__in=[lender.quote_index for lender in pending])
+                rows = {row.quote_index: row for row in rows}
+                if not rows:
+                    raise
+                for lender in pending:
+                    row = rows.get(lender.quote_index)
+                    if row is not None:
+                        lender.pk, lender.created, lender.updated = row.pk, row.created, row.updated
+                pending = [lender for lender in pending if lender.pk is None]
+        if count:
+            logger.debug('RATE-QUOTE-LENDERS-PROMOTED request %s count %s', self.id, count)
+        return lenders
+
 
 class RateQuoteLender(TimeStampedModel):
     """
@@ -205,6 +242,8 @@ class RateQuoteLender(TimeStampedModel):
     sample_TO_MISMO_AMORTIZATION_TYPE = {value: key for key, value in MISMO_TO_sample_AMORTIZATION_TYPE.items()}
 
     request = models.ForeignKey(RateQuoteRequest, related_name="rate_quote_lenders")
+    # Position in the compact lender set of the request, for promoted lenders only
+    quote_index = models.PositiveIntegerField(null=True, blank=True, editable=False)
 
     lender_name = models.CharField(max_length=255)
     amortization_type = models.CharField(max_length=255)  # AMORTIZATION_TYPE are choices
@@ -226,6 +265,9 @@ class RateQuoteLender(TimeStampedModel):
         verbose_name = "Rate Quote Lender"
         verbose_name_plural = "Rate Quote Lenders"
         app_label = 'mortgage_profiles'
+        unique_together = ('request', 'quote_index')
+        # per request par lender and best price lookups
+        index_together = [('request', 'term', 'amortization_type', 'points', 'rate')]
 
     def __unicode__(self):
         return u"ID: {} -- Term: {}, amortization: {}, program type: {}".format(
@@ -246,8 +288,7 @@ class RateQuoteLender(TimeStampedModel):
     def primary_coborrower(self):
         return self.request.mortgage_profile.subclass.loan_profilev1.primary_coborrower
 
-    @property
-    @memoize
+    @cached_property
     def aus_calculations(self):
         return AusCalculations(self)
 
@@ -399,3 +440,86 @@ class RateQuoteLender(TimeStampedModel):
     @classmethod
     def mismo_to_sample_amortization_type(cls, amortization_type):
         return cls.MISMO_TO_sample_AMORTIZATION_TYPE.get(amortization_type)
+
+
+class RateQuoteLenderSet(TimeStampedModel):
+    """
+    All quotes of a rate quote request stored as one compressed columnar payload instead of RateQuoteLender rows,
+    see RATE_QUOTE_LENDER_STORAGE.
+
+    Quotes are read back as unsaved RateQuoteLender instances. Only the lenders returned to users are saved as rows,
+    with RateQuoteRequest.promote_lenders, which the scenario engine does on demand.
+    """
+
+    FORMAT_VERSION = 1
+    DECIMAL_FIELDS = ('points', 'price', 'rate', 'monthly_premium', 'piti', 'upfront_fee', 'apr')
+
+    request = models.OneToOneField(RateQuoteRequest, related_name='lender_set')
+    count = models.PositiveIntegerField(default=0)
+    payload = models.BinaryField()
+
+    class Meta:
+        verbose_name = "Rate Quote Lender Set"
+        verbose_name_plural = "Rate Quote Lender Sets"
+        app_label = 'mortgage_profiles'
+
+    def __unicode__(self):
+        return u"{} quotes for request {}".format(self.count, self.request_id)
+
+    @classmethod
+    def create_for_request(cls, rate_quote_request, quotes):
+        """Save quotes (MortechQuote records) of the request."""
+        lender_set = cls.objects.create(request=rate_quote_request, count=len(quotes), payload=cls.encode(quotes))
+        if not rate_quote_request.compact_lenders:
+            rate_quote_request.compact_lenders = True
+            rate_quote_request.save(update_fields=['compact_lenders'])
+        return lender_set
+
+    @classmethod
+    def encode(cls, quotes):
+        """Return quotes as zlib compressed JSON, one list of values per field."""
+        fields = quotes[0]._fields if quotes else ()
+        columns = {field: [getattr(quote, field) for quote in quotes] for field in fields}
+        data = {'version': cls.FORMAT_VERSION, 'count': len(quotes), 'columns': columns}
+        return zlib.compress(json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')))
+
+    @classmethod
+    def decode(cls, payload):
+        """Return list of quote dicts."""
+        data = json.loads(zlib.decompress(bytes(payload)))
+        columns = data['columns']
+        for field in cls.DECIMAL_FIELDS:
+            if field in columns:
+                columns[field] = [None if value is None else Decimal(value) for value in columns[field]]
+        return [dict(zip(columns.keys(), values)) for values in zip(*columns.values())]
+
+    def get_lenders(self):
+        """
+        Return lenders of the request in quote order, promoted lenders as saved rows, the rest unsaved.
+        Runs one query for the promoted lenders.
+        """
+        promoted = {lender.quote_index: lender
+                    for lender in self.request.rate_quote_lenders.filter(quote_index__isnull=False)}
+        return [promoted.get(index) or RateQuoteLender(request=self.request, quote_index=index, **quote)
+                for index, quote in enumerate(self.decode(self.payload))]
+
+
+class RateQuoteArchive(TimeStampedModel):
+    """Archive file of expired rate quote requests and lenders, see mortgage_profiles.retention."""
+
+    name = models.CharField(max_length=255)
+    cutoff = models.DateTimeField()
+    first_request_id = models.PositiveIntegerField()
+    last_request_id = models.PositiveIntegerField()
+    requests = models.PositiveIntegerField(default=0)
+    lenders = models.PositiveIntegerField(default=0)
+    size = models.PositiveIntegerField(default=0, help_text='Compressed size in bytes.')
+
+    class Meta:
+        ordering = ("-created",)
+        verbose_name = "Rate Quote Archive"
+        verbose_name_plural = "Rate Quote Archives"
+        app_label = 'mortgage_profiles'
+
+    def __unicode__(self):
+        return u"{} ({} requests, {} lenders)".format(self.name, self.requests, self.lenders)
@@ -125,8 +125,10 @@ class MortgageProfile(TimeStampedModel):
 
     # Consumer portal rate quote tool refresh status
     REFRESH_PROGRESS_CHOICES = Choices(
+        ('queued', 'Queued'),
         ('in_progress', 'In Progress'),
-        ('complete', 'Complete')
+        ('complete', 'Complete'),
+        ('failed', 'Failed'),
     )
 
     PROPERTY_OCCUPATION_CHOICES = Choices(
@@ -245,9 +247,11 @@ class MortgageProfile(TimeStampedModel):
         location = '{}, {}'.format(self.property_county, self.property_state)
         return location
 
-    def update_refresh_status(self, status):
-        """Set the rate quote progress status."""
+    def update_refresh_status(self, status, save=False):
+        """Set the rate quote progress status, save only the status if requested."""
         self.rate_quote_refresh_progress = status
+        if save:
+            self.save(update_fields=['rate_quote_refresh_progress'])
 
     def current_rate_quote_request(self):
         return self.rate_quote_requests.order_by('-created').first()
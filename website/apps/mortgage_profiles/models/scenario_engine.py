@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+from collections import defaultdict
+from decimal import Decimal
+
+# Rate ladder around the par rate, in basis points
+RATE_LADDER = ('25.0', '12.5', '0.0', '-12.5', '-25.0')
+
+
+class RateQuoteScenarioEngine(object):
+    """
+    In-memory index of the lenders of a single rate quote request.
+
+    Lenders are loaded once and grouped by (term, amortization_type), each group sorted by points and rate.
+    Par lender, best price at rate and rate ladder lookups are then answered without queries.
+
+    Selection rules mirror the former queryset filters:
+    * par lender: lowest rate among the 5 credits (points <= 0) closest to par
+    * best price at rate: lowest points at exactly that rate
+
+    With a compact lender set, lenders returned by the lookups are promoted to rows with the promote callable.
+    """
+
+    PAR_CANDIDATES = 5
+
+    def __init__(self, lenders, promote=None):
+        self.promote = promote
+        self.products = defaultdict(list)
+        for lender in lenders:
+            self.products[(lender.term, lender.amortization_type)].append(lender)
+
+        self.best_price = {}
+        for key, product_lenders in self.products.items():
+            product_lenders.sort(key=lambda item: (item.points, item.rate))
+            best_price = self.best_price[key] = {}
+            for lender in product_lenders:
+                best_price.setdefault(lender.rate, lender)
+        self._par_lenders = {}
+
+    @classmethod
+    def for_request(cls, rate_quote_request):
+        """Load all lenders of the request with a single query, or from its compact lender set."""
+        if rate_quote_request is None:
+            return cls([])
+        lender_set = rate_quote_request.get_lender_set()
+        if lender_set is not None:
+            return cls(lender_set.get_lenders(), promote=rate_quote_request.promote_lenders)
+        return cls(rate_quote_request.rate_quote_lenders.all())
+
+    def _promoted(self, lenders):
+        if self.promote is not None:
+            self.promote(lenders)
+        return lenders
+
+    def __len__(self):
+        return sum(len(item) for item in self.products.values())
+
+    def has_product(self, term, amortization_type):
+        return (term, amortization_type) in self.products
+
+    def get_lenders(self, term, amortization_type):
+        """Return lenders for the product sorted by points and rate."""
+        return self.products.get((term, amortization_type), [])
+
+    def get_provided_loans(self):
+        """Return available (term, amortization_type) pairs."""
+        return sorted(self.products.keys())
+
+    def get_best_price(self, term, amortization_type, rate):
+        """Return lender with the lowest points at the rate or None."""
+        lender = self.best_price.get((term, amortization_type), {}).get(Decimal(rate))
+        return self._promoted([lender])[0]
+
+    @classmethod
+    def _lowest_rate_closest_to_par(cls, lenders):
+        candidates = sorted(lenders, key=lambda item: (-item.points, item.rate))[:cls.PAR_CANDIDATES]
+        return min(candidates, key=lambda item: item.rate) if candidates else None
+
+    def get_par_lender(self, term, amortization_type, adjust=False):
+        """
+        Return lowest rate lender among the credits closest to par or None.
+
+        With adjust, fall back to the lenders with points when there are no credits.
+        """
+        return self._promoted([self._get_par_lender(term, amortization_type, adjust)])[0]
+
+    def _get_par_lender(self, term, amortization_type, adjust):
+        key = (term, amortization_type, adjust)
+        if key not in self._par_lenders:
+            lenders = self.get_lenders(term, amortization_type)
+            result = self._lowest_rate_closest_to_par([item for item in lenders if item.points <= 0])
+            if result is None and adjust:
+                result = self._lowest_rate_closest_to_par([item for item in lenders if item.points > 0])
+            self._par_lenders[key] = result
+        return self._par_lenders[key]
+
+    def get_par_lender_by_rate(self, term, amortization_type, rate):
+        """Return the credit closest to par at the rate or None."""
+        rate = Decimal(rate)
+        credits = [item for item in self.get_lenders(term, amortization_type)
+                   if item.rate == rate and item.points <= 0]
+        return self._promoted([credits[-1]])[0] if credits else None
+
+    def get_rate_ladder(self, term, amortization_type, adjust=False, ladder=RATE_LADDER):
+        """Return best priced lenders for the rates around the par rate, empty list without a par lender."""
+        par_lender = self._get_par_lender(term, amortization_type, adjust)
+        if par_lender is None:
+            return []
+        best_price = self.best_price[(term, amortization_type)]
+        lenders = (best_price.get(par_lender.rate + Decimal(difference)) for difference in ladder)
+        return self._promoted([lender for lender in lenders if lender])
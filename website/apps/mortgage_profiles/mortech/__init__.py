@@ -2,4 +2,4 @@
 from mortgage_profiles.mortech.api import *
 # pylint: disable=W0401
 from mortgage_profiles.mortech.results import *
-from mortgage_profiles.mortech.fees import MortechFees
+from mortgage_profiles.mortech.fees import MortechFees, MortechFeesBatch
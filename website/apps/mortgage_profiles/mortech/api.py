@@ -11,18 +11,19 @@ Mortech documentation: https://sample.box.com/mortech-api-documentation
 import copy
 import logging
 
-from decimal import Decimal
-from lxml import etree
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import requests
+from requests_futures.sessions import FuturesSession
 from requests.exceptions import ConnectionError, HTTPError, Timeout, RequestException
 
 from django.conf import settings
-from core.utils import memoize
-from mortgage_profiles.models import MortgageProfile, RateQuoteLender, RateQuoteRequest
+from core.utils import memoize_method
+from mortgage_profiles.models import MortgageProfile, RateQuoteLender, RateQuoteLenderSet, RateQuoteRequest
+from mortgage_profiles.mortech.cache import MortechResponseCache
 from mortgage_profiles.mortech.calculations import (
     MortechCalculations, MortechCalculationsPurchase, MortechCalculationsRefinance)
-from mortgage_profiles.utils import (
-    MortechXMLParser, get_lender_fees, get_term, get_program_type)
+from mortgage_profiles.utils import MortechXMLParser
 
 logger = logging.getLogger('sample.mortech.api')
 
@@ -34,6 +35,10 @@ class MortechApi(object):
 
     MORTECH_ENDPOINT = settings.MORTECH_ENDPOINT
     SAVE_MORTECH_RESPONSE = settings.SAVE_MORTECH_RESPONSE
+    CONCURRENT_FILTERS = settings.MORTECH_CONCURRENT_FILTERS
+    COMPACT_LENDERS = settings.RATE_QUOTE_LENDER_STORAGE == 'compact'
+    response_cache = MortechResponseCache()
+    REQUEST_TIMEOUT = 90
 
     MORTECH_KINDS = {
         MortgageProfile.PURCHASE: MortechCalculationsPurchase,
@@ -49,7 +54,7 @@ class MortechApi(object):
         mortech_calculations = self.MORTECH_KINDS[self.instance.kind]
         return mortech_calculations(self.instance)
 
-    @memoize
+    @memoize_method
     def get_initial_data(self):
         '''
         Return user data from mortgage_profile to form a Mortech request.
@@ -98,7 +103,7 @@ class MortechApi(object):
 
         return initial_data
 
-    @memoize
+    @memoize_method
     def is_valid(self):
         return all([
             self.calculations.is_enough_data(),
@@ -129,45 +134,109 @@ class MortechApi(object):
             filter_ids.insert(0, '999999')
         return filter_ids
 
-    def get_response(self):
-        """Return Mortech API response."""
+    def post_filter_request(self, filter_id, session=requests):
+        """
+        Send Mortech request for the filter id. Return a response or, for a futures session, a future.
+        """
+        request_data = self.build_request_data()
+        request_data['filterId'] = filter_id
+        return session.post(self.MORTECH_ENDPOINT, params=request_data, timeout=self.REQUEST_TIMEOUT)
+
+    @staticmethod
+    def receive_response(send):
+        """Call send to obtain the Mortech response, raise and log on any request error."""
+        try:
+            response = send()
+            response.raise_for_status()
+        except Timeout, exc:
+            logger.exception("MORTECH-REQUEST-TIMEOUT %s", exc)
+            raise
+        except ConnectionError, exc:
+            logger.exception("MORTECH-REQUEST-CONNECTIONERROR %s", exc)
+            raise
+        except HTTPError, exc:
+            logger.exception("MORTECH-REQUEST-HTTPERROR %s", exc)
+            raise
+        except RequestException, exc:
+            logger.exception("MORTECH-REQUEST-REQUESTEXCEPTION %s", exc)
+            raise
+        else:
+            if not response.content:
+                logger.debug("MORTECH-GET-RESPONSE-NO-CONTENT req headers %s, res headers %s",
+                             response.headers, response.request.headers)
+                raise Exception("Mortech response is missing content.")
+        return response
+
+    def parse_filter_response(self, filter_id, response):
+        """Save and parse the response, the result count is taken from the same parsing pass."""
+        self.save_response(self.instance.initial_data, filter_id, response.content)
+        parsed_response = self.parse_xml(response.content)
+        result_count = parsed_response.result_count if parsed_response else 0
+        if 0 < result_count:
+            logger.debug('MORTECH-GET-RESPONSE-SUCCESS filter "%s" count %s',
+                         filter_id, result_count)
+        else:
+            logger.info('MORTECH-GET-RESPONSE-SKIP filter "%s" count %s',
+                        filter_id, result_count)
+        return parsed_response
+
+    def get_filtered_response(self):
+        """
+        Request filters one by one, return the first parsed response with results or the last one.
+        """
         for filter_id in self.get_filter_ids():
-            request_data = self.build_request_data()
-            request_data['filterId'] = filter_id
-            try:
-                response = requests.post(self.MORTECH_ENDPOINT, params=request_data, timeout=90)
-                response.raise_for_status()
-            except Timeout, exc:
-                logger.exception("MORTECH-REQUEST-TIMEOUT %s", exc)
-                raise
-            except ConnectionError, exc:
-                logger.exception("MORTECH-REQUEST-CONNECTIONERROR %s", exc)
-                raise
-            except HTTPError, exc:
-                logger.exception("MORTECH-REQUEST-HTTPERROR %s", exc)
-                raise
-            except RequestException, exc:
-                logger.exception("MORTECH-REQUEST-REQUESTEXCEPTION %s", exc)
-                raise
-            else:
-                if not response.content:
-                    logger.debug("MORTECH-GET-RESPONSE-NO-CONTENT req headers %s, res headers %s",
-                                 response.headers, response.request.headers)
-                    raise Exception("Mortech response is missing content.")
-
-            self.save_response(self.instance.initial_data, filter_id, response.content)
-            xml = etree.fromstring(response.content)
-            result_count = sum([int(item) for item in xml.xpath('//results/@size')])
-            if 0 < result_count:
-                logger.debug('MORTECH-GET-RESPONSE-SUCCESS filter "%s" count %s',
-                             filter_id, result_count)
-                xml = None
+            response = self.receive_response(partial(self.post_filter_request, filter_id))
+            parsed_response = self.parse_filter_response(filter_id, response)
+            if parsed_response and parsed_response.result_count:
                 break
-            else:
-                logger.info('MORTECH-GET-RESPONSE-SKIP filter "%s" count %s',
-                            filter_id, result_count)
         else:
             logger.debug('MORTECH-GET-RESPONSE-FAILED')
+        return parsed_response
+
+    def get_filtered_response_concurrent(self):
+        """
+        Request all filters at once, return the first parsed response with results or the last one.
+
+        Responses are examined in filter priority order, so the result is the same as for
+        get_filtered_response. Requests for lower priority filters are cancelled or ignored
+        as soon as a response with results is found.
+        """
+        filter_ids = self.get_filter_ids()
+        executor = ThreadPoolExecutor(max_workers=len(filter_ids))
+        session = FuturesSession(executor=executor)
+        pending = [(filter_id, self.post_filter_request(filter_id, session=session))
+                   for filter_id in filter_ids]
+        try:
+            for filter_id, future in pending:
+                response = self.receive_response(future.result)
+                parsed_response = self.parse_filter_response(filter_id, response)
+                if parsed_response and parsed_response.result_count:
+                    break
+            else:
+                logger.debug('MORTECH-GET-RESPONSE-FAILED')
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+        return parsed_response
+
+    def get_response(self, use_cache=True):
+        """
+        Return Mortech API response.
+
+        A cached response for the same request data and filter ids is used instead of calling Mortech, unless
+        use_cache is False. Lenders are saved for cached responses as well.
+        """
+        request_data = self.build_request_data()
+        filter_ids = self.get_filter_ids()
+        parsed_response = self.response_cache.get(request_data, filter_ids) if use_cache else None
+        if parsed_response is None:
+            if self.CONCURRENT_FILTERS:
+                parsed_response = self.get_filtered_response_concurrent()
+            else:
+                parsed_response = self.get_filtered_response()
+            if parsed_response:
+                self.response_cache.set(request_data, parsed_response, filter_ids)
 
         # Update rate quote refresh flag to in_progress
         self.instance.update_refresh_status(self.instance.REFRESH_PROGRESS_CHOICES.in_progress)
@@ -175,7 +244,6 @@ class MortechApi(object):
                     self.instance.id,
                     self.instance.rate_quote_refresh_progress)
 
-        parsed_response = self.parse_xml(response.content)
         if parsed_response.has_results:
             self.save_lenders(parsed_response)
         return parsed_response
@@ -197,51 +265,28 @@ class MortechApi(object):
         return xml_parser.parse(response)
 
     def save_lenders(self, mortech_response):
-        """Takes api response, consumes lender data and saves to db."""
-        rate_quote_request = RateQuoteRequest.objects.create(mortgage_profile=self.instance)
+        """
+        Takes api response, consumes lender data and saves to db.
 
-        lenders_for_bulk = []
-        results = mortech_response.response.get('results')
-        if not results:
+        With COMPACT_LENDERS the quotes are saved as one RateQuoteLenderSet and unsaved lenders are returned.
+        """
+        rate_quote_request = RateQuoteRequest.objects.create(
+            mortgage_profile=self.instance, compact_lenders=self.COMPACT_LENDERS)
+
+        if not mortech_response.quotes:
             logger.info('MORTECH-NO-RESULTS-FOUND rate_quote_request %s credit_score %s ltv %s',
                         rate_quote_request.id,
                         self.instance.credit_score,
                         self.instance.get_loan_to_value())
             return
         else:
-            if not isinstance(results, (list, tuple)):
-                results = [results]
-            for item in results:
-                quotes = item.get('quote', ())
-                if not isinstance(quotes, (list, tuple)):
-                    quotes = [quotes]
-
-                for quote in quotes:
-                    fees = get_lender_fees(quote['quote_detail']['fees']['fee_list']['fee'])
-                    term = get_term(quote)
-                    program_type = get_program_type(quote['@vendor_product_name'], item['@product_name'])
-                    rate = Decimal(quote['quote_detail']['@rate']) * Decimal(100.0)
-
-                    lender = RateQuoteLender(
-                        request=rate_quote_request,
-                        lender_name=quote['@vendor_name'],
-                        term=term,
-                        amortization_type=item['@term_type'],
-                        program_category=item['@product_name'],
-                        program_name=quote['@vendor_product_name'],
-                        program_type=program_type,
-                        points=Decimal(quote['quote_detail']['@price']),
-                        price=Decimal(quote['quote_detail']['ratesheet_price']),
-                        rate=rate,
-                        monthly_premium=Decimal(quote['quote_detail']['@monthly_premium']),
-                        piti=Decimal(quote['quote_detail']['@piti']),
-                        upfront_fee=Decimal(quote['quote_detail']['@upfront_fee']),
-                        apr=Decimal(quote['quote_detail']['@apr']),
-                        fees=fees
-                    )
-                    lenders_for_bulk.append(lender)
-
-            lenders_list = RateQuoteLender.objects.bulk_create(lenders_for_bulk)
+            if self.COMPACT_LENDERS:
+                lender_set = RateQuoteLenderSet.create_for_request(rate_quote_request, mortech_response.quotes)
+                lenders_list = lender_set.get_lenders()
+            else:
+                lenders_for_bulk = [RateQuoteLender(request=rate_quote_request, **quote._asdict())
+                                    for quote in mortech_response.quotes]
+                lenders_list = RateQuoteLender.objects.bulk_create(lenders_for_bulk)
 
             logger.info(
                 "%d Lenders saved to db for Profile: %s, User: %s.",
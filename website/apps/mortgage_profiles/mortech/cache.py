@@ -0,0 +1,110 @@
+'''
+Cache of parsed Mortech responses.
+
+Identical scenarios (same state, county, FICO, loan amount, property value, occupancy, property type...)
+produce the same Mortech request, so the parsed response is cached under a key built from the normalized
+request data and the filter ids the response was requested with (veterans get VA products too). Entries expire
+after MORTECH_CACHE_TIMEOUT seconds, which should not exceed the rate sheet refresh interval.
+A purge bumps the key generation, so all existing entries become unreachable at once.
+'''
+
+import hashlib
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from mortgage_profiles.utils import MortechResponse
+
+logger = logging.getLogger('sample.mortech.cache')
+
+
+class MortechResponseCache(object):
+    '''
+    Store parsed Mortech responses keyed on normalized request data.
+    A timeout of 0 disables the cache.
+    '''
+
+    KEY_PREFIX = 'mortech.response'
+    GENERATION_KEY = 'mortech.response.generation'
+    HITS_KEY = 'mortech.response.hits'
+    MISSES_KEY = 'mortech.response.misses'
+
+    # Request parameters which do not describe the scenario
+    EXCLUDED_FIELDS = ('licenseKey', 'thirdPartyName', 'customerId', 'emailAddress', 'request_id', 'filterId')
+
+    def __init__(self, cache_name=None, timeout=None):
+        self.cache_name = cache_name or settings.MORTECH_CACHE_NAME
+        self.timeout = settings.MORTECH_CACHE_TIMEOUT if timeout is None else timeout
+
+    @property
+    def enabled(self):
+        return bool(self.timeout)
+
+    def get_cache(self):
+        return caches[self.cache_name]
+
+    def get_generation(self):
+        cache = self.get_cache()
+        cache.add(self.GENERATION_KEY, int(time.time()), None)
+        return cache.get(self.GENERATION_KEY)
+
+    @classmethod
+    def normalize(cls, request_data, filter_ids=()):
+        '''
+        Return request data and filter ids as a canonical string, regardless of key order and value types.
+        The filter id of a single request is excluded, the response merges the results of all the filter ids.
+        '''
+        data = {key: u'{}'.format(value) for key, value in request_data.items()
+                if key not in cls.EXCLUDED_FIELDS and value is not None}
+        data['filterIds'] = sorted(u'{}'.format(filter_id) for filter_id in filter_ids)
+        return json.dumps(data, sort_keys=True)
+
+    def get_key(self, request_data, filter_ids=()):
+        digest = hashlib.sha1(self.normalize(request_data, filter_ids)).hexdigest()
+        return '{}.{}.{}'.format(self.KEY_PREFIX, self.get_generation(), digest)
+
+    def get(self, request_data, filter_ids=()):
+        '''Return cached MortechResponse for the request data and filter ids or None.'''
+        if not self.enabled:
+            return None
+        cached = self.get_cache().get(self.get_key(request_data, filter_ids))
+        if cached is None:
+            self.count(self.MISSES_KEY)
+            logger.debug('MORTECH-CACHE-MISS')
+            return None
+        self.count(self.HITS_KEY)
+        logger.debug('MORTECH-CACHE-HIT')
+        response, quotes, result_count = cached
+        return MortechResponse(response, quotes=quotes, result_count=result_count)
+
+    def set(self, request_data, parsed_response, filter_ids=()):
+        '''Cache the response, only responses with results are worth caching.'''
+        if not (self.enabled and parsed_response.result_count):
+            return
+        cached = (parsed_response.response, list(parsed_response.quotes), parsed_response.result_count)
+        self.get_cache().set(self.get_key(request_data, filter_ids), cached, self.timeout)
+
+    def count(self, key):
+        cache = self.get_cache()
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+    def purge(self):
+        '''Make all cached responses unreachable, they expire by themselves.'''
+        generation = max(int(time.time()), self.get_generation() + 1)
+        self.get_cache().set(self.GENERATION_KEY, generation, None)
+        logger.info('MORTECH-CACHE-PURGED generation %s', generation)
+
+    def get_stats(self):
+        cache = self.get_cache()
+        hits = cache.get(self.HITS_KEY) or 0
+        misses = cache.get(self.MISSES_KEY) or 0
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': float(hits) / (hits + misses) if hits + misses else 0.0,
+            'generation': self.get_generation(),
+        }
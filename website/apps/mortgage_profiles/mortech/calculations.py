@@ -2,7 +2,7 @@ import logging
 from abc import ABCMeta, abstractmethod
 
 from django.conf import settings
-from core.utils import memoize
+from core.utils import memoize_method
 from mortgage_profiles.models import (
     MortgageProfile, MortgageProfilePurchase,
     MortgageProfileRefinance)
@@ -121,7 +121,7 @@ class MortechCalculations(object):
             'property_state'
         ]
 
-    @memoize
+    @memoize_method
     def get_loan_amount(self):
         """
         Return loan amount.
@@ -129,7 +129,7 @@ class MortechCalculations(object):
         """
         return self.instance.get_loan_amount()
 
-    @memoize
+    @memoize_method
     def get_property_value(self):
         """
         Return property value.
@@ -170,7 +170,7 @@ class MortechCalculations(object):
         """Return military status."""
         return self.instance.is_veteran or False
 
-    @memoize
+    @memoize_method
     def get_loan_to_value(self):
         """Return LTV ratio."""
         return self.instance.get_loan_to_value()
@@ -2,7 +2,7 @@
 import logging
 
 from decimal import Decimal
-from core.utils import memoize
+from core.utils import memoize_method
 
 from mortgage_profiles.mortech.api import MortechApi
 
@@ -50,40 +50,55 @@ class MortechFees(object):
         self.lender = lender
         self.fees = self.get_fees()
 
-    @memoize
+    @memoize_method
     def get_escrowed_insurance(self):
         """
         Details: Loan amount * 0.00375 / 12
 
         """
-        return Decimal(self.get_loan_amount()) * Decimal(0.00375 / 12)
+        return self.escrowed_insurance(self.get_loan_amount())
 
-    @memoize
+    @staticmethod
+    def escrowed_insurance(loan_amount):
+        return Decimal(loan_amount) * Decimal(0.00375 / 12)
+
+    @memoize_method
     def get_escrowed_taxes(self):
         """
         Details: Property value * 0.0125 / 12
 
         """
-        return Decimal(self.instance.get_property_value() * 0.0125 / 12)
+        return self.escrowed_taxes(self.instance.get_property_value())
+
+    @staticmethod
+    def escrowed_taxes(property_value):
+        return Decimal(property_value * 0.0125 / 12)
 
     def get_fees(self):
         """
         Return dict that contains fee id as a key and fee value as a value.
         """
+        return self.lender_fees(
+            self.lender, self.get_escrowed_taxes(), self.get_escrowed_insurance(), self.get_prepaid_interest(),
+            self.get_mortgage_insurance(), self.get_cost_of_chosen_rate())
+
+    @classmethod
+    def lender_fees(cls, lender, escrowed_taxes, escrowed_insurance, prepaid_interest, mortgage_insurance,
+                    cost_of_chosen_rate):
         return {
-            self.UNDERWRITING: self.lender.underwriting_fee,
-            self.FLOOD_CERTIFICATION: self.lender.flood_certification,
-            self.UPFRONT_MORTGAGE_INSURANCE_PREMIUM: self.lender.upfront_fee,
-            self.TAX_SERVICE_FEE: self.lender.tax_service_fee,
-            self.ESCROWED_TAXES: self.get_escrowed_taxes(),
-            self.ESCROWED_INSURANCE: self.get_escrowed_insurance(),
-            self.PREPAID_INTEREST: self.get_prepaid_interest(),
-            self.MORTGAGE_INSURANCE: self.get_mortgage_insurance(),
-            self.COST_OF_CHOSEN_RATE: self.get_cost_of_chosen_rate(),
-            self.ESTIMATED_APPRAISAL_FEE: self.lender.estimated_appraisal_fee,
-            self.TITLE_FEE: self.lender.title_fee,
-            self.ESCROW_FEE: self.lender.escrow_fee,
-            self.CREDIT_REPORT_FEE: self.lender.credit_report_fee,
+            cls.UNDERWRITING: lender.underwriting_fee,
+            cls.FLOOD_CERTIFICATION: lender.flood_certification,
+            cls.UPFRONT_MORTGAGE_INSURANCE_PREMIUM: lender.upfront_fee,
+            cls.TAX_SERVICE_FEE: lender.tax_service_fee,
+            cls.ESCROWED_TAXES: escrowed_taxes,
+            cls.ESCROWED_INSURANCE: escrowed_insurance,
+            cls.PREPAID_INTEREST: prepaid_interest,
+            cls.MORTGAGE_INSURANCE: mortgage_insurance,
+            cls.COST_OF_CHOSEN_RATE: cost_of_chosen_rate,
+            cls.ESTIMATED_APPRAISAL_FEE: lender.estimated_appraisal_fee,
+            cls.TITLE_FEE: lender.title_fee,
+            cls.ESCROW_FEE: lender.escrow_fee,
+            cls.CREDIT_REPORT_FEE: lender.credit_report_fee,
         }
 
     def get_non_zero_fees(self):
@@ -93,19 +108,26 @@ class MortechFees(object):
         Avoids returning any fees which might be unknown and treated as zero.
 
         """
-        fees = self.get_fees()
+        return self.non_zero_fees(self.get_fees())
+
+    @classmethod
+    def non_zero_fees(cls, fees):
         return {fee: value for fee, value in fees.items()
-                if ((fee == self.COST_OF_CHOSEN_RATE) or
+                if ((fee == cls.COST_OF_CHOSEN_RATE) or
                     not ((value is None) or Decimal(value).is_zero()))}
 
-    @memoize
+    @memoize_method
     def get_cost_of_chosen_rate(self):
         """
         Cost = Loan amount * lender.points
         """
-        return self.get_loan_amount() * self.lender.points / 100
+        return self.cost_of_chosen_rate(self.get_loan_amount(), self.lender)
 
-    @memoize
+    @staticmethod
+    def cost_of_chosen_rate(loan_amount, lender):
+        return loan_amount * lender.points / 100
+
+    @memoize_method
     def get_prepaid_interest(self):
         """
         Details: Initial Interest = Loan Amount * Interest Rate *
@@ -113,58 +135,125 @@ class MortechFees(object):
         divided by Loan Term in months (360 for 30 yr fixed and ARMS, 180 for 15 year fixed)
 
         """
-        rate = self.lender.rate / 100
-        term = 365 * self.LENDER_TERM.get(self.lender.term)
-        prepaid_interest = (self.lender.prepaid_interest
-                            if self.lender.prepaid_interest
-                            else self.get_loan_amount() * rate / term)
+        return self.prepaid_interest(self.get_loan_amount(), self.lender)
 
-        return Decimal(prepaid_interest)
+    @classmethod
+    def prepaid_interest(cls, loan_amount, lender):
+        if lender.prepaid_interest:
+            return Decimal(lender.prepaid_interest)
+        rate = lender.rate / 100
+        term = 365 * cls.LENDER_TERM.get(lender.term)
+        return Decimal(loan_amount * rate / term)
 
-    @memoize
+    @memoize_method
     def get_mortgage_insurance(self):
         """
         Return monthly mortgage fee.
         LTV and other adjustments are pre-calculated by Mortech.
         """
-        result = 0 if self.lender.monthly_premium is None else self.lender.monthly_premium
+        result = self.mortgage_insurance(self.lender)
         logger.debug(u"Mortgage insurance: %s, Lender: %s.", result, self.lender)
-        return Decimal(result)
+        return result
 
-    @memoize
+    @staticmethod
+    def mortgage_insurance(lender):
+        return Decimal(0 if lender.monthly_premium is None else lender.monthly_premium)
+
+    @memoize_method
     def get_total_fees(self):
         """
         Return total fees for rate-quote results page.
         """
-        fees = [
-            self.lender.underwriting_fee,
-            self.get_cost_of_chosen_rate(),
-            self.lender.tax_service_fee,
-            self.lender.upfront_fee,
-            self.get_prepaid_interest(),
-            self.lender.estimated_appraisal_fee,
-            self.lender.title_fee,
-            self.lender.escrow_fee,
-            self.lender.credit_report_fee]
-        result = sum([Decimal(fee) for fee in fees
-                      if not ((fee is None) or Decimal(fee).is_zero())])
-
+        result = self.total_fees(self.lender, self.get_cost_of_chosen_rate(), self.get_prepaid_interest())
         logger.debug(u"Total fees: %s, Lender: %s.", result, self.lender)
         return result
 
-    @memoize
+    @staticmethod
+    def total_fees(lender, cost_of_chosen_rate, prepaid_interest):
+        fees = [
+            lender.underwriting_fee,
+            cost_of_chosen_rate,
+            lender.tax_service_fee,
+            lender.upfront_fee,
+            prepaid_interest,
+            lender.estimated_appraisal_fee,
+            lender.title_fee,
+            lender.escrow_fee,
+            lender.credit_report_fee]
+        return sum([Decimal(fee) for fee in fees
+                    if not ((fee is None) or Decimal(fee).is_zero())])
+
+    @memoize_method
     def get_total_monthly_payment(self):
         '''Return total monthly payment, lender.piti will not include any taxes nor escrow fees.'''
-        result = sum([
-            self.lender.monthly_payment,
-            self.get_escrowed_insurance(),
-            self.get_escrowed_taxes(),
-            self.get_mortgage_insurance()
-        ])
+        result = self.total_monthly_payment(
+            self.lender, self.get_escrowed_insurance(), self.get_escrowed_taxes(), self.get_mortgage_insurance())
 
         logger.debug(u"Total monthly payment: %s, Lender: %s.", result, self.lender)
 
         return result
 
+    @staticmethod
+    def total_monthly_payment(lender, escrowed_insurance, escrowed_taxes, mortgage_insurance):
+        return sum([lender.monthly_payment, escrowed_insurance, escrowed_taxes, mortgage_insurance])
+
     def get_loan_amount(self):
         return self.calculations.get_loan_amount()
+
+
+class MortechFeesBatch(object):
+    """
+    Fee and payment calculations for many lenders of one mortgage profile.
+
+    Profile level values (loan amount, escrowed taxes and insurance) are computed once, lender level values
+    are computed column by column, all with the MortechFees formulas. Results are read per lender with get_row.
+    """
+
+    def __init__(self, instance, lenders):
+        self.instance = instance
+        self.lenders = [lender for lender in lenders if lender is not None]
+        self.index = {lender.pk: position for position, lender in enumerate(self.lenders)}
+
+        self.calculations = MortechApi(instance).calculations
+        self.loan_amount = self.calculations.get_loan_amount()
+        self.escrowed_insurance = MortechFees.escrowed_insurance(self.loan_amount)
+        self.escrowed_taxes = MortechFees.escrowed_taxes(instance.get_property_value())
+        self.columns = self.get_columns()
+
+    def get_columns(self):
+        """Return dict of column name to list of values in lender order."""
+        lenders = self.lenders
+        cost_of_chosen_rate = [MortechFees.cost_of_chosen_rate(self.loan_amount, lender) for lender in lenders]
+        prepaid_interest = [MortechFees.prepaid_interest(self.loan_amount, lender) for lender in lenders]
+        mortgage_insurance = [MortechFees.mortgage_insurance(lender) for lender in lenders]
+        return {
+            'cost_of_chosen_rate': cost_of_chosen_rate,
+            'prepaid_interest': prepaid_interest,
+            'mortgage_insurance': mortgage_insurance,
+            'total_fees': [MortechFees.total_fees(*values)
+                           for values in zip(lenders, cost_of_chosen_rate, prepaid_interest)],
+            'total_monthly_payment': [
+                MortechFees.total_monthly_payment(lender, self.escrowed_insurance, self.escrowed_taxes, insurance)
+                for lender, insurance in zip(lenders, mortgage_insurance)],
+        }
+
+    def __len__(self):
+        return len(self.lenders)
+
+    def __contains__(self, lender):
+        return lender.pk in self.index
+
+    def get_fees(self, position):
+        return MortechFees.lender_fees(
+            self.lenders[position], self.escrowed_taxes, self.escrowed_insurance,
+            self.columns['prepaid_interest'][position], self.columns['mortgage_insurance'][position],
+            self.columns['cost_of_chosen_rate'][position])
+
+    def get_row(self, lender):
+        """Return non-zero fees, total fees and total monthly payment of the lender."""
+        position = self.index[lender.pk]
+        return {
+            'fees': MortechFees.non_zero_fees(self.get_fees(position)),
+            'total_fees': self.columns['total_fees'][position],
+            'total_monthly_payment': self.columns['total_monthly_payment'][position],
+        }
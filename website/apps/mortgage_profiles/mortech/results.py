@@ -1,11 +1,11 @@
 from abc import ABCMeta
 import logging
-from decimal import Decimal
 
-from core.utils import memoize
+from core.utils import memoize_method
 from mortgage_profiles.models import MortgageProfile
 from mortgage_profiles.serializers import RateQuoteLenderSerializer
 from mortgage_profiles.models import RateQuoteLender
+from mortgage_profiles.models.scenario_engine import RateQuoteScenarioEngine
 from mortgage_profiles.mortech.calculations import MortechCalculations
 
 logger = logging.getLogger('sample.mortech.results')
@@ -64,7 +64,7 @@ class MortechScenario(object):
         self.instance = mortgage_profile
         self.calculations = MortechCalculations
 
-    @memoize
+    @memoize_method
     def is_valid(self):
         """
         Return bool. Validation that results can be calculated.
@@ -72,10 +72,10 @@ class MortechScenario(object):
         """
         logger.info('MORTECH-SCENARIO: EXISTS %s, LENDERS %s',
                     self.instance.rate_quote_requests.exists(),
-                    self.instance.rate_quote_requests.first().rate_quote_lenders.exists())
+                    self.instance.rate_quote_requests.first().has_lenders)
         return (
             self.instance.rate_quote_requests.exists() and
-            self.instance.rate_quote_requests.first().rate_quote_lenders.exists() and
+            self.instance.rate_quote_requests.first().has_lenders and
             self.instance.ownership_time
         )
 
@@ -92,57 +92,42 @@ class MortechScenario(object):
     def get_fallback_term_and_amortization_type(self):
         return (self.AMORTIZATION_30, self.AMORTIZATION_TYPE_FIXED)
 
-    def calculate(self, term=None, amortization_type=None, rate=None):
+    def get_engine(self):
         """
-        Return RateQuote lenders queryset that suits provided term and amortization_type.
+        Return in-memory scenario engine with all lenders of the latest rate quote request.
+
+        """
+        return RateQuoteScenarioEngine.for_request(self.instance.rate_quote_requests.first())
+
+    def calculate(self, term=None, amortization_type=None, rate=None, engine=None):
+        """
+        Return RateQuote lender that suits provided term and amortization_type.
+
+        Pass the engine to answer several calculations from a single load of the lenders.
 
         """
         lggr = logger.debug
-        mtreq = self.instance.rate_quote_requests.first()
-        queryset = mtreq.rate_quote_lenders.filter(
-            term=term,
-            amortization_type=amortization_type)
+        if engine is None:
+            engine = self.get_engine()
         if rate:
-            # query for specific rate with minimal points
-            queryset = queryset.filter(rate=rate).order_by('points')
-            lggr('RESULTS-CALCULATE-RATE req %s term %s amrt %s rate %s count %s',
-                 mtreq.id, term, amortization_type, rate, queryset.count())
-            result = queryset.first()
+            # lender for specific rate with minimal points
+            result = engine.get_best_price(term, amortization_type, rate)
+            lggr('RESULTS-CALCULATE-RATE term %s amrt %s rate %s count %s',
+                 term, amortization_type, rate, len(engine.get_lenders(term, amortization_type)))
         else:
-            # query for lowest rate of top 5 products with credit closest to PAR
-            qs = queryset.filter(points__lte=0.0).order_by('-points', 'rate')
-            lggr('RESULTS-CALCULATE-POINTS req %s term %s amrt %s count %s',
-                 mtreq.id, term, amortization_type, qs.count())
-            if qs.exists():
-                qs = qs[:5]
-                result = min(qs, key=lambda item: item.rate)
-            else:
-                # adjust filter by increasing points threshold on original queryset
-                lggr("RESULTS-CALCULATE-ADJUST-FILTER")
-                result = self.adjust_filter(queryset)
+            # lowest rate of top 5 products with credit closest to PAR,
+            # adjusted to products with points if there are no credits
+            result = engine.get_par_lender(term, amortization_type, adjust=True)
+            lggr('RESULTS-CALCULATE-POINTS term %s amrt %s count %s',
+                 term, amortization_type, len(engine.get_lenders(term, amortization_type)))
         if result:
             lggr('RESULTS-CALCULATE-FOUND %s type %s rate %s points %s',
-                 mtreq.id, result.program_type, result.rate, result.points)
+                 result.request_id, result.program_type, result.rate, result.points)
         else:
-            logger.info('RESULTS-CALCULATE-NOT-FOUND %s', mtreq.id)
+            logger.info('RESULTS-CALCULATE-NOT-FOUND term %s amrt %s', term, amortization_type)
         return result
 
-    def adjust_filter(self, queryset):
-        """Increase filter threshold by points and validate."""
-        new_queryset = queryset.filter(points__gt=0.0).order_by('-points', 'rate')
-        return self.validate_queryset(new_queryset)
-
-    @classmethod
-    def validate_queryset(cls, queryset):
-        """Queryset should contain a valid lender."""
-        if queryset:
-            queryset = queryset[:5]
-            result = min(queryset, key=lambda item: item.rate)
-            return result
-        else:
-            return None
-
-    @memoize
+    @memoize_method
     def get_provided_loans(self):
         """
         Return possible RateQuote lender types.
@@ -150,7 +135,17 @@ class MortechScenario(object):
         """
         assert self.is_valid(), "MortechScenario is invalid."
 
-        return list(self.instance.rate_quote_requests.first().rate_quote_lenders.values(
+        rate_quote_request = self.instance.rate_quote_requests.first()
+        if rate_quote_request.compact_lenders:
+            engine = rate_quote_request.scenario_engine
+            # same order as the rows query below: -amortization_type, term
+            loans = sorted(engine.get_provided_loans(), key=lambda loan: loan[0])
+            loans.sort(key=lambda loan: loan[1], reverse=True)
+            return [{'amortization_type': amortization_type, 'term': term}
+                    for term, amortization_type in loans
+                    for _ in engine.get_lenders(term, amortization_type)]
+
+        return list(rate_quote_request.rate_quote_lenders.values(
             'amortization_type', 'term').order_by('-amortization_type', 'term'))
 
     def is_va_suitable(self, queryset):
@@ -230,15 +225,16 @@ class MortechDirector(object):
 
         logger.debug('GET-SCENARIO: Term %s, Am %s', term, amortization_type)
 
-        par_lender = self.scenario.calculate(term, amortization_type)
+        engine = self.scenario.get_engine()
+        par_lender = self.scenario.calculate(term, amortization_type, engine=engine)
         if not par_lender and selected_term_and_type and (term == self.scenario.AMORTIZATION_7):
             logger.info('MOVING-TO-30-FIXED term %s type %s', term, amortization_type)
             term, amortization_type = self.scenario.get_fallback_term_and_amortization_type()
-            par_lender = self.scenario.calculate(term, amortization_type)
+            par_lender = self.scenario.calculate(term, amortization_type, engine=engine)
         else:
             logger.debug('STAYING-WITH term %s type %s', term, amortization_type)
 
-        lender = (self.scenario.calculate(term, amortization_type, rate=par_lender.rate)
+        lender = (self.scenario.calculate(term, amortization_type, rate=par_lender.rate, engine=engine)
                   if par_lender
                   else None)
 
@@ -256,16 +252,9 @@ class MortechDirector(object):
         """
         Provide quotes in a +/- 0.25% spread around the par rate
         """
-        par_lender = self.scenario.calculate(term, amortization_type)
-        if par_lender:
-            lenders = []
-            for difference in ['25.0', '12.5', '0.0', '-12.5', '-25.0']:
-                rate = par_lender.rate + Decimal(difference)
-                current = self.scenario.calculate(term, amortization_type, rate=rate)
-                if current:
-                    lenders.append(current)
-        else:
-            lenders = None
+        engine = self.scenario.get_engine()
+        lenders = engine.get_rate_ladder(term, amortization_type, adjust=True)
+        logger.debug('RESULTS-FULL-SCENARIO term %s amrt %s count %s', term, amortization_type, len(lenders))
 
         scenario = {
             'term': term,
@@ -278,7 +267,7 @@ class MortechDirector(object):
     def get_errors(self):
         status = {
             'request exists': self.instance.rate_quote_requests.exists(),
-            'lender exists': self.instance.rate_quote_requests.first().rate_quote_lenders.exists(),
+            'lender exists': self.instance.rate_quote_requests.first().has_lenders,
             'ownership time': bool(self.instance.ownership_time)
         }
 
@@ -0,0 +1,139 @@
+'''
+Retention of rate quote requests and lenders.
+
+Requests older than RATE_QUOTE_RETENTION_DAYS are archived in batches, one gzipped JSON lines file per batch with
+a line per request, its lenders and its compact lender set, then deleted in one transaction per batch.
+Lines are compressed as they are serialized into a temporary file, which is then saved to the storage.
+Requests of mortgage profiles attached to a loan profile and requests with a selected lender are kept.
+Every archive is recorded as a RateQuoteArchive.
+'''
+
+import base64
+import gzip
+import json
+import logging
+import tempfile
+from datetime import timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.files.base import File
+from django.core.files.storage import get_storage_class
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from mortgage_profiles.models import RateQuoteArchive, RateQuoteLender, RateQuoteLenderSet, RateQuoteRequest
+
+logger = logging.getLogger('sample.mortgage_profiles.retention')
+
+
+class ArchiveJSONEncoder(DjangoJSONEncoder):
+    def default(self, o):  # pylint: disable=method-hidden
+        try:
+            return super(ArchiveJSONEncoder, self).default(o)
+        except TypeError:
+            return unicode(o)
+
+
+class RateQuoteRetention(object):
+    '''Archive and delete expired rate quote requests.'''
+
+    ARCHIVE_PREFIX = 'rate-quote-archive'
+
+    def __init__(self, retention_days=None, batch_size=None, storage=None):
+        self.retention_days = settings.RATE_QUOTE_RETENTION_DAYS if retention_days is None else retention_days
+        self.batch_size = batch_size or settings.RATE_QUOTE_RETENTION_BATCH_SIZE
+        self.storage = storage or get_storage_class(settings.RATE_QUOTE_ARCHIVE_STORAGE)()
+
+    def get_cutoff(self):
+        return timezone.now() - timedelta(days=self.retention_days)
+
+    @staticmethod
+    def get_expired_requests(cutoff):
+        '''Return requests created before the cutoff which are not referenced by a loan or a selected lender.'''
+        return (RateQuoteRequest.objects
+                .filter(created__lt=cutoff, mortgage_profile__loan_profilev1__isnull=True)
+                .exclude(rate_quote_lenders__mortgage_profile__isnull=False)
+                .order_by('id'))
+
+    def run(self, max_batches=None):
+        '''Archive and delete expired requests batch by batch, return totals.'''
+        cutoff = self.get_cutoff()
+        stats = {'archives': 0, 'requests': 0, 'lenders': 0, 'size': 0}
+        last_id = 0
+        while max_batches is None or stats['archives'] < max_batches:
+            ids = list(self.get_expired_requests(cutoff).filter(id__gt=last_id)
+                       .values_list('id', flat=True)[:self.batch_size])
+            if not ids:
+                break
+            archive = self.archive_batch(ids, cutoff)
+            last_id = ids[-1]
+            stats['archives'] += 1
+            for key in ('requests', 'lenders', 'size'):
+                stats[key] += getattr(archive, key)
+
+        logger.info('RATE-QUOTE-RETENTION-DONE cutoff %s archives %s requests %s lenders %s size %s',
+                    cutoff, stats['archives'], stats['requests'], stats['lenders'], stats['size'])
+        return stats
+
+    def archive_batch(self, ids, cutoff):
+        '''Write the requests to an archive file, then delete the ones still expired.'''
+        with tempfile.TemporaryFile() as content:
+            archive_file = gzip.GzipFile(fileobj=content, mode='wb')
+            try:
+                for line in self.serialize_requests(ids):
+                    archive_file.write(line)
+                    archive_file.write('\n')
+            finally:
+                archive_file.close()
+            size = content.tell()
+            content.seek(0)
+            name = self.storage.save(self.get_archive_name(ids, cutoff), File(content))
+
+        with transaction.atomic():
+            # a lender may have been selected while archiving, such requests are archived but kept
+            _, deleted = self.get_expired_requests(cutoff).filter(id__in=ids).delete()
+            archive = RateQuoteArchive.objects.create(
+                name=name,
+                cutoff=cutoff,
+                first_request_id=ids[0],
+                last_request_id=ids[-1],
+                requests=deleted.get(RateQuoteRequest._meta.label, 0),
+                lenders=deleted.get(RateQuoteLender._meta.label, 0),
+                size=size)
+
+        logger.info('RATE-QUOTE-RETENTION-ARCHIVED %s requests %s lenders %s',
+                    name, archive.requests, archive.lenders)
+        return archive
+
+    def get_archive_name(self, ids, cutoff):
+        return '{}/{:%Y/%m/%d}/rate-quotes-{}-{}.jsonl.gz'.format(self.ARCHIVE_PREFIX, cutoff, ids[0], ids[-1])
+
+    @staticmethod
+    def serialize_requests(ids):
+        '''
+        Yield a JSON line per request, with its lenders and its base64 encoded compact lender set.
+        Requests, lenders and lender sets are read side by side in request order, one row at a time.
+        '''
+        lenders = groupby(RateQuoteLender.objects.filter(request_id__in=ids).order_by('request_id', 'id')
+                          .values().iterator(), key=itemgetter('request_id'))
+        lender_sets = (RateQuoteLenderSet.objects.filter(request_id__in=ids).order_by('request_id')
+                       .values_list('request_id', 'payload').iterator())
+        next_lenders, next_lender_set = next(lenders, None), next(lender_sets, None)
+
+        for request in RateQuoteRequest.objects.filter(id__in=ids).order_by('id').values().iterator():
+            request_lenders, payload = [], None
+            while next_lenders is not None and next_lenders[0] <= request['id']:
+                if next_lenders[0] == request['id']:
+                    request_lenders = list(next_lenders[1])
+                next_lenders = next(lenders, None)
+            while next_lender_set is not None and next_lender_set[0] <= request['id']:
+                if next_lender_set[0] == request['id']:
+                    payload = next_lender_set[1]
+                next_lender_set = next(lender_sets, None)
+
+            request['lenders'] = request_lenders
+            request['lender_set'] = base64.b64encode(bytes(payload)) if payload is not None else None
+            yield json.dumps(request, cls=ArchiveJSONEncoder)
@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
+from collections import defaultdict
 from decimal import Decimal
+
+from django.db import models
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
-from core.utils import memoize
+from core.utils import memoize_method
 
 from mortgage_profiles.models import (
     MortgageProfile, MortgageProfilePurchase, MortgageProfileRefinance,
@@ -59,6 +62,15 @@ class RateQuoteValidator(object):
 ######################
 # lender serializers #
 ######################
+class RateQuoteLenderListSerializer(serializers.ListSerializer):
+    """Compute fees of all lenders in one batch before serializing them one by one."""
+
+    def to_representation(self, data):
+        lenders = list(data.all() if isinstance(data, models.Manager) else data)
+        self.child.prepare_calculations(lenders)
+        return super(RateQuoteLenderListSerializer, self).to_representation(lenders)
+
+
 class RateQuoteLenderSerializer(serializers.ModelSerializer):
     points = serializers.SerializerMethodField('get_custom_full_points')
     apr = serializers.SerializerMethodField('get_custom_apr')
@@ -74,14 +86,39 @@ class RateQuoteLenderSerializer(serializers.ModelSerializer):
             'id', 'lender_name', 'amortization_type', 'term', 'program_type', 'program_name', 'points', 'rate', 'apr',
             'fees', 'total_monthly_payment', 'total_fees', 'monthly_payment', 'rate_percent', 'mismo_amortization_type',
             'mismo_fnm_product_plan_identifier', 'created', 'qualifying_rate', 'is_variable', 'is_fixed')
+        list_serializer_class = RateQuoteLenderListSerializer
+
+    def __init__(self, *args, **kwargs):
+        super(RateQuoteLenderSerializer, self).__init__(*args, **kwargs)
+        self.fee_batches = {}
+
+    def prepare_calculations(self, lenders):
+        '''
+        Compute fees and payments of the saved lenders with one MortechFeesBatch per mortgage profile.
+
+        Called by RateQuoteLenderListSerializer, lenders serialized alone are prepared on first use.
+        '''
+        from mortgage_profiles.mortech.fees import MortechFeesBatch
+        lenders_by_request = defaultdict(list)
+        for lender in lenders:
+            if lender is not None and lender.pk:
+                lenders_by_request[lender.request_id].append(lender)
+
+        for request_id, request_lenders in lenders_by_request.items():
+            batch = MortechFeesBatch(self.get_mortgage_profile(request_id), request_lenders)
+            self.fee_batches.update((lender.pk, batch) for lender in request_lenders)
 
     # pylint: disable=no-self-use
-    @memoize
-    def get_calculations(self, lender, lender_id):
+    @memoize_method
+    def get_mortgage_profile(self, request_id):
+        return MortgageProfile.objects.get_subclass(rate_quote_requests__id=request_id)
+
+    @memoize_method(key=lambda lender: lender.pk)
+    def get_calculations(self, lender):
         ''' Used by methods below to fetch calculations from fees.py. '''
-        # lender_id is here only for hacking memoize decorator
-        from mortgage_profiles.mortech.fees import MortechFees
-        return MortechFees(lender.request.mortgage_profile.subclass, lender)
+        if lender.pk not in self.fee_batches:
+            self.prepare_calculations([lender])
+        return self.fee_batches[lender.pk].get_row(lender)
 
     # pylint: disable=no-self-use
     def get_custom_full_points(self, lender):
@@ -99,16 +136,16 @@ class RateQuoteLenderSerializer(serializers.ModelSerializer):
 
     def get_custom_total_monthly_payment(self, lender):
         if lender.id:
-            return self.get_calculations(lender, lender.id).get_total_monthly_payment()
+            return self.get_calculations(lender)['total_monthly_payment']
 
     def get_custom_fees(self, lender):
         '''TODO: Configure any custom fees.'''
         if lender.id:
-            return self.get_calculations(lender, lender.id).get_non_zero_fees()
+            return self.get_calculations(lender)['fees']
 
     def get_custom_total_fees(self, lender):
         if lender.id:
-            return self.get_calculations(lender, lender.id).get_total_fees()
+            return self.get_calculations(lender)['total_fees']
 
     def get_rate_percent(self, lender):
         '''Convert the rate in basis points to percentage points
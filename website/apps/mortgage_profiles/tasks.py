@@ -1,7 +1,10 @@
 import logging
 
 from celery import task
+from core.utils import SynchronousTask
+from mortgage_profiles.models import MortgageProfile
 from mortgage_profiles.mortech import MortechApi
+from mortgage_profiles.retention import RateQuoteRetention
 
 logger = logging.getLogger('sample.mortgage_profiles.tasks')
 
@@ -10,4 +13,45 @@ logger = logging.getLogger('sample.mortgage_profiles.tasks')
 def refresh_rate_quote(mortgage_profile):
     """Sends new rate quote request for current mortgage profile."""
     api = MortechApi(mortgage_profile)
-    api.get_response()
+    api.get_response(use_cache=False)
+
+
+@task
+def fetch_rate_quote(mortgage_profile_id):
+    """
+    Rate quote job for the asynchronous rate quote API.
+
+    Progress is saved to mortgage_profile.rate_quote_refresh_progress, which is polled by RateQuoteStatusView.
+    """
+    mortgage_profile = MortgageProfile.objects.get_subclass(id=mortgage_profile_id)
+    statuses = mortgage_profile.REFRESH_PROGRESS_CHOICES
+    mortgage_profile.update_refresh_status(statuses.in_progress, save=True)
+    try:
+        MortechApi(mortgage_profile).get_response()
+    except Exception:
+        logger.exception('RATE-QUOTE-JOB-FAILED mortgage_profile %s', mortgage_profile_id)
+        mortgage_profile.update_refresh_status(statuses.failed, save=True)
+        raise
+
+    # get_response sets the status to complete only when lenders are saved
+    if mortgage_profile.rate_quote_refresh_progress != statuses.complete:
+        mortgage_profile.update_refresh_status(statuses.failed)
+    mortgage_profile.save(update_fields=['rate_quote_refresh_progress'])
+    logger.info('RATE-QUOTE-JOB-DONE mortgage_profile %s status %s',
+                mortgage_profile_id, mortgage_profile.rate_quote_refresh_progress)
+
+
+class ArchiveRateQuotes(SynchronousTask):
+    """
+    Archive and delete expired rate quote requests, see mortgage_profiles.retention.
+
+    :param max_batches: bound the run, the next scheduled run continues where it stopped
+    """
+    use_args_in_lock_key = False
+    time_expiration_lock = 60 * 60
+
+    def synchronous_run(self, max_batches=None):
+        return RateQuoteRetention().run(max_batches=max_batches)
+
+
+archive_rate_quotes = ArchiveRateQuotes()
@@ -8,6 +8,9 @@ from django.test import TestCase
 from core.utils import LogMutingTestMixinBase
 from mortgage_profiles.factories import (
     MortgageProfilePurchaseFactory, MortgageProfileRefinanceFactory, RateQuoteLenderFactory, RateQuoteRequestFactory)
+from mortgage_profiles.models import RateQuoteLender, RateQuoteLenderSet, RateQuoteRequest
+from mortgage_profiles.models.scenario_engine import RateQuoteScenarioEngine
+from mortgage_profiles.utils import MortechQuote
 
 logger = logging.getLogger('sample.mortech.test')
 
@@ -118,6 +121,55 @@ class RateQuoteRequestTestCase(MortechMutingMixin, TestCase):
         self.assertTrue(request.has_lender_product(term, amortization))
 
 
+class RateQuoteScenarioEngineTestCase(MortechMutingMixin, TestCase):
+    def setUp(self):
+        self.profile = MortgageProfilePurchaseFactory(ownership_time='medium_term')
+        self.request = RateQuoteRequestFactory(mortgage_profile=self.profile)
+        RateQuoteLenderFactory(request=self.request, rate=275.0, points=1.0)
+        self.lender2 = RateQuoteLenderFactory(request=self.request, rate=262.5, points=0.5)
+        self.lender3 = RateQuoteLenderFactory(request=self.request, rate=262.5, points=-0.50)
+        self.lender4 = RateQuoteLenderFactory(request=self.request, rate=275.0, points=-1.0)
+        self.lender5 = RateQuoteLenderFactory(request=self.request, rate=287.5, points=-1.5)
+        super(RateQuoteScenarioEngineTestCase, self).setUp()
+
+    def test_lookups_single_query(self):
+        """Should load lenders once and answer all lookups in memory."""
+        request = RateQuoteRequest.objects.get(pk=self.request.pk)
+        with self.assertNumQueries(1):
+            engine = request.scenario_engine
+            par_lender = engine.get_par_lender('15 Year', 'Fixed')
+            ladder = engine.get_rate_ladder('15 Year', 'Fixed')
+            best_price = request.get_rate_quote('15 Year', 'Fixed', rate=287.5)
+            par_by_rate = request.get_lender_by_rate(262.5, '15 Year', 'Fixed')
+        self.assertEqual(len(engine), 5)
+        self.assertEqual(par_lender, self.lender3)
+        self.assertEqual(ladder, [self.lender5, self.lender4, self.lender3])
+        self.assertEqual(best_price, self.lender5)
+        self.assertEqual(par_by_rate, self.lender3)
+
+    def test_best_price(self):
+        engine = RateQuoteScenarioEngine.for_request(self.request)
+        self.assertEqual(engine.get_best_price('15 Year', 'Fixed', 262.5), self.lender3)
+        self.assertEqual(engine.get_best_price('15 Year', 'Fixed', Decimal('262.500')), self.lender3)
+        self.assertIsNone(engine.get_best_price('15 Year', 'Fixed', 250.0))
+        self.assertIsNone(engine.get_best_price('30 Year', 'Fixed', 262.5))
+
+    def test_par_lender_adjust(self):
+        """Should fall back to lenders with points only when adjusting."""
+        request = RateQuoteRequestFactory(mortgage_profile=self.profile)
+        lender = RateQuoteLenderFactory(request=request, rate=262.5, points=0.5)
+        engine = RateQuoteScenarioEngine.for_request(request)
+        self.assertIsNone(engine.get_par_lender('15 Year', 'Fixed'))
+        self.assertEqual(engine.get_par_lender('15 Year', 'Fixed', adjust=True), lender)
+        self.assertEqual(engine.get_rate_ladder('15 Year', 'Fixed'), [])
+
+    def test_empty(self):
+        engine = RateQuoteScenarioEngine.for_request(None)
+        self.assertEqual(len(engine), 0)
+        self.assertFalse(engine.has_product('15 Year', 'Fixed'))
+        self.assertIsNone(engine.get_par_lender('15 Year', 'Fixed', adjust=True))
+
+
 class RateQuoteLenderTestCase(MortechMutingMixin, TestCase):
     def setUp(self):
         fees = {
@@ -259,3 +311,64 @@ class MortgageProfileRefinanceTestCase(TestCase):
         self.assertEqual(mp_2.get_loan_profile_purpose_of_refi(), 'cash_out_other')
         self.assertEqual(mp_3.get_loan_profile_purpose_of_refi(), None)
         self.assertEqual(mp_4.get_loan_profile_purpose_of_refi(), 'cash_out_other')
+
+
+class RateQuoteLenderSetTestCase(MortechMutingMixin, TestCase):
+    def setUp(self):
+        self.profile = MortgageProfilePurchaseFactory(ownership_time='medium_term')
+        self.request = RateQuoteRequestFactory(mortgage_profile=self.profile)
+        self.quotes = [self.get_quote(rate, points) for rate, points in (
+            ('275.0', '1.0'), ('262.5', '0.5'), ('262.5', '-0.5'), ('275.0', '-1.0'), ('287.5', '-1.5'))]
+        self.lender_set = RateQuoteLenderSet.create_for_request(self.request, self.quotes)
+        super(RateQuoteLenderSetTestCase, self).setUp()
+
+    @staticmethod
+    def get_quote(rate, points):
+        return MortechQuote(
+            lender_name='Lender', term='15 Year', amortization_type='Fixed', program_category='Conf 15 Yr Fixed',
+            program_name='Conf 15', program_type='Conforming', points=Decimal(points), price=Decimal('99.5'),
+            rate=Decimal(rate), monthly_premium=Decimal('0.00'), piti=Decimal('1200.00'), upfront_fee=Decimal('0'),
+            apr=Decimal('2.9'), fees={'Tax Service Fee': '90.0'})
+
+    def test_round_trip(self):
+        lenders = RateQuoteLenderSet.objects.get(pk=self.lender_set.pk).get_lenders()
+        self.assertEqual(len(lenders), 5)
+        self.assertEqual([lender.quote_index for lender in lenders], range(5))
+        self.assertEqual(lenders[2].rate, Decimal('262.5'))
+        self.assertEqual(lenders[2].points, Decimal('-0.5'))
+        self.assertEqual(lenders[2].fees, {'Tax Service Fee': '90.0'})
+        self.assertTrue(all(lender.pk is None for lender in lenders))
+        self.assertFalse(RateQuoteLender.objects.filter(request=self.request).exists())
+
+    def test_lookups_promote_returned_lenders(self):
+        request = RateQuoteRequest.objects.get(pk=self.request.pk)
+        self.assertTrue(request.has_lenders)
+        self.assertTrue(request.has_lender_product('15 Year', 'Fixed'))
+
+        par_lender = request.get_rate_quote('15 Year', 'Fixed')
+        self.assertIsNotNone(par_lender.pk)
+        self.assertEqual((par_lender.rate, par_lender.points), (Decimal('262.5'), Decimal('-0.5')))
+        self.assertEqual(RateQuoteLender.objects.filter(request=request).count(), 1)
+
+        ladder = request.get_scenarios('15 Year', 'Fixed')
+        self.assertEqual([lender.quote_index for lender in ladder], [4, 3, 2])
+        self.assertTrue(all(lender.pk for lender in ladder))
+        self.assertEqual(RateQuoteLender.objects.filter(request=request).count(), 3)
+
+        # A new engine reuses the promoted rows
+        engine = RateQuoteScenarioEngine.for_request(RateQuoteRequest.objects.get(pk=self.request.pk))
+        self.assertEqual(engine.get_par_lender('15 Year', 'Fixed'), par_lender)
+        self.assertEqual(RateQuoteLender.objects.filter(request=request).count(), 3)
+
+    def test_promote_lenders_partially_promoted(self):
+        """Lenders promoted by a concurrent request are reused, the others are inserted."""
+        concurrent = self.lender_set.get_lenders()
+        self.request.promote_lenders(concurrent[1:3])
+
+        lenders = self.request.promote_lenders(RateQuoteLenderSet.objects.get(pk=self.lender_set.pk).get_lenders())
+
+        self.assertTrue(all(lender.pk for lender in lenders))
+        self.assertEqual([lender.pk for lender in lenders[1:3]], [lender.pk for lender in concurrent[1:3]])
+        self.assertEqual(
+            sorted(RateQuoteLender.objects.filter(request=self.request).values_list('quote_index', flat=True)),
+            range(5))
@@ -3,8 +3,9 @@ from mock import patch
 from httmock import with_httmock
 from requests.exceptions import ConnectionError, HTTPError, Timeout
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
+from core.tests import LOCMEM_CACHES
 from core.utils import LogMutingTestMixinBase
 from mortgage_profiles.utils import MortechResponse
 from mortgage_profiles.factories import (
@@ -14,6 +15,7 @@ from mortgage_profiles.factories import (
 )
 from mortgage_profiles.models import MortgageProfilePurchase
 from mortgage_profiles import mortech
+from mortgage_profiles.mortech.cache import MortechResponseCache
 from mortgage_profiles.mocks import (
     mortech_response_success,
     mortech_response_status_code_408,
@@ -167,6 +169,123 @@ class RateQuoteApiPurchaseTestCase(MortechMutingMixin, TestCase):
         self.assertEqual(mortech_response_no_results.call, {'count': 3, 'called': True})
 
 
+@patch.object(mortech.MortechApi, 'CONCURRENT_FILTERS', True)
+class RateQuoteApiConcurrentTestCase(MortechMutingMixin, TestCase):
+    """Tests for mortech requests sent for all filter ids at once"""
+    def setUp(self):
+        self.mortgage_profile = MortgageProfilePurchaseFactory(
+            property_occupation='my_current_residence')
+        self.api = mortech.MortechApi(mortgage_profile=self.mortgage_profile)
+        super(RateQuoteApiConcurrentTestCase, self).setUp()
+
+    @with_httmock(mortech_response_success)
+    @patch('mortgage_profiles.mortech.MortechApi.save_lenders')
+    def test_get_response_success(self, mock_save_lenders):
+        """Should stop on the first filter with results."""
+        with patch.object(self.api, 'parse_filter_response', wraps=self.api.parse_filter_response) as mock_parse:
+            result = self.api.get_response()
+        self.assertTrue(isinstance(result, MortechResponse))
+        self.assertTrue(result.is_valid())
+        mock_save_lenders.assert_called_once()
+        mock_parse.assert_called_once()
+        self.assertEqual(mock_parse.call_args[0][0], '999999')
+
+    @with_httmock(mortech_response_no_results)
+    def test_get_response_no_results(self):
+        """Should request every filter id and return the last response."""
+        response = {'error_num': '0', 'error_desc': 'Success'}
+        results = self.api.get_response()
+        self.assertEqual(results.get_errors(), response)
+        self.assertEqual(mortech_response_no_results.call, {'count': 3, 'called': True})
+
+    @with_httmock(mortech_response_status_code_503)
+    def test_get_response_status_code_503(self):
+        with self.assertRaises(HTTPError):
+            self.api.get_response()
+
+    @with_httmock(mortech_response_timeout)
+    def test_get_response_timeout_exception(self):
+        with self.assertRaises(Timeout):
+            self.api.get_response()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MortechResponseCacheTestCase(MortechMutingMixin, TestCase):
+    """Tests for caching parsed Mortech responses"""
+    def setUp(self):
+        self.mortgage_profile = MortgageProfilePurchaseFactory(
+            property_occupation='my_current_residence')
+        self.response_cache = MortechResponseCache(cache_name='default', timeout=60)
+        super(MortechResponseCacheTestCase, self).setUp()
+
+    def test_normalize_ignores_credentials_and_order(self):
+        data = {'fico': 740, 'propertyState': 'CA', 'licenseKey': 'secret', 'loan_amount': None}
+        other = {'propertyState': 'CA', 'fico': '740', 'licenseKey': 'other', 'request_id': 2}
+        self.assertEqual(self.response_cache.normalize(data), self.response_cache.normalize(other))
+        self.assertEqual(self.response_cache.get_key(data), self.response_cache.get_key(other))
+
+    def test_key_includes_filter_ids(self):
+        data = {'fico': 740, 'propertyState': 'CA'}
+        self.assertEqual(self.response_cache.get_key(data, ['', '888888']),
+                         self.response_cache.get_key(data, ['888888', '']))
+        self.assertNotEqual(self.response_cache.get_key(data, ['', '888888']),
+                            self.response_cache.get_key(data, ['999999', '', '888888']))
+
+        response = MortechResponse({'header': {}, 'results': [{}]}, quotes=['quote'], result_count=1)
+        self.response_cache.set(data, response, ['', '888888'])
+        self.assertIsNone(self.response_cache.get(data, ['999999', '', '888888']))
+        self.assertEqual(self.response_cache.get(data, ['', '888888']).quotes, ['quote'])
+
+    def test_get_set_purge(self):
+        data = {'fico': 740, 'propertyState': 'CA'}
+        self.assertIsNone(self.response_cache.get(data))
+        response = MortechResponse({'header': {}, 'results': [{}]}, quotes=['quote'], result_count=1)
+        self.response_cache.set(data, response)
+        cached = self.response_cache.get(data)
+        self.assertEqual(cached.quotes, ['quote'])
+        self.assertTrue(cached.has_results)
+        self.response_cache.purge()
+        self.assertIsNone(self.response_cache.get(data))
+        stats = self.response_cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+    def test_no_results_not_cached(self):
+        data = {'fico': 740, 'propertyState': 'CA'}
+        self.response_cache.set(data, MortechResponse({'header': {}}))
+        self.assertIsNone(self.response_cache.get(data))
+
+    def test_disabled(self):
+        response_cache = MortechResponseCache(cache_name='default', timeout=0)
+        data = {'fico': 740, 'propertyState': 'CA'}
+        response_cache.set(data, MortechResponse({'header': {}, 'results': [{}]}, quotes=['quote'], result_count=1))
+        self.assertIsNone(response_cache.get(data))
+
+    @with_httmock(mortech_response_success)
+    def test_get_response_cached(self):
+        """Should skip Mortech on a cache hit and still save lenders."""
+        with patch.object(mortech.MortechApi, 'response_cache', self.response_cache):
+            mortech.MortechApi(mortgage_profile=self.mortgage_profile).get_response()
+            response = mortech.MortechApi(mortgage_profile=self.mortgage_profile).get_response()
+        self.assertTrue(response.is_valid())
+        self.assertEqual(mortech_response_success.call, {'count': 1, 'called': True})
+        self.assertEqual(self.mortgage_profile.rate_quote_requests.count(), 2)
+        for rate_quote_request in self.mortgage_profile.rate_quote_requests.all():
+            self.assertTrue(rate_quote_request.has_lenders)
+
+    @with_httmock(mortech_response_success)
+    def test_get_response_not_cached_across_veteran_status(self):
+        """A veteran gets VA products too, the response cached for a non veteran must not be used."""
+        self.mortgage_profile.is_veteran = False
+        self.mortgage_profile.save()
+        with patch.object(mortech.MortechApi, 'response_cache', self.response_cache):
+            mortech.MortechApi(mortgage_profile=self.mortgage_profile).get_response()
+            self.mortgage_profile.is_veteran = True
+            self.mortgage_profile.save()
+            mortech.MortechApi(mortgage_profile=self.mortgage_profile).get_response()
+        stats = self.response_cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (0, 2))
+
+
 class MortechCalculationTestCase(MortechMutingMixin, TestCase):
     """Tests for request Mortech data made from mortgage profile"""
 
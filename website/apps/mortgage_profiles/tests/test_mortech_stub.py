@@ -0,0 +1,27 @@
+import os
+
+from django.test import TestCase
+
+from support.mortech_test import configuration
+
+
+class MortechStubConfigTestCase(TestCase):
+    """Tests for the configuration of the local Mortech stub"""
+
+    def test_example_config(self):
+        config = configuration.load_config(
+            os.path.join(os.path.dirname(configuration.__file__), 'example_config.json'))
+
+        self.assertEqual(configuration.get_filter_config(config, ''), {
+            'quotes': 1000, 'empty': False, 'latency': 0.5, 'error_rate': 0, 'error_status': 500})
+        self.assertEqual(configuration.get_filter_config(config, '999999'), {
+            'quotes': 1000, 'empty': True, 'latency': 0.5, 'error_rate': 0, 'error_status': 500})
+        self.assertEqual(configuration.get_filter_config(config, 888888), {
+            'quotes': 250, 'empty': False, 'latency': 2, 'error_rate': 0.1, 'error_status': 503})
+
+    def test_partial_default_entry(self):
+        config = configuration.merge_config({'default': {'latency': 1}})
+
+        self.assertEqual(config['default']['latency'], 1)
+        self.assertEqual(config['default']['error_rate'], 0)
+        self.assertEqual(configuration.get_filter_config(config, 'unknown')['error_status'], 500)
@@ -0,0 +1,78 @@
+import gzip
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.core.files.storage import FileSystemStorage
+from django.test import TestCase
+from django.utils import timezone
+
+from core.utils import LogMutingTestMixinBase
+from mortgage_profiles.factories import (
+    MortgageProfilePurchaseFactory, RateQuoteLenderFactory, RateQuoteRequestFactory)
+from mortgage_profiles.models import RateQuoteArchive, RateQuoteLender, RateQuoteRequest
+from mortgage_profiles.retention import RateQuoteRetention
+
+
+class RateQuoteRetentionTestCase(LogMutingTestMixinBase, TestCase):
+    log_names = ['sample.mortgage_profiles.retention']
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.retention = RateQuoteRetention(retention_days=30, batch_size=2,
+                                            storage=FileSystemStorage(location=self.location))
+        self.profile = MortgageProfilePurchaseFactory()
+        old = timezone.now() - timedelta(days=31)
+
+        self.expired = []
+        for _ in range(3):
+            request = RateQuoteRequestFactory(mortgage_profile=self.profile)
+            RateQuoteLenderFactory.create_batch(2, request=request)
+            self.expired.append(request)
+
+        self.selected_request = RateQuoteRequestFactory(mortgage_profile=self.profile)
+        self.profile.selected_rate_quote_lender = RateQuoteLenderFactory(request=self.selected_request)
+        self.profile.save()
+
+        RateQuoteRequest.objects.update(created=old)
+        self.recent = RateQuoteRequestFactory(mortgage_profile=self.profile)
+        super(RateQuoteRetentionTestCase, self).setUp()
+
+    def tearDown(self):
+        shutil.rmtree(self.location)
+        super(RateQuoteRetentionTestCase, self).tearDown()
+
+    def test_run_archives_and_deletes_expired(self):
+        stats = self.retention.run()
+
+        self.assertEqual(stats['archives'], 2)
+        self.assertEqual(stats['requests'], 3)
+        self.assertEqual(stats['lenders'], 6)
+        self.assertEqual(set(RateQuoteRequest.objects.values_list('id', flat=True)),
+                         {self.selected_request.id, self.recent.id})
+        self.assertEqual(RateQuoteLender.objects.count(), 1)
+
+        archive = RateQuoteArchive.objects.order_by('first_request_id').first()
+        self.assertEqual((archive.requests, archive.lenders), (2, 4))
+        with gzip.GzipFile(fileobj=self.retention.storage.open(archive.name)) as archive_file:
+            lines = [json.loads(line) for line in archive_file]
+        self.assertEqual([line['id'] for line in lines], [request.id for request in self.expired[:2]])
+        self.assertEqual(len(lines[0]['lenders']), 2)
+
+    def test_run_max_batches(self):
+        stats = self.retention.run(max_batches=1)
+        self.assertEqual(stats['requests'], 2)
+        self.assertTrue(RateQuoteRequest.objects.filter(id=self.expired[2].id).exists())
+
+    def test_serialize_requests_matches_lenders(self):
+        self.expired[1].rate_quote_lenders.all().delete()
+        ids = [request.id for request in self.expired]
+
+        lines = [json.loads(line) for line in self.retention.serialize_requests(ids)]
+
+        self.assertEqual([line['id'] for line in lines], ids)
+        self.assertEqual([len(line['lenders']) for line in lines], [2, 0, 2])
+        for line in lines:
+            self.assertEqual({lender['request_id'] for lender in line['lenders']} - {line['id']}, set())
+            self.assertIsNone(line['lender_set'])
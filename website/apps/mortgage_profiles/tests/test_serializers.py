@@ -1,10 +1,15 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework.exceptions import ValidationError
 
-from mortgage_profiles.models import MortgageProfile
-from mortgage_profiles.factories import MortgageProfilePurchaseFactory, MortgageProfileRefinanceFactory
-from mortgage_profiles.serializers import MortgageProfileSerializer, MortgageProfilePurchaseSerializer
+from mortgage_profiles.models import MortgageProfile, RateQuoteLender
+from mortgage_profiles.factories import (
+    MortgageProfilePurchaseFactory, MortgageProfileRefinanceFactory, RateQuoteRequestFactory, RateQuoteLenderFactory)
+from mortgage_profiles.mortech import MortechFees
+from mortgage_profiles.serializers import (
+    MortgageProfileSerializer, MortgageProfilePurchaseSerializer, RateQuoteLenderSerializer)
 
 
 class TestMortgageProfilePurchaseSerializer(TestCase):
@@ -37,3 +42,34 @@ class TestMortgageProfileSerializer(TestCase):
         with self.assertRaises(ValidationError):
             # pylint: disable=pointless-statement
             serializer.data
+
+
+class TestRateQuoteLenderSerializer(TestCase):
+    def setUp(self):
+        self.profile = MortgageProfilePurchaseFactory(target_value=500000, purchase_down_payment=100000)
+        self.request = RateQuoteRequestFactory(mortgage_profile=self.profile)
+        for points, rate in ((-1.0, 375.0), (0.0, 362.5), (1.25, 350.0)):
+            RateQuoteLenderFactory(request=self.request, points=points, rate=rate, term='30 Year')
+        RateQuoteLenderFactory(request=self.request, points=0.5, monthly_premium=None)
+
+    def get_lenders(self):
+        return list(RateQuoteLender.objects.filter(request=self.request).order_by('id'))
+
+    def test_batch_matches_single_lender_fees(self):
+        lenders = self.get_lenders()
+        data = RateQuoteLenderSerializer(lenders, many=True).data
+
+        for lender, item in zip(lenders, data):
+            fees = MortechFees(self.profile, lender)
+            self.assertEqual(item['total_fees'], fees.get_total_fees())
+            self.assertEqual(item['total_monthly_payment'], fees.get_total_monthly_payment())
+            self.assertEqual(item['fees'], fees.get_non_zero_fees())
+            self.assertEqual(RateQuoteLenderSerializer(lender).data, item)
+
+    def test_many_queries_do_not_grow_with_lenders(self):
+        # pylint: disable=expression-not-assigned
+        with CaptureQueriesContext(connection) as single:
+            RateQuoteLenderSerializer(self.get_lenders()[:1], many=True).data
+        with CaptureQueriesContext(connection) as many:
+            RateQuoteLenderSerializer(self.get_lenders(), many=True).data
+        self.assertEqual(len(single), len(many))
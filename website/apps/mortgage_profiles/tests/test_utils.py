@@ -1,4 +1,5 @@
 import logging
+from decimal import Decimal
 
 from django.test import TestCase
 
@@ -6,6 +7,7 @@ from core.utils import LogMutingTestMixinBase
 from mortgage_profiles import mortech
 from mortgage_profiles.factories import MortgageProfilePurchaseFactory
 from mortgage_profiles.utils import MortechXMLParser, get_program_type
+from support.mortech_test.responses import build_response
 
 
 logger = logging.getLogger('sample.mortech.test')
@@ -61,6 +63,42 @@ class MortechResponseTestCase(MortechMutingMixin, TestCase):
             self.assertFalse(response.is_valid())
             self.assertEqual(response.get_errors(), error)
 
+    def test_response_quotes(self):
+        """Should return typed quotes and the result count from a single parse."""
+        with open(self.SINGLE_RESPONSE) as xml:
+            parser = MortechXMLParser()
+            response = parser.parse(xml.read())
+        self.assertEqual(response.result_count, 219)
+        self.assertEqual(len(response.quotes), 2)
+        quote = response.quotes[1]
+        self.assertEqual(quote.lender_name, 'Stonegate Wholesale(3174)')
+        self.assertEqual(quote.term, '30 Year')
+        self.assertEqual(quote.amortization_type, 'Fixed')
+        self.assertEqual(quote.program_category, 'Conf 30 Yr  Fixed ')
+        self.assertEqual(quote.program_type, 'Conforming')
+        self.assertEqual(quote.rate, Decimal('287.5'))
+        self.assertEqual(quote.points, Decimal('2.349'))
+        self.assertEqual(quote.price, Decimal('98.811'))
+        self.assertEqual(quote.apr, Decimal('3.092'))
+        self.assertEqual(quote.piti, Decimal('1681.56'))
+        self.assertEqual(quote.fees['Tax Service Fee'], '77.0')
+        self.assertEqual(len(quote.fees), 5)
+
+    def test_response_no_quotes(self):
+        """Should return no quotes and zero result count for an error response."""
+        with open(self.ERROR_RESPONSE) as xml:
+            parser = MortechXMLParser()
+            response = parser.parse(xml)
+        self.assertEqual(response.result_count, 0)
+        self.assertEqual(response.quotes, [])
+
+    def test_stub_response_sizes(self):
+        """Mortech stub responses should parse to the requested number of quotes."""
+        parser = MortechXMLParser()
+        self.assertEqual(len(parser.parse(build_response(quotes=1500)).quotes), 1500)
+        self.assertEqual(len(parser.parse(build_response(quotes=10)).quotes), 10)
+        self.assertFalse(parser.parse(build_response(empty=True)).has_results)
+
 
 class TestMortgageProfileUtils(MortechMutingMixin, TestCase):
     """Tests functions in utils.py file"""
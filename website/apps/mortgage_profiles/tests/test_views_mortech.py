@@ -227,3 +227,80 @@ class RateQuoteViewTests(MortechMutingMixin, APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
         self.assertEqual(mortech_response_success.call, {'count': 1, 'called': True})
+
+
+class RateQuoteAsyncViewsTestCase(MortechMutingMixin, APITestCase):
+    """Asynchronous rate quote requests and job status."""
+
+    @patch('mortgage_profiles.views.transaction.on_commit')
+    @patch('mortgage_profiles.views.fetch_rate_quote.delay')
+    def test_rate_quote_request_async_queues_job(self, mocked_delay, mocked_on_commit):
+        url = reverse('mortgage_profiles:rate_quote_request')
+        response = self.client.post('{}?async=true'.format(url),
+                                    data=PURCHASE_REQUEST,
+                                    content_type='application/x-www-form-urlencoded')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], MortgageProfile.REFRESH_PROGRESS_CHOICES.queued)
+        mortgage_profile = MortgageProfile.objects.get(uuid=response.data['id'])
+        self.assertEqual(mortgage_profile.rate_quote_refresh_progress, MortgageProfile.REFRESH_PROGRESS_CHOICES.queued)
+        self.assertEqual(response.data['status_url'],
+                         reverse('mortgage_profiles:rate_quote_status', args=[mortgage_profile.uuid]))
+        # queued only once the request transaction commits
+        self.assertFalse(mocked_delay.called)
+        mocked_on_commit.call_args[0][0]()
+        mocked_delay.assert_called_once_with(mortgage_profile.id)
+
+    @patch('mortgage_profiles.views.fetch_rate_quote.delay')
+    def test_rate_quote_request_async_invalid_data(self, mocked_delay):
+        url = reverse('mortgage_profiles:rate_quote_request')
+        response = self.client.post('{}?async=true'.format(url),
+                                    data='kind=purchase&propertyState=California',
+                                    content_type='application/x-www-form-urlencoded')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(mocked_delay.called)
+
+    def test_rate_quote_status_pending(self):
+        profile = MortgageProfilePurchaseFactory(
+            rate_quote_refresh_progress=MortgageProfile.REFRESH_PROGRESS_CHOICES.in_progress)
+        url = reverse('mortgage_profiles:rate_quote_status', args=[profile.uuid])
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'id': profile.uuid, 'status': 'in_progress'})
+
+    @patch('mortgage_profiles.views.time.sleep')
+    def test_rate_quote_status_long_poll(self, mocked_sleep):
+        profile = MortgageProfilePurchaseFactory(
+            rate_quote_refresh_progress=MortgageProfile.REFRESH_PROGRESS_CHOICES.queued)
+
+        def finish_job(seconds):
+            profile.update_refresh_status(MortgageProfile.REFRESH_PROGRESS_CHOICES.failed, save=True)
+        mocked_sleep.side_effect = finish_job
+
+        url = reverse('mortgage_profiles:rate_quote_status', args=[profile.uuid])
+        response = self.client.get(url, data={'wait': 5})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'failed')
+        self.assertEqual(mocked_sleep.call_count, 1)
+
+    def test_rate_quote_status_complete(self):
+        profile = MortgageProfilePurchaseFactory(
+            rate_quote_refresh_progress=MortgageProfile.REFRESH_PROGRESS_CHOICES.complete)
+        request = RateQuoteRequestFactory(mortgage_profile=profile)
+        RateQuoteLenderFactory(request=request, term='30 Year', amortization_type='Fixed')
+
+        url = reverse('mortgage_profiles:rate_quote_status', args=[profile.uuid])
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'complete')
+        self.assertEqual(response.data['request_uuid'], request.uuid)
+        self.assertEqual(len(response.data['results']), 4)
+
+    def test_rate_quote_status_not_found(self):
+        url = reverse('mortgage_profiles:rate_quote_status', args=['MrZV8ChTc4L5tv66o7B65x'])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
@@ -1,14 +1,17 @@
 import logging
+from collections import namedtuple
+from decimal import Decimal
+from io import BytesIO
 
 from django.utils.xmlutils import SimplerXMLGenerator
 from six import StringIO
 
-import xmltodict
+from lxml import etree
 from rest_framework.parsers import BaseParser
 from rest_framework_xml.renderers import XMLRenderer
 
-from core.parsers import underscoreize
-from core.utils import memoize
+from core.parsers import camel_to_underscore
+from core.utils import memoize_method
 
 
 logger = logging.getLogger("sample.mortgage_profiles.utils")
@@ -55,25 +58,75 @@ class MortechRenderer(XMLRenderer):
         return stream.getvalue()
 
 
+MortechQuote = namedtuple('MortechQuote', (
+    'lender_name', 'term', 'amortization_type', 'program_category', 'program_name', 'program_type',
+    'points', 'price', 'rate', 'monthly_premium', 'piti', 'upfront_fee', 'apr', 'fees'))
+
+
 class MortechXMLParser(BaseParser):
-    '''Convert camelcase XML to underscore dict'''
+    '''
+    Convert Mortech XML to a MortechResponse in a single streaming pass.
+
+    Each quote becomes a typed MortechQuote record as soon as its element is complete and the
+    element is cleared right after, so the whole document is never held in memory.
+    '''
     def parse(self, stream, media_type=None, parser_context=None):
+        if isinstance(stream, basestring):
+            stream = BytesIO(stream)
         try:
-            data = underscoreize(xmltodict.parse(stream, force_list=('quote', 'fee',)))
+            response = self.iterparse(stream)
         except Exception as exc: #pylint: disable=broad-except
             logger.warning(u'MORTECH-XML-PARSE-ERROR %s data %s', exc, stream)
         else:
-            logger.debug(u'MORTECH-XML-PARSE-SUCCESS %s', data['mortech']['header'])
-            return MortechResponse(data['mortech'])
+            logger.debug(u'MORTECH-XML-PARSE-SUCCESS %s', response.response['header'])
+            return response
+
+    @staticmethod
+    def iterparse(stream):
+        '''Return MortechResponse with header, products, quotes and result count.'''
+        header = {}
+        products = []
+        quotes = []
+        product = None
+        depth = 0
+        for event, elem in etree.iterparse(stream, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if elem.tag == 'results':
+                    product = {camel_to_underscore(key): value for key, value in elem.attrib.items()}
+                    products.append(product)
+                continue
+
+            depth -= 1
+            if elem.tag == 'quote' and product is not None:
+                quotes.append(get_quote(elem, product))
+            elif elem.tag == 'header':
+                header = {camel_to_underscore(child.tag): child.text and child.text.strip() for child in elem}
+            elif elem.tag == 'results':
+                product = None
+
+            # Free elements of the document root and of results which are done with.
+            if depth == 1 or (depth == 2 and product is not None):
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+
+        result_count = sum(int(item.get('size', 0)) for item in products)
+        response = {'header': header}
+        if products:
+            response['results'] = products
+        return MortechResponse(response, quotes=quotes, result_count=result_count)
 
 
 class MortechResponse(object):
     '''Store and manipulate response from Mortech API'''
-    def __init__(self, response):
+    def __init__(self, response, quotes=(), result_count=0):
         self.response = response
+        self.quotes = quotes
+        self.result_count = result_count
         self.has_results = 'results' in self.response
 
-    @memoize
+    @memoize_method
     def is_valid(self):
         '''Determine whether response is valid.'''
         status = self.response['header'].get('error_desc')
@@ -87,8 +140,8 @@ class MortechResponse(object):
         return self.response['header']
 
     def get_data(self):
-        '''Return response results.'''
-        return self.response['mortech']['results'] if self.response['results'] else []
+        '''Return response quotes.'''
+        return self.quotes
 
 
 def mortech_error_response_factory(error):
@@ -96,15 +149,30 @@ def mortech_error_response_factory(error):
     return MortechResponse({'header': {'error_desc': error}})
 
 
-def get_lender_fees(fee_list):
-    '''Retrieve fees from Mortech response object.'''
-    fees = {}
-    if not isinstance(fee_list, (list, tuple)):
-        fee_list = [fee_list]
-    for fee in fee_list:
-        fees[fee['@description']] = fee['@feeamount']
+def get_quote(quote, product):
+    '''Build MortechQuote from a quote element and attributes of its results element.'''
+    detail = quote.find('quote_detail')
+    program_name = quote.get('vendor_product_name')
+    return MortechQuote(
+        lender_name=quote.get('vendor_name'),
+        term=get_term(quote.get('initialArmTerm', ''), quote.get('productTerm')),
+        amortization_type=product['term_type'],
+        program_category=product['product_name'],
+        program_name=program_name,
+        program_type=get_program_type(program_name, product['product_name']),
+        points=Decimal(detail.get('price')),
+        price=Decimal(detail.findtext('ratesheet_price')),
+        rate=Decimal(detail.get('rate')) * Decimal(100.0),
+        monthly_premium=Decimal(detail.get('monthlyPremium')),
+        piti=Decimal(detail.get('piti')),
+        upfront_fee=Decimal(detail.get('upfrontFee')),
+        apr=Decimal(detail.get('apr')),
+        fees=get_lender_fees(detail.iterfind('fees/fee_list/fee')))
 
-    return fees
+
+def get_lender_fees(fee_list):
+    '''Retrieve fees from Mortech fee elements.'''
+    return {fee.get('description'): fee.get('feeamount') for fee in fee_list}
 
 
 def get_program_type(program_type, product_name):
@@ -135,7 +203,7 @@ def get_program_type(program_type, product_name):
     return program_type if program_type else "unknown"
 
 
-def get_term(product):
+def get_term(initial_arm_term, product_term):
     term_types = {
         '36': '3 Year',
         '60': '5 Year',
@@ -143,14 +211,7 @@ def get_term(product):
         '120': '10 Year'
     }
     for k, v in term_types.iteritems():
-        if k in product['@initial_arm_term']:
+        if k in initial_arm_term:
             return v
     # No white space is needed in this return statement.
-    return '{0}Year'.format(product['@product_term'])
-
-
-def get_quotes(obj):
-    quotes = obj.get('quote', ())
-    if not isinstance('quotes', (list, tuple)):
-        quotes = [quotes]
-    return quotes
+    return '{0}Year'.format(product_term)
@@ -1,6 +1,10 @@
 import logging
+import time
 from datetime import datetime
 
+from django.conf import settings
+from django.core.urlresolvers import reverse
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django.http import Http404
 
@@ -22,6 +26,7 @@ from mortgage_profiles.serializers import (
 )
 from mortgage_profiles.permissions import IsMortgageProfileOwner, HasNoLoanProfile
 from mortgage_profiles.mortech import MortechApi, MortechDirector, MortechScenario
+from mortgage_profiles.tasks import fetch_rate_quote
 from pages.models.licenses import StateLicense
 from pages.serializers import StateLicenseSerializer
 
@@ -298,6 +303,9 @@ class RateQuoteRequestView(RateQuoteServiceMixin, RateQuoteMixin, generics.ListC
             * Refi: kind, property_state, property_value, property_occupation,
               credit_score, purpose, mortgage_owe
 
+        In async mode (``async=true`` or ``RATE_QUOTE_ASYNC``) the rate quote job is queued and
+        HTTP 202 is returned at once with the job id and the status url, see `RateQuoteStatusView`.
+
         :param request: HTTP request containing `MortgageProfile` attributes
         :param args: additional arguments
         :param kwargs: additional keyword arguments
@@ -309,6 +317,8 @@ class RateQuoteRequestView(RateQuoteServiceMixin, RateQuoteMixin, generics.ListC
         serializer = self.get_serializer_class(request.data)
         if serializer.is_valid():
             mp = serializer.save()
+            if self.is_async():
+                return self.queue_rate_quote(mp)
             # TODO: Part of refactor 281956101674944
             res = self.get_rate_quote_results(mp)
             if res.status_code == 400:
@@ -319,6 +329,34 @@ class RateQuoteRequestView(RateQuoteServiceMixin, RateQuoteMixin, generics.ListC
         else:
             return response.Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def is_async(self):
+        value = self.request.query_params.get('async', self.request.data.get('async'))
+        if value is None:
+            return settings.RATE_QUOTE_ASYNC
+        return value.lower() in ('1', 'true', 'yes')
+
+    @staticmethod
+    def queue_rate_quote(mortgage_profile):
+        """
+        Queue the rate quote job for the mortgage profile.
+
+        :return: job id (mortgage profile uuid), status and status url
+        :rtype: DRF Response, HTTP 202
+        """
+        rate_quote_api = MortechApi(mortgage_profile=mortgage_profile)
+        if not rate_quote_api.is_valid():
+            return response.Response(rate_quote_api.get_errors(), status=status.HTTP_400_BAD_REQUEST)
+
+        mortgage_profile.update_refresh_status(MortgageProfile.REFRESH_PROGRESS_CHOICES.queued, save=True)
+        # the worker must find the mortgage profile: queue the job once the request transaction commits
+        transaction.on_commit(lambda: fetch_rate_quote.delay(mortgage_profile.id))
+        logger.info('RATE-QUOTE-JOB-QUEUED mortgage_profile %s', mortgage_profile.id)
+        return response.Response({
+            'id': mortgage_profile.uuid,
+            'status': mortgage_profile.rate_quote_refresh_progress,
+            'status_url': reverse('mortgage_profiles:rate_quote_status', args=[mortgage_profile.uuid]),
+        }, status=status.HTTP_202_ACCEPTED)
+
     def get_serializer_class(self, request_data):
         """
         Returns proper serializer.
@@ -365,3 +403,61 @@ class RateQuoteResultsView(RateQuoteMixin, generics.ListAPIView):
         term, amortization = request.GET.get('term'), request.GET.get('amortizationType')
 
         return self.get_results(term, amortization)
+
+
+class RateQuoteStatusView(RateQuoteMixin, views.APIView):
+    """
+    Status of an asynchronous rate quote job, see `RateQuoteRequestView`.
+
+    Returns unique rate quote results once the job is complete.
+    """
+
+    permission_classes = (permissions.AllowAny,)
+    serializer = RateQuoteLenderSerializer
+    FINAL_STATUSES = (
+        MortgageProfile.REFRESH_PROGRESS_CHOICES.complete,
+        MortgageProfile.REFRESH_PROGRESS_CHOICES.failed,
+    )
+    POLL_INTERVAL = 0.5
+
+    def get(self, request, *args, **kwargs):
+        """
+        Returns rate quote job status by the mortgage profile UUID.
+
+        :param request: `dict`, optional ``wait`` seconds to wait for the job to finish,
+                        capped by RATE_QUOTE_STATUS_MAX_WAIT
+        :param kwargs: `dict`, mortgage profile uuid
+        :return: `dict`, job status, with rate quotes when complete
+        :rtype: DRF Response object
+        """
+        mortgage_profile = get_object_or_404(MortgageProfile, uuid=self.kwargs['uuid'])
+        progress = self.wait_for_job(mortgage_profile, self.get_wait())
+
+        if progress == MortgageProfile.REFRESH_PROGRESS_CHOICES.complete:
+            self.rate_quote_request = mortgage_profile.current_rate_quote_request()
+            if self.rate_quote_request is not None:
+                res = self.get_unique_results()
+                res.data['status'] = progress
+                return res
+
+        return response.Response({
+            'id': mortgage_profile.uuid,
+            'status': progress,
+        }, status=status.HTTP_200_OK)
+
+    def get_wait(self):
+        try:
+            wait = float(self.request.query_params.get('wait', 0))
+        except ValueError:
+            raise ValidationError(detail="'wait' must be a number of seconds.")
+        return min(max(wait, 0), settings.RATE_QUOTE_STATUS_MAX_WAIT)
+
+    def wait_for_job(self, mortgage_profile, wait):
+        """Poll the job status until it is final or the wait is over, return the last status."""
+        deadline = time.time() + wait
+        progress = mortgage_profile.rate_quote_refresh_progress
+        while progress not in self.FINAL_STATUSES and time.time() < deadline:
+            time.sleep(self.POLL_INTERVAL)
+            progress = MortgageProfile.objects.filter(id=mortgage_profile.id).values_list(
+                'rate_quote_refresh_progress', flat=True).first()
+        return progress
@@ -1,12 +1,12 @@
 from django.db import models
 
-from solo.models import SingletonModel
+from core.models import ConfigSingletonModel
 
 
 # The below two singletons are editable via the admin interface
 
 
-class SalesforceRateQuoteInfo(SingletonModel):
+class SalesforceRateQuoteInfo(ConfigSingletonModel):
     """
     A singleton for configuring the default values to be sent to Salesforce for a
     RateQuote Lead (ie a user has recieved rates from the RateQuote and wants to speak
@@ -25,7 +25,7 @@ class SalesforceRateQuoteInfo(SingletonModel):
     Pardot_Created = models.CharField(max_length=100, default='True')
 
 
-class SalesforcesampleOneRegInfo(SingletonModel):
+class SalesforcesampleOneRegInfo(ConfigSingletonModel):
     """
     A singleton for configuring the default values to be sent to Salesforce for a
     sampleOne Registration Lead (ie a user completed the RateQuote and registered)
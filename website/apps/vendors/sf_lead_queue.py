@@ -0,0 +1,60 @@
+'''
+Buffer of contact requests waiting to be pushed to Salesforce as leads.
+
+push_lead_to_salesforce adds the contact request to the buffer instead of pushing it. The buffer is flushed by
+flush_leads_to_salesforce SALESFORCE_LEAD_BATCH_WINDOW seconds after its first contact request was added, or as soon
+as it holds SALESFORCE_LEAD_BATCH_SIZE contact requests. Every flush pushes the buffered leads in bulk, see
+vendors.sf_push.SalesforceLeadBatchPush.
+
+Contact requests stay in the buffer until a flush pushed them: the leads of a flush which crashes or can not reach
+Salesforce are pushed by the next flush. A beat scheduled flush picks up leads whose scheduled flush was lost.
+
+The buffer is a list kept in the cache, changed under a lock kept in the cache too.
+'''
+
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core.utils import cache_lock
+
+logger = logging.getLogger('sample.vendors.sf_lead_queue')
+
+BUFFER_KEY = 'vendors.salesforce.leads'
+LOCK_KEY = 'vendors.salesforce.leads.lock'
+LOCK_TIMEOUT = 5
+
+
+def get_cache():
+    return caches['default']
+
+
+def add(contact_request_id):
+    '''Buffer the contact request, return the number of buffered contact requests.'''
+    with cache_lock(LOCK_KEY, LOCK_TIMEOUT):
+        contact_request_ids = get_cache().get(BUFFER_KEY) or []
+        if contact_request_id not in contact_request_ids:
+            contact_request_ids.append(contact_request_id)
+            get_cache().set(BUFFER_KEY, contact_request_ids, None)
+    logger.debug('SF-LEAD-BUFFERED contact request %s buffered %s', contact_request_id, len(contact_request_ids))
+    return len(contact_request_ids)
+
+
+def peek(count):
+    '''Return the ids of up to `count` contact requests at the front of the buffer, oldest first.'''
+    return (get_cache().get(BUFFER_KEY) or [])[:count]
+
+
+def remove(contact_request_ids):
+    '''Remove pushed contact requests from the buffer, return the number of buffered contact requests.'''
+    removed_ids = set(contact_request_ids)
+    with cache_lock(LOCK_KEY, LOCK_TIMEOUT):
+        buffered_ids = [contact_request_id for contact_request_id in get_cache().get(BUFFER_KEY) or []
+                        if contact_request_id not in removed_ids]
+        get_cache().set(BUFFER_KEY, buffered_ids, None)
+    return len(buffered_ids)
+
+
+def size():
+    return len(get_cache().get(BUFFER_KEY) or [])
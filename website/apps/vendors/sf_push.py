@@ -1,21 +1,41 @@
-import copy
 from datetime import datetime
 import logging
 
 from dateutil.tz import tzutc
 
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Case, CharField, Value, When
+from django.utils import timezone
 
 from contacts.models import ContactRequest
 from loans.models import LoanProfileV1
 from vendors.serializers import sampleContactRequestSerializer, sampleLoanProfileSerializer
 from vendors.sf_request import SalesforceAdvisorRequest
-from vendors.sf_utils import SalesforceUtils
+from vendors.sf_utils import SF_CONTACT_CRM_TYPE, SalesforceUtils
 from vendors import models as v_models
 
 logger = logging.getLogger("sample.vendors.sf_push")
 
-SF_CONTACT_CRM_TYPE = 'salesforce'
+# limit of the Salesforce API
+SF_CREATE_MAX_SOBJECTS = 200
+
+
+def get_rate_quote_data_map():
+    # this is a singleton configured via the admin
+    sf_ratequote_info = v_models.SalesforceRateQuoteInfo.get_solo()
+
+    # map in the singletown fields to the name of the fields in SF
+    # names are not identical since __ are not allowed as model names by Django
+    return {
+        'LeadSource': sf_ratequote_info.LeadSource,  # sample Organic RateQuote
+        'Lead_Source_Details__c': sf_ratequote_info.Lead_Source_Details,
+        'Medium__c': sf_ratequote_info.Medium,  # no change
+        'OwnerId': sf_ratequote_info.OwnerId,
+        'Lead_Priority__c': sf_ratequote_info.Lead_Priority,  # Priority
+        'Lead_Preferred_language__c': sf_ratequote_info.Lead_Preferred_language,
+        'Pardot_Created__c': sf_ratequote_info.Pardot_Created,
+    }
 
 
 class SalesforcePush(object):
@@ -24,41 +44,35 @@ class SalesforcePush(object):
     to salesforce as a lead
     '''
 
-    def __init__(self, contact_request_id):
-        contact_request = ContactRequest.objects.select_subclasses().get(
-            id=contact_request_id)
-        mortgage_profile_id = getattr(
-            contact_request, 'mortgage_profile_id', False)
-
-        # this is a singleton configured via the admin
-        sf_ratequote_info = v_models.SalesforceRateQuoteInfo.get_solo()
-
-        # map in the singletown fields to the name of the fields in SF
-        # names are not identical since __ are not allowed as model names by Django
-        data_map = {
-            'LeadSource': sf_ratequote_info.LeadSource,  # sample Organic RateQuote
-            'Lead_Source_Details__c': sf_ratequote_info.Lead_Source_Details,
-            'Medium__c': sf_ratequote_info.Medium,  # no change
-            'OwnerId': sf_ratequote_info.OwnerId,
-            'Lead_Priority__c': sf_ratequote_info.Lead_Priority,  # Priority
-            'Lead_Preferred_language__c': sf_ratequote_info.Lead_Preferred_language,
-            'Pardot_Created__c': sf_ratequote_info.Pardot_Created,
-        }
+    def __init__(self, contact_request_id, contact_request=None, data_map=None, typed_profile=None):
+        # contact_request, data_map and typed_profile are given by SalesforceLeadBatchPush, loaded otherwise
+        if contact_request is None:
+            contact_request = ContactRequest.objects.select_subclasses().get(
+                id=contact_request_id)
+            mortgage_profile_id = getattr(
+                contact_request, 'mortgage_profile_id', False)
+            if mortgage_profile_id:
+                typed_profile = SalesforceUtils.typed_mortgage_profile(contact_request.mortgage_profile)
 
-        context_map = copy.deepcopy(data_map)
+        # values are strings, a shallow copy keeps the shared data map intact
+        context_map = dict(data_map or get_rate_quote_data_map())
 
-        if mortgage_profile_id:
-            context_map['typed_profile'] = SalesforceUtils.typed_mortgage_profile(contact_request.mortgage_profile)
+        if typed_profile:
+            context_map['typed_profile'] = typed_profile
 
         self.serializer = sampleContactRequestSerializer(contact_request, context=context_map)
         self.contact_request = contact_request
 
-    def push(self):
-        '''send contact to SF'''
+    def get_contact_map(self):
         contact_map = self.serializer.data
 
         # ALIBI: serializer conflict with reserved 'type' on object
         contact_map['type'] = 'Lead'
+        return contact_map
+
+    def push(self):
+        '''send contact to SF'''
+        contact_map = self.get_contact_map()
 
         salesforce_client = SalesforceUtils.create_salesforce_client()
         if salesforce_client:
@@ -85,6 +99,103 @@ class SalesforcePush(object):
                 return response
 
 
+class SalesforceLeadBatchPush(object):
+    '''
+    Transmit many sample ContactRequests to salesforce as leads, in create calls of up to
+    SALESFORCE_LEAD_BATCH_SIZE leads.
+    Contact requests and their typed mortgage profiles are loaded with one query each.
+    '''
+
+    def __init__(self, contact_request_ids):
+        contact_requests = list(ContactRequest.objects.select_subclasses().filter(
+            id__in=contact_request_ids, crm_id='').order_by('id'))
+        typed_profiles = SalesforceUtils.typed_mortgage_profiles(
+            getattr(contact_request, 'mortgage_profile_id', None) for contact_request in contact_requests)
+        data_map = get_rate_quote_data_map()
+
+        self.pushes = []
+        for contact_request in contact_requests:
+            typed_profile = typed_profiles.get(getattr(contact_request, 'mortgage_profile_id', None))
+            if typed_profile:
+                # no query for the mortgage profile while serializing
+                contact_request.mortgage_profile = typed_profile
+            self.pushes.append(SalesforcePush(
+                contact_request.id, contact_request=contact_request, data_map=data_map, typed_profile=typed_profile))
+        # ids of the contact requests left unpushed because a create call failed as a whole
+        self.unpushed_ids = []
+
+    def push(self):
+        '''
+        send contacts to SF, return the number of leads created
+        The first create call which fails as a whole stops the push, its contact requests and the following ones
+        are left in unpushed_ids.
+        '''
+        created = 0
+        batch_size = min(settings.SALESFORCE_LEAD_BATCH_SIZE, SF_CREATE_MAX_SOBJECTS)
+        for start in range(0, len(self.pushes), batch_size):
+            batch_created = self.push_batch(self.pushes[start:start + batch_size])
+            if batch_created is None:
+                self.unpushed_ids = [push.contact_request.id for push in self.pushes[start:]]
+                break
+            created += batch_created
+        return created
+
+    @staticmethod
+    def push_batch(pushes):
+        '''Return the number of leads created, None when the create call failed as a whole.'''
+        serialized = []
+        for push in pushes:
+            try:
+                serialized.append((push, push.get_contact_map()))
+            except Exception:
+                # a contact request which can not be serialized must not hold back the others
+                logger.exception('SF-CONTACT-LEAD-PUSH FAILED: contact request %s not serialized',
+                                 push.contact_request.id)
+        if not serialized:
+            return 0
+        pushes, contact_maps = zip(*serialized)
+
+        salesforce_client = SalesforceUtils.create_salesforce_client()
+        if not salesforce_client:
+            logger.error('SF-CONTACT-LEAD-BATCH-PUSH FAILED: no salesforce connection, contact requests %s',
+                         [push.contact_request.id for push in pushes])
+            return None
+        try:
+            response = salesforce_client.create(list(contact_maps))
+        except Exception:
+            logger.exception('SF-CONTACT-LEAD-BATCH-PUSH FAILED contact requests %s',
+                             [push.contact_request.id for push in pushes])
+            return None
+
+        if not isinstance(response, list) or len(response) != len(pushes):
+            logger.error('SF-CONTACT-LEAD-BATCH-PUSH FAILED: response: %s', response)
+            return None
+
+        crm_ids = {}
+        # results are in the order of the sObjects
+        for push, contact_map, result in zip(pushes, contact_maps, response):
+            if 'success' in result.keys() and result['success']:
+                logger.info(
+                    'SF-CONTACT-LEAD-PUSH %s-%s, url: %s -> lead Id : %s',
+                    contact_map['Lead_State__c'], contact_map['Loan_Purpose__c'],
+                    salesforce_client.serverUrl, result['id'])
+                crm_ids[push.contact_request.id] = result['id']
+            else:
+                logger.error('SF-CONTACT-LEAD-PUSH FAILED: contact request %s response: %s',
+                             push.contact_request.id, result)
+
+        if crm_ids:
+            ContactRequest.objects.filter(id__in=crm_ids).update(
+                crm_id=Case(*[When(id=contact_request_id, then=Value(crm_id))
+                              for contact_request_id, crm_id in crm_ids.items()],
+                            output_field=CharField()),
+                crm_type=SF_CONTACT_CRM_TYPE,
+                updated=timezone.now(),
+            )
+        logger.info('SF-CONTACT-LEAD-BATCH-PUSH leads %s created %s', len(pushes), len(crm_ids))
+        return len(crm_ids)
+
+
 class SalesforceLoanProfileMapper(object):
     '''
     Translate a sample LoanProfileV1 + MortgageProfile
@@ -99,7 +210,7 @@ class SalesforceLoanProfileMapper(object):
         # map in the singletown fields to the name of the fields in SF
         # names are not identical since __ are not allowed as model names by Django
 
-        data_map = {
+        context_map = {
             'LeadSource': sf_sampleone_reg_info.LeadSource,
             'Lead_Source_Details__c': sf_sampleone_reg_info.Lead_Source_Details,
             'Medium__c': sf_sampleone_reg_info.Medium,  # no change
@@ -109,7 +220,6 @@ class SalesforceLoanProfileMapper(object):
             'Pardot_Created__c': sf_sampleone_reg_info.Pardot_Created,
         }
 
-        context_map = copy.deepcopy(data_map)
         if loan_profile.mortgage_profile:
             if loan_profile.mortgage_profile.id:
                 context_map['typed_profile'] = SalesforceUtils.typed_mortgage_profile(
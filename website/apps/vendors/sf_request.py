@@ -1,11 +1,14 @@
 import logging
+from collections import defaultdict
 
 from django.conf import settings
+from django.db.models import Case, CharField, IntegerField, Value, When
 from pinax.notifications import models as notification
 
 from accounts.models import Advisor, DefaultAdvisor, User
 from loans.models import LoanProfileV1
-from vendors.sf_utils import SalesforceUtils
+from loans.versions import bump_loan_profile_versions
+from vendors.sf_utils import SF_CONTACT_CRM_TYPE, SalesforceUtils
 
 logger = logging.getLogger("sample.vendors.sf_request")
 
@@ -118,3 +121,122 @@ class SalesforceAdvisorRequest(object):
             notification.send([fallback], "advisor_request_fallback", context)
         else:
             logger.error('SF-NO-DEFAULT-ADVISOR-SET-IN-DJANGO-ADMIN')
+
+
+class SalesforceAdvisorReconciler(object):
+    '''
+    Assign the owners of Salesforce leads to the loan profiles still awaiting an advisor, in bulk.
+
+    Leads are queried SALESFORCE_RECONCILE_BATCH_SIZE at a time, owner emails are resolved against the emails of
+    all advisors, loaded once. Advisors and converted opportunity ids are applied with one update each per batch.
+    Loan profiles whose lead owner is not an advisor keep waiting as leads, even when the lead was converted,
+    their owner emails are reported.
+    '''
+
+    def __init__(self):
+        self.report = {
+            'checked': 0,
+            'assigned': 0,
+            'converted': 0,
+            'no_owner': 0,
+            'unmatched_emails': defaultdict(list),
+        }
+        self._advisor_ids = None
+
+    @staticmethod
+    def get_awaiting_loan_profiles():
+        return LoanProfileV1.objects.filter(
+            is_active=True,
+            advisor__isnull=True,
+            crm_type=SF_CONTACT_CRM_TYPE,
+            crm_object_type=LoanProfileV1.CRM_OBJECT_TYPE_CHOICES.lead,
+        ).exclude(crm_id='')
+
+    def get_advisor_ids(self):
+        '''Return advisor ids by email, the first advisor of an email wins.'''
+        if self._advisor_ids is None:
+            self._advisor_ids = {}
+            for advisor_id, email in Advisor.objects.order_by('id').values_list('id', 'email'):
+                if email in self._advisor_ids:
+                    logger.error('SF-ADVISOR-REQUEST-MULTIPLE-MATCHES for %s', email)
+                    continue
+                self._advisor_ids[email] = advisor_id
+        return self._advisor_ids
+
+    @staticmethod
+    def _escape(value):
+        return value.replace('\\', '\\\\').replace("'", "\\'")
+
+    def reconcile(self):
+        '''Reconcile all loan profiles awaiting an advisor, return the report.'''
+        loan_profiles = list(self.get_awaiting_loan_profiles().values_list('id', 'crm_id', 'guid'))
+        if loan_profiles:
+            salesforce_client = SalesforceUtils.create_salesforce_client()
+            if not salesforce_client:
+                logger.error('SF-ADVISOR-RECONCILE FAILED: no salesforce connection')
+                return self.report
+            batch_size = settings.SALESFORCE_RECONCILE_BATCH_SIZE
+            for start in range(0, len(loan_profiles), batch_size):
+                self.reconcile_batch(salesforce_client, loan_profiles[start:start + batch_size])
+
+        logger.info('SF-ADVISOR-RECONCILE checked %s assigned %s converted %s no_owner %s unmatched %s',
+                    self.report['checked'], self.report['assigned'], self.report['converted'],
+                    self.report['no_owner'], dict(self.report['unmatched_emails']))
+        return self.report
+
+    def reconcile_batch(self, salesforce_client, loan_profiles):
+        '''Reconcile (id, crm_id, guid) of loan profiles with one SOQL query.'''
+        query = "SELECT Id, Owner.Email, ConvertedOpportunityId FROM Lead WHERE Id IN ({0})".format(
+            ', '.join("'{0}'".format(self._escape(crm_id)) for _, crm_id, _ in loan_profiles))
+        try:
+            response = salesforce_client.query(query)
+        except Exception:
+            logger.exception('SF-ADVISOR-RECONCILE-QUERY FAILED')
+            return
+
+        leads = {lead.get('Id'): lead for lead in response}
+        advisor_ids = self.get_advisor_ids()
+        assignments = {}
+        opportunities = {}
+        for loan_profile_id, crm_id, guid in loan_profiles:
+            self.report['checked'] += 1
+            lead = leads.get(crm_id)
+            if lead is None:
+                logger.warning('SF-ADVISOR-RECONCILE no lead %s for %s', crm_id, guid)
+                continue
+
+            owner_email = self._extract_advisor_email([lead])
+            if not owner_email:
+                self.report['no_owner'] += 1
+            elif owner_email in advisor_ids:
+                assignments[loan_profile_id] = advisor_ids[owner_email]
+            else:
+                logger.error('SF-ADVISOR-REQUEST-NO-MATCH for %s: received %s', guid, owner_email)
+                self.report['unmatched_emails'][owner_email].append(str(guid))
+
+            opportunity_id = self._extract_opp_id([lead])
+            # only with an advisor: the loan profile keeps waiting as a lead otherwise, and is checked again
+            if opportunity_id and loan_profile_id in assignments:
+                opportunities[loan_profile_id] = opportunity_id
+
+        if assignments:
+            LoanProfileV1.objects.filter(id__in=assignments).update(advisor_id=Case(
+                *[When(id=loan_profile_id, then=Value(advisor_id))
+                  for loan_profile_id, advisor_id in assignments.items()],
+                output_field=IntegerField()))
+        if opportunities:
+            LoanProfileV1.objects.filter(id__in=opportunities).update(
+                crm_id=Case(*[When(id=loan_profile_id, then=Value(opportunity_id))
+                              for loan_profile_id, opportunity_id in opportunities.items()],
+                            output_field=CharField()),
+                crm_object_type=LoanProfileV1.CRM_OBJECT_TYPE_CHOICES.opportunity)
+        bump_loan_profile_versions(list(assignments) + list(opportunities))
+        self.report['assigned'] += len(assignments)
+        self.report['converted'] += len(opportunities)
+
+        for loan_profile in LoanProfileV1.objects.filter(id__in=assignments).select_related('storage'):
+            if not loan_profile.storage_id or not loan_profile.storage.storage_id:
+                loan_profile.create_storage()
+
+    _extract_advisor_email = staticmethod(SalesforceAdvisorRequest._extract_advisor_email)
+    _extract_opp_id = staticmethod(SalesforceAdvisorRequest._extract_opp_id)
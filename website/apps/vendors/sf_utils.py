@@ -1,13 +1,20 @@
 import logging
+import threading
+import time
 
 import beatbox
 
 from django.conf import settings
+from django.core.cache import caches
 
-from mortgage_profiles.models import MortgageProfilePurchase, MortgageProfileRefinance
+from core.utils import cache_lock
+
+from mortgage_profiles.models import MortgageProfile, MortgageProfilePurchase, MortgageProfileRefinance
 
 logger = logging.getLogger("sample.vendors.sf_utils")
 
+SF_CONTACT_CRM_TYPE = 'salesforce'
+
 
 class SalesforceUtils(object):
     """Utility methods for Salesforce interaction"""
@@ -21,22 +28,144 @@ class SalesforceUtils(object):
             elif mortgage_profile.kind == 'purchase':
                 return MortgageProfilePurchase.objects.get(id=mortgage_profile.id)
 
+    @staticmethod
+    def typed_mortgage_profiles(mortgage_profile_ids):
+        """Get the typed MortgageProfile subclasses by id, with one query"""
+        mortgage_profile_ids = set(filter(None, mortgage_profile_ids))
+        if not mortgage_profile_ids:
+            return {}
+        mortgage_profiles = MortgageProfile.objects.filter(id__in=mortgage_profile_ids).select_subclasses(
+            MortgageProfileRefinance, MortgageProfilePurchase)
+        return {mortgage_profile.id: mortgage_profile for mortgage_profile in mortgage_profiles
+                if isinstance(mortgage_profile, (MortgageProfileRefinance, MortgageProfilePurchase))}
+
     @staticmethod
     def create_salesforce_client():
-        """Build a beatbox Salesforce client and log in"""
-        salesforce_client = beatbox.PythonClient()
-        salesforce_client.serverUrl = settings.SALESFORCE['URL']
+        """Return a beatbox Salesforce client logged in with the shared session, None on login failure"""
         try:
-            login_response = salesforce_client.login(
-                settings.SALESFORCE['USER'],
-                settings.SALESFORCE['PASSWORD'] + settings.SALESFORCE['TOKEN']
-            )
+            return salesforce_sessions.get_client()
         except Exception:
             logger.exception('SF-LOGIN-FAILED')
             return None
-        else:
+
+
+class SalesforceClient(object):
+    """
+    Proxy of a beatbox client.
+    Calls rejected with INVALID_SESSION_ID (beatbox.SessionTimeoutError) are retried once with a new session.
+    """
+
+    def __init__(self, manager, client):
+        self._manager = manager
+        self._client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            try:
+                return attr(*args, **kwargs)
+            except beatbox.SessionTimeoutError:
+                # beatbox raises it on INVALID_SESSION_ID: the session expired or was revoked
+                logger.warning('SF-SESSION-INVALID session age %s', self._manager.get_stats()['session_age'])
+                client = self._manager.get_beatbox_client(stale_session_id=self._client.sessionId)
+                if client is None:
+                    raise
+                self._client = client
+                return getattr(self._client, name)(*args, **kwargs)
+        return call
+
+
+class SalesforceSessionManager(object):
+    """
+    Salesforce API sessions shared by all processes through the cache.
+
+    A session is used by every process until SALESFORCE_SESSION_TIMEOUT seconds after its login, or until
+    Salesforce rejects it with INVALID_SESSION_ID. Logins are serialized by a lock in the cache: a process
+    finding a newer session than the one rejected uses it instead of logging in again.
+    Each thread keeps its own beatbox client, which keeps its HTTP connection open between calls.
+    """
+
+    SESSION_KEY = 'vendors.salesforce.session'
+    LOCK_KEY = 'vendors.salesforce.login_lock'
+    LOGINS_KEY = 'vendors.salesforce.logins'
+    LOCK_TIMEOUT = 30
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @staticmethod
+    def get_cache():
+        return caches[settings.SALESFORCE_SESSION_CACHE_NAME]
+
+    @staticmethod
+    def _is_valid(session, stale_session_id=None):
+        return (session is not None and session['session_id'] != stale_session_id and
+                time.time() - session['created'] < settings.SALESFORCE_SESSION_TIMEOUT)
+
+    def get_session(self, stale_session_id=None):
+        """Return the shared session, logging in when there is no valid one. None on login failure."""
+        session = self.get_cache().get(self.SESSION_KEY)
+        if self._is_valid(session, stale_session_id):
+            return session
+        return self.login(stale_session_id)
+
+    def login(self, stale_session_id=None):
+        with cache_lock(self.LOCK_KEY, self.LOCK_TIMEOUT, settings.SALESFORCE_SESSION_CACHE_NAME):
+            cache = self.get_cache()
+            session = cache.get(self.SESSION_KEY)
+            if self._is_valid(session, stale_session_id):
+                # logged in by another process meanwhile
+                return session
+
+            client = beatbox.PythonClient()
+            client.serverUrl = settings.SALESFORCE['URL']
+            login_response = client.login(
+                settings.SALESFORCE['USER'],
+                settings.SALESFORCE['PASSWORD'] + settings.SALESFORCE['TOKEN']
+            )
             if 'sessionId' not in login_response.keys():
                 logger.error('SF-LEAD-PUSH LOGIN FAILED: response: %s', login_response)
-            else:
-                return salesforce_client
-        return None
+                return None
+
+            session = {
+                'session_id': login_response['sessionId'],
+                'server_url': login_response['serverUrl'],
+                'created': time.time(),
+            }
+            cache.set(self.SESSION_KEY, session, settings.SALESFORCE_SESSION_TIMEOUT)
+            if not cache.add(self.LOGINS_KEY, 1, None):
+                cache.incr(self.LOGINS_KEY)
+            logger.info('SF-SESSION-LOGIN logins %s', cache.get(self.LOGINS_KEY))
+            return session
+
+    def get_beatbox_client(self, stale_session_id=None):
+        """Return the beatbox client of the thread, using the shared session. None on login failure."""
+        session = self.get_session(stale_session_id)
+        if session is None:
+            return None
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = beatbox.PythonClient()
+            client.serverUrl = settings.SALESFORCE['URL']
+        if getattr(client, 'sessionId', None) != session['session_id']:
+            client.useSession(session['session_id'], session['server_url'])
+        return client
+
+    def get_client(self):
+        client = self.get_beatbox_client()
+        return SalesforceClient(self, client) if client is not None else None
+
+    def get_stats(self):
+        """Return the number of logins and the age of the shared session, seconds."""
+        values = self.get_cache().get_many([self.SESSION_KEY, self.LOGINS_KEY])
+        session = values.get(self.SESSION_KEY)
+        return {
+            'logins': values.get(self.LOGINS_KEY) or 0,
+            'session_age': int(time.time() - session['created']) if session else None,
+        }
+
+
+salesforce_sessions = SalesforceSessionManager()
@@ -1,14 +1,44 @@
 from celery import task
 
-from vendors.sf_push import SalesforcePush, SalesforceLoanProfileMapper
-from vendors.sf_request import SalesforceAdvisorRequest
+from django.conf import settings
+
+from core.utils import SynchronousTask
+from vendors import sf_lead_queue
+from vendors.sf_push import SalesforceLeadBatchPush, SalesforceLoanProfileMapper
+from vendors.sf_request import SalesforceAdvisorReconciler, SalesforceAdvisorRequest
 
 
 @task
 def push_lead_to_salesforce(contact_request_id):
-    '''contact request -> lead'''
-    sf_push = SalesforcePush(contact_request_id)
-    sf_push.push()
+    '''contact request -> lead, buffered, see vendors.sf_lead_queue'''
+    buffered = sf_lead_queue.add(contact_request_id)
+    if buffered >= settings.SALESFORCE_LEAD_BATCH_SIZE:
+        flush_leads_to_salesforce.delay()
+    elif buffered == 1:
+        flush_leads_to_salesforce.apply_async(countdown=settings.SALESFORCE_LEAD_BATCH_WINDOW)
+
+
+class FlushLeadsToSalesforce(SynchronousTask):
+    '''buffered contact requests -> leads'''
+    use_args_in_lock_key = False
+    retry_on_lock = True
+
+    def synchronous_run(self):
+        while True:
+            contact_request_ids = sf_lead_queue.peek(settings.SALESFORCE_LEAD_BATCH_SIZE)
+            if not contact_request_ids:
+                break
+            # leads leave the buffer once pushed, the leads of a flush which crashes are pushed by the next one
+            batch_push = SalesforceLeadBatchPush(contact_request_ids)
+            batch_push.push()
+            unpushed_ids = set(batch_push.unpushed_ids)
+            sf_lead_queue.remove([
+                contact_request_id for contact_request_id in contact_request_ids
+                if contact_request_id not in unpushed_ids])
+            if unpushed_ids:
+                # Salesforce can not be reached: keep the leads buffered for the next flush
+                flush_leads_to_salesforce.apply_async(countdown=settings.SALESFORCE_LEAD_BATCH_WINDOW)
+                break
 
 
 @task
@@ -22,3 +52,15 @@ def get_advisor_for_loan_profile_salesforce(loan_profile_v1_id):
     '''get advisor for loan profile'''
     sf_request = SalesforceAdvisorRequest(loan_profile_v1_id)
     sf_request.update()
+
+
+class ReconcileSalesforceAdvisors(SynchronousTask):
+    '''assign lead owners to loan profiles awaiting an advisor'''
+    use_args_in_lock_key = False
+
+    def synchronous_run(self):
+        return SalesforceAdvisorReconciler().reconcile()
+
+
+flush_leads_to_salesforce = FlushLeadsToSalesforce()
+reconcile_salesforce_advisors = ReconcileSalesforceAdvisors()
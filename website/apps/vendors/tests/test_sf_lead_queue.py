@@ -0,0 +1,163 @@
+import mock
+
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+
+from contacts.models import ContactRequest
+from core.tests import LOCMEM_CACHES
+from contacts import factories as contact_factories
+from vendors import sf_lead_queue
+from vendors.sf_push import SalesforceLeadBatchPush
+from vendors.tasks import push_lead_to_salesforce, flush_leads_to_salesforce
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    SALESFORCE_LEAD_BATCH_SIZE=3,
+    SALESFORCE_LEAD_BATCH_WINDOW=10,
+)
+class SalesforceLeadQueueTest(TestCase):
+    def setUp(self):
+        sf_lead_queue.get_cache().clear()
+
+    def test_buffer(self):
+        self.assertEqual(sf_lead_queue.add(1), 1)
+        self.assertEqual(sf_lead_queue.add(2), 2)
+        self.assertEqual(sf_lead_queue.add(1), 2)
+
+        self.assertEqual(sf_lead_queue.peek(1), [1])
+        self.assertEqual(sf_lead_queue.peek(5), [1, 2])
+        self.assertEqual(sf_lead_queue.remove([1]), 1)
+        self.assertEqual(sf_lead_queue.peek(5), [2])
+        self.assertEqual(sf_lead_queue.remove([2]), 0)
+        self.assertEqual(sf_lead_queue.peek(5), [])
+
+    @mock.patch('vendors.tasks.flush_leads_to_salesforce')
+    def test_flush_is_scheduled(self, mock_flush):
+        push_lead_to_salesforce(1)
+        mock_flush.apply_async.assert_called_once_with(countdown=10)
+
+        push_lead_to_salesforce(2)
+        self.assertFalse(mock_flush.delay.called)
+
+        push_lead_to_salesforce(3)
+        mock_flush.delay.assert_called_once_with()
+        self.assertEqual(mock_flush.apply_async.call_count, 1)
+
+    @mock.patch('vendors.tasks.SalesforceLeadBatchPush')
+    def test_flush_pushes_batches(self, mock_batch_push):
+        mock_batch_push.return_value.unpushed_ids = []
+        for contact_request_id in range(1, 6):
+            sf_lead_queue.add(contact_request_id)
+
+        flush_leads_to_salesforce.synchronous_run()
+
+        self.assertEqual([call[0][0] for call in mock_batch_push.call_args_list], [[1, 2, 3], [4, 5]])
+        self.assertEqual(sf_lead_queue.size(), 0)
+
+    @mock.patch('vendors.tasks.flush_leads_to_salesforce.apply_async')
+    @mock.patch('vendors.tasks.SalesforceLeadBatchPush')
+    def test_flush_keeps_unpushed_leads(self, mock_batch_push, mock_apply_async):
+        mock_batch_push.return_value.unpushed_ids = [2, 3]
+        for contact_request_id in range(1, 6):
+            sf_lead_queue.add(contact_request_id)
+
+        flush_leads_to_salesforce.synchronous_run()
+
+        self.assertEqual(mock_batch_push.call_count, 1)
+        self.assertEqual(sf_lead_queue.peek(5), [2, 3, 4, 5])
+        mock_apply_async.assert_called_once_with(countdown=10)
+
+    @mock.patch('vendors.tasks.SalesforceLeadBatchPush')
+    def test_crashed_flush_keeps_leads(self, mock_batch_push):
+        mock_batch_push.side_effect = DatabaseError
+        for contact_request_id in range(1, 6):
+            sf_lead_queue.add(contact_request_id)
+
+        with self.assertRaises(DatabaseError):
+            flush_leads_to_salesforce.synchronous_run()
+
+        self.assertEqual(sf_lead_queue.peek(5), [1, 2, 3, 4, 5])
+
+
+@mock.patch('vendors.sf_push.logger', mock.Mock())
+class SalesforceLeadBatchPushTest(TestCase):
+    def setUp(self):
+        self.contact_requests = [
+            contact_factories.ContactRequestMortgageProfileFactory(first_name='Test', last_name=str(number))
+            for number in range(3)
+        ]
+        self.ids = [contact_request.id for contact_request in self.contact_requests]
+
+    @mock.patch('vendors.sf_push.SalesforceUtils.create_salesforce_client')
+    def test_push(self, mock_create_client):
+        salesforce_client = mock_create_client.return_value
+        salesforce_client.create.return_value = [
+            {'success': True, 'id': 'lead-0'},
+            {'success': False, 'errors': ['DUPLICATE_VALUE']},
+            {'success': True, 'id': 'lead-2'},
+        ]
+
+        self.assertEqual(SalesforceLeadBatchPush(self.ids).push(), 2)
+
+        leads = salesforce_client.create.call_args[0][0]
+        self.assertEqual([lead['LastName'] for lead in leads], ['0', '1', '2'])
+        self.assertEqual({lead['type'] for lead in leads}, {'Lead'})
+        self.assertEqual(
+            list(ContactRequest.objects.filter(id__in=self.ids).order_by('id').values_list('crm_id', 'crm_type')),
+            [('lead-0', 'salesforce'), ('', ''), ('lead-2', 'salesforce')])
+
+    @mock.patch('vendors.sf_push.SalesforceUtils.create_salesforce_client')
+    def test_pushed_contact_requests_are_skipped(self, mock_create_client):
+        ContactRequest.objects.filter(id=self.ids[0]).update(crm_id='lead-0')
+        salesforce_client = mock_create_client.return_value
+        salesforce_client.create.return_value = [{'success': True, 'id': 'lead-1'}, {'success': True, 'id': 'lead-2'}]
+
+        self.assertEqual(SalesforceLeadBatchPush(self.ids).push(), 2)
+
+        self.assertEqual([lead['LastName'] for lead in salesforce_client.create.call_args[0][0]], ['1', '2'])
+
+    @mock.patch('vendors.sf_push.SalesforceUtils.create_salesforce_client')
+    def test_push_in_batches(self, mock_create_client):
+        salesforce_client = mock_create_client.return_value
+        salesforce_client.create.side_effect = [
+            [{'success': True, 'id': 'lead-0'}, {'success': True, 'id': 'lead-1'}],
+            [{'success': True, 'id': 'lead-2'}],
+        ]
+
+        with override_settings(SALESFORCE_LEAD_BATCH_SIZE=2):
+            self.assertEqual(SalesforceLeadBatchPush(self.ids).push(), 3)
+
+        self.assertEqual([len(call[0][0]) for call in salesforce_client.create.call_args_list], [2, 1])
+
+    @mock.patch('vendors.sf_push.SalesforceUtils.create_salesforce_client')
+    def test_failed_batch_is_unpushed(self, mock_create_client):
+        salesforce_client = mock_create_client.return_value
+        salesforce_client.create.side_effect = [[{'success': True, 'id': 'lead-0'}], Exception('UNAVAILABLE')]
+
+        with override_settings(SALESFORCE_LEAD_BATCH_SIZE=1):
+            batch_push = SalesforceLeadBatchPush(self.ids)
+            self.assertEqual(batch_push.push(), 1)
+
+        self.assertEqual(salesforce_client.create.call_count, 2)
+        self.assertEqual(batch_push.unpushed_ids, self.ids[1:])
+        self.assertEqual(ContactRequest.objects.filter(id__in=self.ids, crm_id='').count(), 2)
+
+    @mock.patch('vendors.sf_push.SalesforceUtils.create_salesforce_client', mock.Mock(return_value=None))
+    def test_no_connection(self):
+        batch_push = SalesforceLeadBatchPush(self.ids)
+
+        self.assertEqual(batch_push.push(), 0)
+        self.assertEqual(batch_push.unpushed_ids, self.ids)
+
+    @mock.patch('vendors.sf_push.SalesforceUtils.create_salesforce_client')
+    def test_unserializable_contact_request_is_skipped(self, mock_create_client):
+        salesforce_client = mock_create_client.return_value
+        salesforce_client.create.return_value = [{'success': True, 'id': 'lead-0'}, {'success': True, 'id': 'lead-2'}]
+        batch_push = SalesforceLeadBatchPush(self.ids)
+        batch_push.pushes[1].get_contact_map = mock.Mock(side_effect=ValueError)
+
+        self.assertEqual(batch_push.push(), 2)
+
+        self.assertEqual([lead['LastName'] for lead in salesforce_client.create.call_args[0][0]], ['0', '2'])
+        self.assertEqual(batch_push.unpushed_ids, [])
@@ -0,0 +1,87 @@
+import mock
+
+from django.test import TestCase, override_settings
+
+from accounts.factories import AdvisorFactory
+from loans.factories import LoanProfileV1Factory
+from loans.models import LoanProfileV1
+from vendors.sf_request import SalesforceAdvisorReconciler
+
+
+def lead(lead_id, email=None, opportunity_id=None):
+    return {'Id': lead_id, 'Owner': {'Email': email} if email else None, 'ConvertedOpportunityId': opportunity_id}
+
+
+@mock.patch('vendors.sf_request.logger', mock.Mock())
+@mock.patch('loans.models.LoanProfileV1.create_storage', mock.Mock())
+class SalesforceAdvisorReconcilerTest(TestCase):
+    def setUp(self):
+        self.advisor = AdvisorFactory(email='advisor@example.com')
+        self.loan_profiles = [
+            LoanProfileV1Factory(advisor=None, crm_id='lead-{}'.format(number), crm_type='salesforce')
+            for number in range(3)
+        ]
+
+    def get(self, loan_profile):
+        return LoanProfileV1.objects.get(id=loan_profile.id)
+
+    @mock.patch('vendors.sf_request.SalesforceUtils.create_salesforce_client')
+    def test_reconcile(self, mock_create_client):
+        salesforce_client = mock_create_client.return_value
+        salesforce_client.query.return_value = [
+            lead('lead-0', 'advisor@example.com', 'opportunity-0'),
+            lead('lead-1', 'unknown@example.com'),
+            lead('lead-2'),
+        ]
+        assigned = LoanProfileV1Factory(advisor=self.advisor, crm_id='lead-3', crm_type='salesforce')
+
+        report = SalesforceAdvisorReconciler().reconcile()
+
+        salesforce_client.query.assert_called_once_with(
+            "SELECT Id, Owner.Email, ConvertedOpportunityId FROM Lead WHERE Id IN ('lead-0', 'lead-1', 'lead-2')")
+        first, second, third = [self.get(loan_profile) for loan_profile in self.loan_profiles]
+        self.assertEqual((first.advisor, first.crm_id, first.crm_object_type),
+                         (self.advisor, 'opportunity-0', LoanProfileV1.CRM_OBJECT_TYPE_CHOICES.opportunity))
+        self.assertEqual((second.advisor, second.crm_id), (None, 'lead-1'))
+        self.assertEqual((third.advisor, third.crm_id), (None, 'lead-2'))
+        self.assertEqual(self.get(assigned).crm_id, 'lead-3')
+        self.assertEqual(report['checked'], 3)
+        self.assertEqual(report['assigned'], 1)
+        self.assertEqual(report['converted'], 1)
+        self.assertEqual(report['no_owner'], 1)
+        self.assertEqual(dict(report['unmatched_emails']), {'unknown@example.com': [str(second.guid)]})
+
+    @mock.patch('vendors.sf_request.SalesforceUtils.create_salesforce_client')
+    def test_reconcile_in_batches(self, mock_create_client):
+        salesforce_client = mock_create_client.return_value
+        salesforce_client.query.side_effect = [
+            [lead('lead-0', 'advisor@example.com'), lead('lead-1', 'advisor@example.com')],
+            [lead('lead-2', 'advisor@example.com')],
+        ]
+
+        with override_settings(SALESFORCE_RECONCILE_BATCH_SIZE=2):
+            report = SalesforceAdvisorReconciler().reconcile()
+
+        self.assertEqual(salesforce_client.query.call_count, 2)
+        self.assertEqual(report['assigned'], 3)
+        self.assertFalse(LoanProfileV1.objects.filter(advisor__isnull=True).exists())
+
+    @mock.patch('vendors.sf_request.SalesforceUtils.create_salesforce_client')
+    def test_converted_lead_without_advisor_keeps_waiting(self, mock_create_client):
+        salesforce_client = mock_create_client.return_value
+        salesforce_client.query.return_value = [
+            lead('lead-0', 'unknown@example.com', 'opportunity-0'),
+            lead('lead-1', None, 'opportunity-1'),
+            lead('lead-2', 'advisor@example.com', 'opportunity-2'),
+        ]
+
+        report = SalesforceAdvisorReconciler().reconcile()
+
+        first, second, third = [self.get(loan_profile) for loan_profile in self.loan_profiles]
+        for loan_profile, crm_id in ((first, 'lead-0'), (second, 'lead-1')):
+            self.assertEqual((loan_profile.advisor, loan_profile.crm_id, loan_profile.crm_object_type),
+                             (None, crm_id, LoanProfileV1.CRM_OBJECT_TYPE_CHOICES.lead))
+        self.assertEqual((third.advisor, third.crm_id), (self.advisor, 'opportunity-2'))
+        self.assertEqual(report['converted'], 1)
+        self.assertEqual(set(SalesforceAdvisorReconciler.get_awaiting_loan_profiles().values_list('id', flat=True)),
+                         {first.id, second.id})
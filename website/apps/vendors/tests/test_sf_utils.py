@@ -0,0 +1,102 @@
+import time
+
+import beatbox
+import mock
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from core.tests import LOCMEM_CACHES
+from vendors.sf_utils import SalesforceSessionManager, SalesforceUtils
+
+
+def get_beatbox_client_mock(session_ids):
+    '''Return a beatbox client class mock logging in with the given session ids in turn.'''
+    session_ids = iter(session_ids)
+
+    def login(username, password):
+        return {'sessionId': next(session_ids), 'serverUrl': 'https://sf.example.com/services'}
+
+    def use_session(client, session_id, server_url):
+        client.sessionId = session_id
+
+    def build(*args, **kwargs):
+        client = mock.Mock(sessionId=None, spec=['login', 'useSession', 'query', 'create', 'sessionId', 'serverUrl'])
+        client.login.side_effect = login
+        client.useSession.side_effect = lambda session_id, server_url: use_session(client, session_id, server_url)
+        return client
+    return mock.Mock(side_effect=build)
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    SALESFORCE={'URL': 'https://login.example.com', 'USER': 'user', 'PASSWORD': 'password', 'TOKEN': 'token'},
+    SALESFORCE_SESSION_CACHE_NAME='default',
+    SALESFORCE_SESSION_TIMEOUT=60 * 60,
+)
+class SalesforceSessionManagerTest(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.manager = SalesforceSessionManager()
+
+    def test_session_is_shared(self):
+        with mock.patch('beatbox.PythonClient', get_beatbox_client_mock(['session-1', 'session-2'])):
+            first = self.manager.get_client()
+            second = SalesforceSessionManager().get_client()
+
+        self.assertEqual(first.sessionId, 'session-1')
+        self.assertEqual(second.sessionId, 'session-1')
+        self.assertEqual(self.manager.get_stats()['logins'], 1)
+
+    def test_client_is_kept_by_thread(self):
+        with mock.patch('beatbox.PythonClient', get_beatbox_client_mock(['session-1'])) as mock_client:
+            first = self.manager.get_client()
+            second = self.manager.get_client()
+
+        self.assertIs(first._client, second._client)
+        # one client to log in, one kept by the thread
+        self.assertEqual(mock_client.call_count, 2)
+        first._client.useSession.assert_called_once_with('session-1', 'https://sf.example.com/services')
+
+    def test_expired_session_is_renewed(self):
+        with mock.patch('beatbox.PythonClient', get_beatbox_client_mock(['session-1', 'session-2'])):
+            self.manager.get_client()
+            with mock.patch('vendors.sf_utils.time.time', return_value=time.time() + 60 * 60 + 1):
+                client = self.manager.get_client()
+
+        self.assertEqual(client.sessionId, 'session-2')
+        self.assertEqual(self.manager.get_stats()['logins'], 2)
+
+    def test_invalid_session_is_renewed_and_call_retried(self):
+        with mock.patch('beatbox.PythonClient', get_beatbox_client_mock(['session-1', 'session-2'])):
+            client = self.manager.get_client()
+            client._client.query.side_effect = [
+                beatbox.SessionTimeoutError('INVALID_SESSION_ID', 'Invalid Session ID'), {'size': 0}]
+
+            self.assertEqual(client.query('SELECT Id FROM Lead'), {'size': 0})
+
+        self.assertEqual(client.sessionId, 'session-2')
+        self.assertEqual(client._client.query.call_count, 2)
+        self.assertEqual(self.manager.get_stats()['logins'], 2)
+
+    def test_newer_session_of_another_process_is_used(self):
+        with mock.patch('beatbox.PythonClient', get_beatbox_client_mock(['session-1', 'session-2'])):
+            client = self.manager.get_client()
+            SalesforceSessionManager().login(stale_session_id='session-1')
+            client._client.create.side_effect = [
+                beatbox.SessionTimeoutError('INVALID_SESSION_ID', 'Invalid Session ID'), [{'success': True}]]
+
+            client.create([{'type': 'Lead'}])
+
+        self.assertEqual(client.sessionId, 'session-2')
+        self.assertEqual(self.manager.get_stats()['logins'], 2)
+
+    def test_login_failure(self):
+        client_mock = get_beatbox_client_mock([])
+        with mock.patch('beatbox.PythonClient', client_mock), mock.patch('vendors.sf_utils.logger'):
+            client_mock.side_effect = None
+            client_mock.return_value.login.return_value = {}
+            self.assertIsNone(SalesforceUtils.create_salesforce_client())
+
+            client_mock.return_value.login.side_effect = Exception
+            self.assertIsNone(SalesforceUtils.create_salesforce_client())
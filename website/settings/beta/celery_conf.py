@@ -25,6 +25,15 @@ CELERYBEAT_SCHEDULE = {
         'task': 'storage.tasks.HandleUnprocessedUploadedDocumentsTask',
         'schedule': crontab()  # every minutes
     },
+    'archive_rate_quotes': {
+        'task': 'mortgage_profiles.tasks.ArchiveRateQuotes',
+        'schedule': crontab(minute='30'),  # every hour
+        'kwargs': {'max_batches': 20},
+    },
+    'flush_leads_to_salesforce': {
+        'task': 'vendors.tasks.FlushLeadsToSalesforce',
+        'schedule': crontab()  # every minute, picks up leads whose scheduled flush was lost
+    },
 }
 # Celery testing XXXkayhudson
 CELERYD_TASK_TIME_LIMIT = 300
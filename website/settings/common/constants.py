@@ -7,6 +7,53 @@ LOAN_SIFTER_ENDPOINT = 'https://www.loansifter.com/webservices/consumerportal.as
 MORTECH_ENDPOINT = 'https://thirdparty.mortech-inc.com/mpg/servlet/mpgThirdPartyServlet'
 SAVE_LOAN_SIFTER_RESPONSE = False
 SAVE_MORTECH_RESPONSE = False
+# Request all Mortech filter ids at once instead of one by one
+MORTECH_CONCURRENT_FILTERS = False
+# Cache parsed Mortech responses for identical requests, seconds. 0 disables the cache.
+MORTECH_CACHE_NAME = 'default'
+MORTECH_CACHE_TIMEOUT = 0
+# Rate quote lender storage: 'rows' saves a RateQuoteLender per quote,
+# 'compact' saves one RateQuoteLenderSet per request and promotes displayed lenders to rows
+RATE_QUOTE_LENDER_STORAGE = 'rows'
+# Rate quote requests older than this are archived and deleted, see mortgage_profiles.retention
+RATE_QUOTE_RETENTION_DAYS = 180
+RATE_QUOTE_RETENTION_BATCH_SIZE = 500
+RATE_QUOTE_ARCHIVE_STORAGE = 'django.core.files.storage.FileSystemStorage'
+# Queue rate quote requests to celery by default, see RateQuoteRequestView
+RATE_QUOTE_ASYNC = False
+# Maximum long-poll wait of the rate quote status endpoint, seconds
+RATE_QUOTE_STATUS_MAX_WAIT = 20
+# Encrypted cache of loan profile detail responses and version stamps of loan profile graphs, seconds.
+# 0 disables both, see advisor_portal.cache and loans.versions
+LOAN_PROFILE_CACHE_NAME = 'default'
+LOAN_PROFILE_CACHE_TIMEOUT = 0
+# Box events are processed in batches, at most BOX_EVENTS_MAX_BATCHES per run, see box.tasks.SyncUnprocessedBoxEvents.
+# Box file info of a batch is fetched by BOX_EVENTS_FETCH_WORKERS threads.
+BOX_EVENTS_BATCH_SIZE = 500
+BOX_EVENTS_MAX_BATCHES = 20
+BOX_EVENTS_FETCH_WORKERS = 8
+# The high-water mark of Box events only passes events older than this, seconds: webhook requests may commit late
+BOX_EVENTS_WATERMARK_LAG = 300
+# Cache of Box subfolder ids by parent and name, seconds. 0 disables the cache, see box.cache
+BOX_FOLDER_CACHE_NAME = 'default'
+BOX_FOLDER_CACHE_TIMEOUT = 0
+# Sibling Box folders and collaborations are created by up to this many threads, 1 creates them one by one
+BOX_PROVISIONING_WORKERS = 1
+# Box OAuth tokens are shared by all processes through this cache, see box.utils.BoxTokenStore
+BOX_TOKEN_CACHE_NAME = 'default'
+# Connections kept per process to the Box API
+BOX_HTTP_POOL_SIZE = 10
+# Cache of Box document thumbnails, seconds since last use. 0 disables the cache, see box.thumbnails
+BOX_THUMBNAIL_CACHE_NAME = 'default'
+BOX_THUMBNAIL_CACHE_TIMEOUT = 0
+# Thumbnails missing from the cache are fetched by up to this many threads, see box.api_v1.get_thumbnails
+BOX_THUMBNAIL_WORKERS = 8
+# Maximum number of documents of a batch thumbnails request
+BOX_THUMBNAIL_BATCH_SIZE = 50
+# Configuration singletons are reused by each process for this many seconds before their version stamp is checked
+# again. 0 disables the cache, see core.config
+CONFIG_CACHE_NAME = 'default'
+CONFIG_CACHE_TIMEOUT = 0
 
 REFERRER_SESSION_KEY = 'sn_referrer'
 
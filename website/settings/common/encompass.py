@@ -2,3 +2,10 @@ ENCOMPASS_API_DEFAULT_TIMEOUT = 90
 ENCOMPASS_TEST_MODE = 'True'  # String required!
 ENCOMPASS_URL = 'http://encompass-api.qa.sample.com:3000/sample-api-test/api'
 ENCOMPASS_EXPLICITLY_ASSIGN_ADVISOR = False
+# Syncs in progress at once, syncs per minute (0 disables the rate limit) and their burst,
+# see advisor_portal.encompass_sync
+ENCOMPASS_SYNC_CONCURRENCY = 10
+ENCOMPASS_SYNC_RATE = 0
+ENCOMPASS_SYNC_BURST = 10
+# Loan profiles loaded at once when they are prepared for syncing
+ENCOMPASS_SYNC_BATCH_SIZE = 100
@@ -1,3 +1,11 @@
 # Google Analytics Event Proxy ENABLE, DEBUG, OFF
 GA_PROXY_MODE = 'OFF'
 GA_PROXY_TRACKING_ID = 'UA-44728115-3'
+# Hits are posted in batches from a queue of each process, see ga_proxy.gamp_transport
+GA_PROXY_BATCH_URL = 'https://www.google-analytics.com/batch'
+# Hits beyond this many queued hits are dropped
+GA_PROXY_QUEUE_SIZE = 1000
+# Seconds a batch waits for more hits before it is posted
+GA_PROXY_BATCH_WAIT = 1
+# Local stand-in of the batch endpoint at ga-proxy/stub/batch/, see ga_proxy.views.GoogleAnalyticsBatchStubView
+GA_PROXY_STUB_ENABLED = False
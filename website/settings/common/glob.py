@@ -38,6 +38,7 @@ MIDDLEWARE_CLASSES = (
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'core.middleware.ContactRequestMiddleware',
+    'loans.middleware.DecryptionContextMiddleware',
 )
 
 ROOT_URLCONF = 'urls'
@@ -1 +1,14 @@
 SALESFORCE = {}
+
+# Salesforce API sessions are shared by all processes through this cache, see vendors.sf_utils.
+# Sessions are renewed this many seconds after login, within the session timeout set in Salesforce.
+SALESFORCE_SESSION_CACHE_NAME = 'default'
+SALESFORCE_SESSION_TIMEOUT = 60 * 60
+
+# Contact requests are pushed as leads in bulk, see vendors.sf_lead_queue.
+# Salesforce creates up to 200 leads per call.
+SALESFORCE_LEAD_BATCH_SIZE = 200
+SALESFORCE_LEAD_BATCH_WINDOW = 10
+
+# Leads queried per SOQL query by the advisor reconciler, see vendors.sf_request.SalesforceAdvisorReconciler.
+SALESFORCE_RECONCILE_BATCH_SIZE = 200
@@ -25,6 +25,10 @@ CELERYBEAT_SCHEDULE = {
         'task': 'storage.tasks.HandleUnprocessedUploadedDocumentsTask',
         'schedule': crontab()  # every minutes
     },
+    'flush_leads_to_salesforce': {
+        'task': 'vendors.tasks.FlushLeadsToSalesforce',
+        'schedule': crontab()  # every minute, picks up leads whose scheduled flush was lost
+    },
 }
 
 # Celery testing XXXkayhudson
@@ -94,6 +94,18 @@ MORTECH_LICENSEKEY = get_env_variable('sample_MORTECH_LICENSEKEY')
 MORTECH_THIRDPARTY_NAME = get_env_variable('sample_MORTECH_THIRDPARTY_NAME')
 MORTECH_EMAIL = get_env_variable('sample_MORTECH_EMAIL')
 MORTECH_CUSTOMER_ID = get_env_variable('sample_MORTECH_CUSTOMER_ID')
+MORTECH_CACHE_TIMEOUT = 60 * 15  # Rate sheets are refreshed several times a day
+
+# Loan profile detail responses
+LOAN_PROFILE_CACHE_TIMEOUT = 60 * 10
+
+# Box folder trees
+BOX_FOLDER_CACHE_TIMEOUT = 60 * 60 * 24
+BOX_PROVISIONING_WORKERS = 10
+BOX_THUMBNAIL_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+# Configuration singletons
+CONFIG_CACHE_TIMEOUT = 5
 
 # Recaptcha
 RECAPTCHA_ENABLED = get_env_variable('RECAPTCHA_ENABLED')
@@ -288,6 +300,19 @@ CELERYBEAT_SCHEDULE = {
         'task': 'storage.tasks.HandleUnprocessedUploadedDocumentsTask',
         'schedule': crontab()  # every minutes
     },
+    'archive_rate_quotes': {
+        'task': 'mortgage_profiles.tasks.ArchiveRateQuotes',
+        'schedule': crontab(minute='30'),  # every hour
+        'kwargs': {'max_batches': 20},
+    },
+    'reconcile_salesforce_advisors': {
+        'task': 'vendors.tasks.ReconcileSalesforceAdvisors',
+        'schedule': crontab(minute='*/5')  # every 5 minutes
+    },
+    'flush_leads_to_salesforce': {
+        'task': 'vendors.tasks.FlushLeadsToSalesforce',
+        'schedule': crontab()  # every minute, picks up leads whose scheduled flush was lost
+    },
 }
 
 SALESFORCE['USER'] = get_env_variable('SF_AUTH_USER')
@@ -360,6 +360,10 @@ CELERYBEAT_SCHEDULE = {
         'task': 'storage.tasks.HandleUnprocessedUploadedDocumentsTask',
         'schedule': crontab()  # every minutes
     },
+    'flush_leads_to_salesforce': {
+        'task': 'vendors.tasks.FlushLeadsToSalesforce',
+        'schedule': crontab()  # every minute, picks up leads whose scheduled flush was lost
+    },
 }
 
 SALESFORCE['USER'] = get_env_variable('SF_AUTH_USER')